@@ -0,0 +1,1122 @@
+"""
+离线JIRA替身服务（仅用于本地压测与复现，不依赖任何第三方库）
+
+实现插件Python脚本与 sprint-plugin JiraClient 用到的REST接口：
+  /rest/api/3/issue、/issue/bulk、/issue/{key}（GET/PUT/DELETE）、/issue/{key}/transitions、
+  /issue/{key}/comment、/issue/{key}/properties/{name}、/search/jql、/search、/issueLink、
+  /project/{key}/statuses、/issue/createmeta/{project}/issuetypes[/{id}]、/myself、
+  /rest/agile/1.0/board、/board/{id}/sprint、/sprint、/sprint/{id}、/sprint/{id}/issue
+JQL只支持脚本实际使用的子集：AND / OR、=、!=、in、not in、is EMPTY、~、>=、<=、ORDER BY。
+
+可配置：
+  latency_ms / jitter_ms   每个请求的固定延迟与随机抖动
+  per_item_ms              批量创建、搜索结果按条目额外计时
+  rate_limit / burst       令牌桶限流，超出返回 429 + Retry-After
+  stall_rate / stall_ms    按概率让请求额外停顿（模拟长尾延迟）
+  webhook_url / webhook_log  数据变化时按JIRA格式推送webhook（jira:issue_created/updated/deleted、
+                           issuelink_created/deleted）到该URL，和/或逐行录制到JSONL文件（可用于离线重放）
+  error_rate / error_statuses  按概率注入错误（默认503），seed 固定随机序列便于复现
+管理接口：GET /__fake__/stats、POST /__fake__/reset-stats、POST /__fake__/config、POST /__fake__/reset
+
+用法：python fake_jira.py [--port 8080] [--latency 50] [--jitter 20] [--rate-limit 10] [--burst 20] [--error-rate 0.01]
+       [--stall-rate 0.05 --stall-ms 2000] [--webhook-url http://127.0.0.1:8765/webhook] [--webhook-log hooks.jsonl]
+"""
+import argparse
+import itertools
+import json
+import queue
+import random
+import re
+import socket
+import threading
+import time
+import urllib.request
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+ISSUE_TYPES = [
+    {"id": "10000", "name": "Epic", "subtask": False, "hierarchyLevel": 1},
+    {"id": "10001", "name": "Story", "subtask": False, "hierarchyLevel": 0},
+    {"id": "10002", "name": "Task", "subtask": False, "hierarchyLevel": 0},
+    {"id": "10003", "name": "Subtask", "subtask": True, "hierarchyLevel": -1},
+    {"id": "10004", "name": "Bug", "subtask": False, "hierarchyLevel": 0},
+]
+ISSUE_TYPE_ALIASES = {"sub-task": "Subtask", "子任务": "Subtask", "子需求": "Subtask"}
+
+STATUSES = {
+    "10000": {"id": "10000", "name": "To Do", "statusCategory": {"key": "new", "name": "To Do"}},
+    "10001": {"id": "10001", "name": "In Progress", "statusCategory": {"key": "indeterminate", "name": "In Progress"}},
+    "10002": {"id": "10002", "name": "Done", "statusCategory": {"key": "done", "name": "Done"}},
+}
+TRANSITIONS = [
+    {"id": "11", "name": "To Do", "to": STATUSES["10000"]},
+    {"id": "21", "name": "In Progress", "to": STATUSES["10001"]},
+    {"id": "31", "name": "Done", "to": STATUSES["10002"]},
+]
+LINK_TYPES = {
+    "Relates": {"id": "10003", "name": "Relates", "inward": "relates to", "outward": "relates to"},
+    "Blocks": {"id": "10000", "name": "Blocks", "inward": "is blocked by", "outward": "blocks"},
+    "Duplicate": {"id": "10002", "name": "Duplicate", "inward": "is duplicated by", "outward": "duplicates"},
+    "Cloners": {"id": "10001", "name": "Cloners", "inward": "is cloned by", "outward": "clones"},
+}
+
+SEARCH_PAGE_LIMIT = 100
+BULK_LIMIT = 50
+
+
+class FakeJiraError(Exception):
+    """转换为JIRA风格错误响应的异常"""
+
+    def __init__(self, status, message, errors=None):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+        self.errors = errors or {}
+
+    def body(self):
+        return {"errorMessages": [self.message] if self.message else [], "errors": self.errors}
+
+
+def _iso(ts: float) -> str:
+    return datetime.fromtimestamp(ts, timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.000+0000")
+
+
+def _issue_type(value: dict) -> dict:
+    value = value or {}
+    for issue_type in ISSUE_TYPES:
+        if value.get("id") == issue_type["id"]:
+            return issue_type
+    name = str(value.get("name", ""))
+    name = ISSUE_TYPE_ALIASES.get(name.lower(), name)
+    for issue_type in ISSUE_TYPES:
+        if issue_type["name"].lower() == name.lower():
+            return issue_type
+    raise FakeJiraError(400, None, {"issuetype": "请指定有效的问题类型"})
+
+
+# ===== JQL 子集 =====
+
+def _split_top(text: str, word: str) -> list:
+    """按顶层（括号与引号之外）的 AND / OR 拆分"""
+    parts, depth, quote, start = [], 0, None, 0
+    pattern = re.compile(rf"\s+{word}\s+", re.IGNORECASE)
+    i = 0
+    while i < len(text):
+        ch = text[i]
+        if quote:
+            quote = None if ch == quote else quote
+        elif ch in "\"'":
+            quote = ch
+        elif ch == "(":
+            depth += 1
+        elif ch == ")":
+            depth -= 1
+        elif depth == 0:
+            match = pattern.match(text, i)
+            if match:
+                parts.append(text[start:i])
+                start = i = match.end()
+                continue
+        i += 1
+    parts.append(text[start:])
+    return [part.strip() for part in parts if part.strip()]
+
+
+def _unquote(value: str) -> str:
+    value = value.strip()
+    if len(value) >= 2 and value[0] == value[-1] and value[0] in "\"'":
+        return value[1:-1]
+    return value
+
+
+def _parse_values(raw: str) -> list:
+    raw = raw.strip()
+    if raw.lower() == "subtaskissuetypes()":
+        return [t["name"].lower() for t in ISSUE_TYPES if t["subtask"]] + list(ISSUE_TYPE_ALIASES)
+    if raw.startswith("(") and raw.endswith(")"):
+        return [_unquote(v).lower() for v in re.findall(r'"[^"]*"|\'[^\']*\'|[^,\s()]+', raw[1:-1])]
+    return [_unquote(raw).lower()]
+
+
+def _relative_time(value: str) -> float:
+    match = re.match(r"^-?(\d+)([mhdw])$", value.strip())
+    if match:
+        seconds = {"m": 60, "h": 3600, "d": 86400, "w": 604800}[match.group(2)]
+        return time.time() - int(match.group(1)) * seconds
+    for fmt in ("%Y-%m-%d %H:%M", "%Y/%m/%d %H:%M", "%Y-%m-%d", "%Y/%m/%d"):
+        try:
+            return datetime.strptime(value.strip(), fmt).replace(tzinfo=timezone.utc).timestamp()
+        except ValueError:
+            continue
+    return 0.0
+
+
+CLAUSE = re.compile(r"^\s*([\w.]+)\s*(not\s+in|in|is\s+not|is|!=|>=|<=|=|~|>|<)\s*(.+?)\s*$", re.IGNORECASE)
+
+
+def compile_jql(jql: str):
+    """把JQL编译为 (filter(issue)->bool, order) ，order 为 (字段, 是否降序) 或 None"""
+    order = None
+    match = re.search(r"\s*ORDER\s+BY\s+(\w+)(?:\s+(ASC|DESC))?\s*$", jql, re.IGNORECASE)
+    if match:
+        order = (match.group(1).lower(), (match.group(2) or "ASC").upper() == "DESC")
+        jql = jql[:match.start()]
+
+    def compile_expr(text):
+        text = text.strip()
+        if text.startswith("(") and text.endswith(")") and _balanced(text[1:-1]):
+            return compile_expr(text[1:-1])
+        ors = _split_top(text, "OR")
+        if len(ors) > 1:
+            preds = [compile_expr(part) for part in ors]
+            return lambda issue: any(pred(issue) for pred in preds)
+        ands = _split_top(text, "AND")
+        if len(ands) > 1:
+            preds = [compile_expr(part) for part in ands]
+            return lambda issue: all(pred(issue) for pred in preds)
+        return compile_clause(text)
+
+    def compile_clause(text):
+        clause = CLAUSE.match(text)
+        if not clause:
+            raise FakeJiraError(400, f"JQL语法无法识别: {text}")
+        field, op, raw = clause.group(1).lower(), re.sub(r"\s+", " ", clause.group(2).lower()), clause.group(3)
+
+        if op in ("is", "is not"):
+            empty = raw.strip().upper() in ("EMPTY", "NULL")
+            return lambda issue: (not issue.values(field)) == (empty == (op == "is"))
+        if op in (">=", "<=", ">", "<"):
+            bound = _relative_time(_unquote(raw)) if field in ("updated", "created") else float(_unquote(raw))
+            compare = {">=": float.__ge__, "<=": float.__le__, ">": float.__gt__, "<": float.__lt__}[op]
+            return lambda issue: compare(float(issue.number(field)), bound)
+        if op == "~":
+            needle = _unquote(raw).lower().strip("*")
+            return lambda issue: any(needle in value for value in issue.values(field))
+
+        values = set(_parse_values(raw))
+        if op in ("=", "in"):
+            return lambda issue: bool(values & set(issue.values(field)))
+        return lambda issue: not values & set(issue.values(field))
+
+    return compile_expr(jql) if jql.strip() else (lambda issue: True), order
+
+
+def _balanced(text: str) -> bool:
+    depth = 0
+    for ch in text:
+        depth += {"(": 1, ")": -1}.get(ch, 0)
+        if depth < 0:
+            return False
+    return depth == 0
+
+
+# ===== 数据 =====
+
+class Issue:
+    """内存中的issue"""
+
+    def __init__(self, store, issue_id, key, project, issue_type, fields):
+        self.store = store
+        self.id = issue_id
+        self.key = key
+        self.project = project
+        self.type = issue_type
+        self.summary = fields.get("summary") or ""
+        self.description = fields.get("description")
+        self.labels = list(fields.get("labels") or [])
+        self.priority = (fields.get("priority") or {}).get("name", "Medium")
+        self.status = STATUSES["10000"]
+        self.parent = None
+        self.sprint = None
+        self.extra = {k: v for k, v in fields.items() if k.startswith("customfield_")}
+        self.properties = {}
+        self.comments = []
+        self.created = self.updated = time.time()
+
+    def touch(self):
+        self.updated = time.time()
+
+    def values(self, field):
+        """JQL比较用的字段值（小写字符串列表）"""
+        if field == "project":
+            return [self.project.lower()]
+        if field in ("key", "issuekey", "id"):
+            return [self.key.lower(), self.id]
+        if field in ("parent", '"epic link"', "parentepic"):
+            return [self.parent.key.lower(), self.parent.id] if self.parent else []
+        if field in ("issuetype", "type"):
+            return [self.type["name"].lower(), self.type["id"]]
+        if field == "labels":
+            return [label.lower() for label in self.labels]
+        if field == "status":
+            return [self.status["name"].lower(), self.status["id"]]
+        if field == "statuscategory":
+            return [self.status["statusCategory"]["key"], self.status["statusCategory"]["name"].lower()]
+        if field in ("summary", "text"):
+            return [self.summary.lower()]
+        if field == "sprint":
+            return [str(self.sprint)] if self.sprint else []
+        if field == "priority":
+            return [self.priority.lower()]
+        return []
+
+    def number(self, field):
+        if field == "created":
+            return self.created
+        if field == "updated":
+            return self.updated
+        return 0.0
+
+    def sort_key(self, field):
+        if field in ("key", "id"):
+            return (self.project, int(self.key.rsplit("-", 1)[1]))
+        return self.number(field)
+
+    def ref(self):
+        return {"id": self.id, "key": self.key, "self": f"/rest/api/3/issue/{self.id}",
+                "fields": {"summary": self.summary, "status": self.status, "issuetype": self.type,
+                           "priority": {"name": self.priority}}}
+
+    def render(self, fields=None):
+        """渲染为REST响应；fields 为 None 时返回全部字段"""
+        all_fields = {
+            "summary": lambda: self.summary,
+            "description": lambda: self.description,
+            "issuetype": lambda: self.type,
+            "project": lambda: {"id": str(abs(hash(self.project)) % 100000), "key": self.project, "name": self.project},
+            "parent": lambda: self.parent.ref() if self.parent else None,
+            "labels": lambda: list(self.labels),
+            "status": lambda: self.status,
+            "priority": lambda: {"name": self.priority},
+            "issuelinks": lambda: self.store.render_links(self),
+            "subtasks": lambda: [child.ref() for child in self.store.children(self) if child.type["subtask"]],
+            "created": lambda: _iso(self.created),
+            "updated": lambda: _iso(self.updated),
+            "comment": lambda: {"comments": list(self.comments), "total": len(self.comments)},
+        }
+        wanted = None
+        if fields:
+            wanted = {f.strip() for f in fields if f.strip()}
+            if "*all" in wanted or "*navigable" in wanted:
+                wanted = None
+        rendered = {}
+        for name, getter in all_fields.items():
+            if wanted is None or name in wanted:
+                value = getter()
+                if value is not None or wanted is not None:
+                    rendered[name] = value
+        for name, value in self.extra.items():
+            if wanted is None or name in wanted:
+                rendered[name] = value
+        return {"id": self.id, "key": self.key, "self": f"/rest/api/3/issue/{self.id}", "fields": rendered}
+
+
+class JiraStore:
+    """线程安全的内存数据"""
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.listeners = []  # webhook负载的接收函数
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.issues = {}      # key -> Issue
+            self.by_id = {}       # id -> Issue
+            self.links = {}       # link id -> (type, inward Issue, outward Issue)
+            self.projects = {}    # key -> 下一个编号
+            self.sprints = {}
+            self.boards = {}
+            self.ids = itertools.count(10001)
+            self.link_ids = itertools.count(20001)
+            self.changelog_ids = itertools.count(30001)
+            self.sprint_ids = itertools.count(1)
+
+    # ----- issue -----
+
+    def get(self, key_or_id: str) -> Issue:
+        issue = self.issues.get(str(key_or_id).upper()) or self.by_id.get(str(key_or_id))
+        if issue is None:
+            raise FakeJiraError(404, "问题不存在或您无权查看。")
+        return issue
+
+    def emit(self, event: str, issue: Issue = None, changelog: list = None, link_id: str = None, link=None):
+        """按JIRA webhook的格式通知监听者"""
+        if not self.listeners:
+            return
+        payload = {"timestamp": int(time.time() * 1000), "webhookEvent": event}
+        if issue is not None:
+            payload["issue"] = issue.render()
+            if changelog:
+                payload["changelog"] = {"id": str(next(self.changelog_ids)), "items": changelog}
+        if link is not None:
+            link_type, inward, outward = link
+            payload["issueLink"] = {"id": int(link_id), "sourceIssueId": int(inward.id),
+                                    "destinationIssueId": int(outward.id),
+                                    "issueLinkType": {"id": int(link_type["id"]), "name": link_type["name"],
+                                                      "outwardName": link_type["outward"],
+                                                      "inwardName": link_type["inward"],
+                                                      "isSubTaskLinkType": False, "isSystemLinkType": False}}
+        for listener in list(self.listeners):
+            listener(payload)
+
+    def children(self, issue):
+        return [child for child in self.issues.values() if child.parent is issue]
+
+    def ensure_project(self, key: str):
+        with self.lock:
+            if key not in self.projects:
+                self.projects[key] = itertools.count(1)
+                board_id = len(self.boards) + 1
+                self.boards[board_id] = {"id": board_id, "name": f"{key} board", "type": "scrum", "project": key}
+
+    def create(self, fields: dict, update: dict = None) -> Issue:
+        fields = fields or {}
+        errors = {}
+        project = (fields.get("project") or {}).get("key") or (fields.get("project") or {}).get("id")
+        if not project:
+            errors["project"] = "请指定项目"
+        if not fields.get("summary"):
+            errors["summary"] = "您必须指定概要。"
+        try:
+            issue_type = _issue_type(fields.get("issuetype"))
+        except FakeJiraError as e:
+            errors.update(e.errors)
+            issue_type = None
+        parent = None
+        parent_ref = fields.get("parent") or {}
+        if parent_ref:
+            try:
+                parent = self.get(parent_ref.get("key") or parent_ref.get("id"))
+            except FakeJiraError:
+                errors["parent"] = "父问题不存在"
+        elif issue_type and issue_type["subtask"]:
+            errors["parent"] = "子任务必须指定父问题"
+        if errors:
+            raise FakeJiraError(400, None, errors)
+
+        with self.lock:
+            self.ensure_project(project)
+            issue_id = str(next(self.ids))
+            key = f"{project}-{next(self.projects[project])}"
+            issue = Issue(self, issue_id, key, project, issue_type, fields)
+            issue.parent = parent
+            self.issues[key] = issue
+            self.by_id[issue_id] = issue
+            self.emit("jira:issue_created", issue)
+        for op in (update or {}).get("issuelinks", []):
+            add = op.get("add") or {}
+            other = add.get("outwardIssue") or add.get("inwardIssue") or {}
+            if "outwardIssue" in add:
+                self.link(add.get("type"), issue.key, other.get("key") or other.get("id"))
+            else:
+                self.link(add.get("type"), other.get("key") or other.get("id"), issue.key)
+        return issue
+
+    def update(self, issue: Issue, fields: dict = None, update: dict = None):
+        with self.lock:
+            before = {"summary": issue.summary, "labels": " ".join(issue.labels),
+                      "parent": issue.parent.key if issue.parent else None, "issuetype": issue.type["name"]}
+            for name, value in (fields or {}).items():
+                if name == "summary":
+                    issue.summary = value
+                elif name == "description":
+                    issue.description = value
+                elif name == "labels":
+                    issue.labels = list(value or [])
+                elif name == "priority":
+                    issue.priority = (value or {}).get("name", issue.priority)
+                elif name == "parent":
+                    issue.parent = self.get(value.get("key") or value.get("id")) if value else None
+                elif name == "issuetype":
+                    issue.type = _issue_type(value)
+                else:
+                    issue.extra[name] = value
+            for name, ops in (update or {}).items():
+                for op in ops:
+                    if name == "labels":
+                        if "add" in op and op["add"] not in issue.labels:
+                            issue.labels.append(op["add"])
+                        if "remove" in op and op["remove"] in issue.labels:
+                            issue.labels.remove(op["remove"])
+                        if "set" in op:
+                            issue.labels = list(op["set"])
+                    elif name == "issuelinks" and "add" in op:
+                        add = op["add"]
+                        if "outwardIssue" in add:
+                            self.link(add.get("type"), issue.key, add["outwardIssue"].get("key"))
+                        else:
+                            self.link(add.get("type"), add["inwardIssue"].get("key"), issue.key)
+            issue.touch()
+            after = {"summary": issue.summary, "labels": " ".join(issue.labels),
+                     "parent": issue.parent.key if issue.parent else None, "issuetype": issue.type["name"]}
+            changelog = [{"field": name, "fieldtype": "jira", "fromString": before[name], "toString": after[name]}
+                         for name in before if before[name] != after[name]]
+            if "description" in (fields or {}):
+                changelog.append({"field": "description", "fieldtype": "jira", "fromString": None, "toString": None})
+            self.emit("jira:issue_updated", issue, changelog)
+
+    def transition(self, issue: Issue, status: dict):
+        with self.lock:
+            previous = issue.status
+            issue.status = status
+            issue.touch()
+            self.emit("jira:issue_updated", issue, [{"field": "status", "fieldtype": "jira", "from": previous["id"],
+                                                     "fromString": previous["name"], "to": status["id"],
+                                                     "toString": status["name"]}])
+
+    def delete(self, issue: Issue, delete_subtasks: bool):
+        with self.lock:
+            children = self.children(issue)
+            subtasks = [child for child in children if child.type["subtask"]]
+            if subtasks and not delete_subtasks:
+                raise FakeJiraError(400, "该问题包含子任务，必须指定 deleteSubtasks=true 才能删除")
+            removed = [issue] + subtasks
+            for item in removed:
+                self.emit("jira:issue_deleted", item)
+            for item in removed:
+                self.issues.pop(item.key, None)
+                self.by_id.pop(item.id, None)
+            for child in children:
+                if child not in subtasks:
+                    child.parent = None
+            for link_id, (_, inward, outward) in list(self.links.items()):
+                if inward in removed or outward in removed:
+                    del self.links[link_id]
+            return [item.key for item in removed]
+
+    # ----- link -----
+
+    def link(self, link_type: dict, inward_key: str, outward_key: str) -> str:
+        name = (link_type or {}).get("name") or "Relates"
+        if name not in LINK_TYPES:
+            raise FakeJiraError(404, f"找不到链接类型 {name}")
+        inward, outward = self.get(inward_key), self.get(outward_key)
+        with self.lock:
+            for link_id, (existing_type, a, b) in self.links.items():
+                if existing_type["name"] == name and a is inward and b is outward:
+                    return link_id  # 与真实JIRA一致：重复链接不产生新记录
+            link_id = str(next(self.link_ids))
+            self.links[link_id] = (LINK_TYPES[name], inward, outward)
+            inward.touch()
+            outward.touch()
+            self.emit("issuelink_created", link_id=link_id, link=self.links[link_id])
+            return link_id
+
+    def unlink(self, link_id: str):
+        with self.lock:
+            link = self.links.pop(link_id, None)
+            if link is None:
+                raise FakeJiraError(404, "链接不存在")
+            self.emit("issuelink_deleted", link_id=link_id, link=link)
+
+    def render_links(self, issue: Issue) -> list:
+        rendered = []
+        for link_id, (link_type, inward, outward) in self.links.items():
+            if inward is issue:
+                rendered.append({"id": link_id, "type": link_type, "outwardIssue": outward.ref()})
+            elif outward is issue:
+                rendered.append({"id": link_id, "type": link_type, "inwardIssue": inward.ref()})
+        return rendered
+
+    # ----- search -----
+
+    def search(self, jql: str) -> list:
+        predicate, order = compile_jql(jql or "")
+        with self.lock:
+            matched = [issue for issue in self.issues.values() if predicate(issue)]
+        field, descending = order or ("key", False)
+        matched.sort(key=lambda issue: issue.sort_key(field), reverse=descending)
+        return matched
+
+    # ----- 预置数据 -----
+
+    def seed_tree(self, project: str, epics: int = 1, stories: int = 5, subtasks: int = 5, description: str = None):
+        """
+        预置 Epic → Story → Subtask 层级数据，返回 {"epics": [...], "stories": [...], "subtasks": [...]}（均为key）
+        """
+        text = description or "业务目标：……\n功能边界：……\n验收标准：Given 用户已登录 When 提交 Then 保存成功"
+        doc = {"type": "doc", "version": 1,
+               "content": [{"type": "paragraph", "content": [{"type": "text", "text": text}]}]}
+        result = {"epics": [], "stories": [], "subtasks": []}
+        for e in range(epics):
+            epic = self.create({"project": {"key": project}, "issuetype": {"name": "Epic"},
+                                "summary": f"Epic {e + 1}", "description": doc})
+            result["epics"].append(epic.key)
+            for s in range(stories):
+                story = self.create({"project": {"key": project}, "issuetype": {"name": "Story"},
+                                     "summary": f"Story {e + 1}.{s + 1}", "description": doc,
+                                     "parent": {"id": epic.id}})
+                result["stories"].append(story.key)
+                for t in range(subtasks):
+                    number = f"REQ-{story.key}-{t + 1}"
+                    subtask = self.create({"project": {"key": project}, "issuetype": {"name": "Subtask"},
+                                           "summary": f"[{number}] 子需求 {t + 1}", "description": doc,
+                                           "labels": ["requirement", f"REQ-{story.key}"],
+                                           "parent": {"id": story.id}})
+                    result["subtasks"].append(subtask.key)
+        return result
+
+
+# ===== HTTP =====
+
+class FakeJira:
+    """
+    可在进程内启动的JIRA替身服务
+        fake = FakeJira(latency_ms=50, rate_limit=10).start()
+        fake.store.seed_tree("P")
+        ... 以 fake.url 作为 JIRA_DOMAIN 运行脚本 ...
+        print(fake.stats())
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, latency_ms=0.0, jitter_ms=0.0, per_item_ms=0.0,
+                 rate_limit=0.0, burst=None, error_rate=0.0, error_statuses=(503,), seed=0,
+                 stall_rate=0.0, stall_ms=0.0, webhook_url=None, webhook_log=None):
+        self.store = JiraStore()
+        self.host, self.port = host, port
+        self.config = {}
+        self.configure(latency_ms=latency_ms, jitter_ms=jitter_ms, per_item_ms=per_item_ms, rate_limit=rate_limit,
+                       burst=burst, error_rate=error_rate, error_statuses=list(error_statuses), seed=seed,
+                       stall_rate=stall_rate, stall_ms=stall_ms, webhook_url=webhook_url, webhook_log=webhook_log)
+        self.server = None
+        self.thread = None
+        self.stats_lock = threading.Lock()
+        self.reset_stats()
+        self.webhook_lock = threading.Lock()
+        self.webhook_queue = None
+        self.store.listeners.append(self.on_webhook)
+
+    def configure(self, **options):
+        """更新延迟、限流与错误注入配置"""
+        self.config.update({k: v for k, v in options.items() if v is not None or k == "burst"})
+        rate = float(self.config.get("rate_limit") or 0)
+        self.bucket_capacity = float(self.config.get("burst") or max(rate, 1))
+        self.bucket_tokens = self.bucket_capacity
+        self.bucket_updated = time.monotonic()
+        self.bucket_lock = threading.Lock()
+        self.random = random.Random(self.config.get("seed", 0))
+
+    def reset_stats(self):
+        with self.stats_lock:
+            self._stats = {"requests": 0, "bytes_in": 0, "bytes_out": 0, "rate_limited": 0,
+                           "injected_errors": 0, "statuses": {}, "endpoints": {}}
+
+    def stats(self) -> dict:
+        with self.stats_lock:
+            return json.loads(json.dumps(self._stats))
+
+    def record(self, endpoint, status, bytes_in, bytes_out):
+        with self.stats_lock:
+            stats = self._stats
+            stats["requests"] += 1
+            stats["bytes_in"] += bytes_in
+            stats["bytes_out"] += bytes_out
+            stats["statuses"][str(status)] = stats["statuses"].get(str(status), 0) + 1
+            entry = stats["endpoints"].setdefault(endpoint, {"requests": 0, "bytes_in": 0, "bytes_out": 0})
+            entry["requests"] += 1
+            entry["bytes_in"] += bytes_in
+            entry["bytes_out"] += bytes_out
+            if status == 429:
+                stats["rate_limited"] += 1
+
+    def take_token(self):
+        """令牌桶限流，返回需要等待的秒数（0表示放行）"""
+        rate = float(self.config.get("rate_limit") or 0)
+        if rate <= 0:
+            return 0
+        with self.bucket_lock:
+            now = time.monotonic()
+            self.bucket_tokens = min(self.bucket_capacity, self.bucket_tokens + (now - self.bucket_updated) * rate)
+            self.bucket_updated = now
+            if self.bucket_tokens >= 1:
+                self.bucket_tokens -= 1
+                return 0
+            return (1 - self.bucket_tokens) / rate
+
+    def delay(self, items=0):
+        config = self.config
+        seconds = (float(config.get("latency_ms") or 0) + self.random.uniform(0, float(config.get("jitter_ms") or 0))
+                   + float(config.get("per_item_ms") or 0) * items) / 1000
+        if config.get("stall_rate") and self.random.random() < float(config["stall_rate"]):
+            seconds += float(config.get("stall_ms") or 0) / 1000
+        if seconds > 0:
+            time.sleep(seconds)
+
+    def on_webhook(self, payload: dict):
+        """录制webhook负载，并交给后台线程按顺序推送"""
+        if self.config.get("webhook_log"):
+            with self.webhook_lock:
+                with open(self.config["webhook_log"], "a", encoding="utf-8") as f:
+                    f.write(json.dumps(payload, ensure_ascii=False) + "\n")
+        if self.config.get("webhook_url"):
+            with self.webhook_lock:
+                if self.webhook_queue is None:
+                    self.webhook_queue = queue.Queue()
+                    threading.Thread(target=self._deliver_webhooks, daemon=True).start()
+            self.webhook_queue.put(payload)
+
+    def _deliver_webhooks(self):
+        while True:
+            payload = self.webhook_queue.get()
+            request = urllib.request.Request(self.config["webhook_url"], data=json.dumps(payload).encode("utf-8"),
+                                             headers={"Content-Type": "application/json"}, method="POST")
+            try:
+                urllib.request.urlopen(request, timeout=10).close()
+            except OSError as e:
+                print(f"⚠️  webhook推送失败: {payload['webhookEvent']} {e}")
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    def start(self):
+        handler = type("FakeJiraHandler", (_Handler,), {"fake": self})
+        self.server = ThreadingHTTPServer((self.host, self.port), handler)
+        self.server.daemon_threads = True
+        self.port = self.server.server_address[1]
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+    def serve_forever(self):
+        self.start()
+        print(f"🧪 Fake JIRA 已启动: {self.url}  配置: {json.dumps(self.config, ensure_ascii=False)}")
+        try:
+            self.thread.join()
+        except KeyboardInterrupt:
+            self.stop()
+
+
+ROUTES = []
+
+
+def route(method, pattern, name=None):
+    def decorator(func):
+        ROUTES.append((method, re.compile(f"^{pattern}$"), name or f"{method} {pattern}", func))
+        return func
+    return decorator
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    fake = None  # start() 时绑定
+
+    def setup(self):
+        super().setup()
+        # 响应头与响应体分两次写出，关闭Nagle算法以免与客户端的延迟ACK叠加出约40ms的额外延迟
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        self.dispatch("GET")
+
+    def do_POST(self):
+        self.dispatch("POST")
+
+    def do_PUT(self):
+        self.dispatch("PUT")
+
+    def do_DELETE(self):
+        self.dispatch("DELETE")
+
+    def dispatch(self, method):
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length) if length else b""
+        parsed = urlparse(self.path)
+        self.query = {k: v[-1] for k, v in parse_qs(parsed.query).items()}
+        path = parsed.path.rstrip("/") or "/"
+
+        if path.startswith("/__fake__/"):
+            return self.admin(method, path, raw)
+
+        fake = self.fake
+        endpoint, handler, args = f"{method} {path}", None, ()
+        for route_method, pattern, name, func in ROUTES:
+            match = pattern.match(path)
+            if match and route_method == method:
+                endpoint, handler, args = name, func, match.groups()
+                break
+
+        headers = {}
+        wait = fake.take_token()
+        if not self.headers.get("Authorization"):
+            status, body = 401, {"errorMessages": ["需要认证"]}
+        elif wait:
+            status, body = 429, {"errorMessages": ["Rate limit exceeded"]}
+            headers["Retry-After"] = str(max(1, round(wait)))
+        elif fake.config.get("error_rate") and fake.random.random() < float(fake.config["error_rate"]):
+            status = fake.random.choice(fake.config.get("error_statuses") or [503])
+            body = {"errorMessages": ["注入的错误"]}
+            with fake.stats_lock:
+                fake._stats["injected_errors"] += 1
+        elif handler is None:
+            status, body = 404, {"errorMessages": [f"未实现的接口: {method} {path}"]}
+        else:
+            try:
+                payload = json.loads(raw) if raw else {}
+                status, body, items = _call(handler, self, args, payload)
+                fake.delay(items)
+            except FakeJiraError as e:
+                status, body = e.status, e.body()
+            except ValueError as e:
+                status, body = 400, {"errorMessages": [f"请求体不是有效的JSON: {e}"]}
+
+        data = b"" if body is None else json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        if data:
+            self.send_header("Content-Type", "application/json;charset=UTF-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+        fake.record(endpoint, status, len(raw) + len(self.path), len(data))
+
+    def admin(self, method, path, raw):
+        fake = self.fake
+        if path == "/__fake__/stats":
+            body = fake.stats()
+        elif path == "/__fake__/reset-stats" and method == "POST":
+            fake.reset_stats()
+            body = {"ok": True}
+        elif path == "/__fake__/config" and method == "POST":
+            fake.configure(**json.loads(raw or b"{}"))
+            body = fake.config
+        elif path == "/__fake__/reset" and method == "POST":
+            fake.store.reset()
+            fake.reset_stats()
+            body = {"ok": True}
+        elif path == "/__fake__/seed" and method == "POST":
+            options = json.loads(raw or b"{}")
+            body = fake.store.seed_tree(options.pop("project", "P"), **options)
+        else:
+            body = {"errorMessages": [f"未知的管理接口: {path}"]}
+        data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json;charset=UTF-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def _call(handler, request, args, payload):
+    """调用路由处理函数，统一返回 (状态码, 响应体, 条目数)"""
+    result = handler(request, *args, payload)
+    return result if len(result) == 3 else (*result, 0)
+
+
+def _fields_param(request):
+    fields = request.query.get("fields")
+    return fields.split(",") if fields else None
+
+
+# ----- /rest/api/3 -----
+
+@route("GET", r"/rest/api/3/myself", "GET /rest/api/3/myself")
+def _myself(request, payload):
+    return 200, {"accountId": "fake-account", "displayName": "Fake User", "active": True}
+
+
+@route("POST", r"/rest/api/3/issue", "POST /rest/api/3/issue")
+def _create_issue(request, payload):
+    issue = request.fake.store.create(payload.get("fields"), payload.get("update"))
+    return 201, {"id": issue.id, "key": issue.key, "self": f"/rest/api/3/issue/{issue.id}"}
+
+
+@route("POST", r"/rest/api/3/issue/bulk", "POST /rest/api/3/issue/bulk")
+def _bulk_create(request, payload):
+    updates = payload.get("issueUpdates") or []
+    if len(updates) > BULK_LIMIT:
+        raise FakeJiraError(400, f"单次最多创建 {BULK_LIMIT} 个问题")
+    issues, errors = [], []
+    for index, update in enumerate(updates):
+        try:
+            issue = request.fake.store.create(update.get("fields"), update.get("update"))
+            issues.append({"id": issue.id, "key": issue.key, "self": f"/rest/api/3/issue/{issue.id}"})
+        except FakeJiraError as e:
+            errors.append({"status": e.status, "failedElementNumber": index,
+                           "elementErrors": {"errorMessages": e.body()["errorMessages"], "errors": e.errors}})
+    return (201 if issues else 400), {"issues": issues, "errors": errors}, len(updates)
+
+
+@route("GET", r"/rest/api/3/issue/([^/]+)", "GET /rest/api/3/issue/{key}")
+def _get_issue(request, key, payload):
+    return 200, request.fake.store.get(key).render(_fields_param(request))
+
+
+@route("PUT", r"/rest/api/3/issue/([^/]+)", "PUT /rest/api/3/issue/{key}")
+def _edit_issue(request, key, payload):
+    store = request.fake.store
+    store.update(store.get(key), payload.get("fields"), payload.get("update"))
+    return 204, None
+
+
+@route("DELETE", r"/rest/api/3/issue/([^/]+)", "DELETE /rest/api/3/issue/{key}")
+def _delete_issue(request, key, payload):
+    store = request.fake.store
+    deleted = store.delete(store.get(key), request.query.get("deleteSubtasks", "false").lower() == "true")
+    return 204, None, len(deleted)
+
+
+@route("GET", r"/rest/api/3/issue/([^/]+)/transitions", "GET /rest/api/3/issue/{key}/transitions")
+def _get_transitions(request, key, payload):
+    request.fake.store.get(key)
+    return 200, {"transitions": TRANSITIONS}
+
+
+@route("POST", r"/rest/api/3/issue/([^/]+)/transitions", "POST /rest/api/3/issue/{key}/transitions")
+def _do_transition(request, key, payload):
+    issue = request.fake.store.get(key)
+    transition_id = str((payload.get("transition") or {}).get("id"))
+    transition = next((t for t in TRANSITIONS if t["id"] == transition_id), None)
+    if transition is None:
+        raise FakeJiraError(400, f"转换 {transition_id} 对该问题无效")
+    request.fake.store.transition(issue, transition["to"])
+    return 204, None
+
+
+@route("GET", r"/rest/api/3/issue/([^/]+)/comment", "GET /rest/api/3/issue/{key}/comment")
+def _get_comments(request, key, payload):
+    comments = request.fake.store.get(key).comments
+    return 200, {"comments": comments, "startAt": 0, "maxResults": len(comments), "total": len(comments)}
+
+
+@route("POST", r"/rest/api/3/issue/([^/]+)/comment", "POST /rest/api/3/issue/{key}/comment")
+def _add_comment(request, key, payload):
+    issue = request.fake.store.get(key)
+    comment = {"id": str(10000 + len(issue.comments)), "body": payload.get("body"), "created": _iso(time.time())}
+    issue.comments.append(comment)
+    issue.touch()
+    return 201, comment
+
+
+@route("GET", r"/rest/api/3/issue/([^/]+)/properties/([^/]+)", "GET /rest/api/3/issue/{key}/properties/{name}")
+def _get_property(request, key, name, payload):
+    properties = request.fake.store.get(key).properties
+    if name not in properties:
+        raise FakeJiraError(404, f"属性 {name} 不存在")
+    return 200, {"key": name, "value": properties[name]}
+
+
+@route("PUT", r"/rest/api/3/issue/([^/]+)/properties/([^/]+)", "PUT /rest/api/3/issue/{key}/properties/{name}")
+def _set_property(request, key, name, payload):
+    properties = request.fake.store.get(key).properties
+    status = 200 if name in properties else 201
+    properties[name] = payload
+    return status, None
+
+
+@route("DELETE", r"/rest/api/3/issue/([^/]+)/properties/([^/]+)", "DELETE /rest/api/3/issue/{key}/properties/{name}")
+def _delete_property(request, key, name, payload):
+    request.fake.store.get(key).properties.pop(name, None)
+    return 204, None
+
+
+def _search_page(request, jql, fields, max_results, offset):
+    matched = request.fake.store.search(jql)
+    max_results = max(1, min(int(max_results or 50), SEARCH_PAGE_LIMIT))
+    page = matched[offset:offset + max_results]
+    return matched, page, max_results
+
+
+@route("GET", r"/rest/api/3/search/jql", "GET /rest/api/3/search/jql")
+@route("POST", r"/rest/api/3/search/jql", "POST /rest/api/3/search/jql")
+def _search_jql(request, payload):
+    if payload:
+        jql, fields = payload.get("jql", ""), payload.get("fields")
+        max_results, token = payload.get("maxResults"), payload.get("nextPageToken")
+    else:
+        jql, fields = request.query.get("jql", ""), _fields_param(request)
+        max_results, token = request.query.get("maxResults"), request.query.get("nextPageToken")
+    offset = int(token or 0)
+    matched, page, max_results = _search_page(request, jql, fields, max_results, offset)
+    body = {"issues": [issue.render(fields) for issue in page], "isLast": offset + len(page) >= len(matched)}
+    if not body["isLast"]:
+        body["nextPageToken"] = str(offset + len(page))
+    return 200, body, len(page)
+
+
+@route("GET", r"/rest/api/3/search", "GET /rest/api/3/search")
+def _search_legacy(request, payload):
+    offset = int(request.query.get("startAt") or 0)
+    matched, page, max_results = _search_page(request, request.query.get("jql", ""), _fields_param(request),
+                                              request.query.get("maxResults"), offset)
+    return 200, {"startAt": offset, "maxResults": max_results, "total": len(matched),
+                 "issues": [issue.render(_fields_param(request)) for issue in page]}, len(page)
+
+
+@route("POST", r"/rest/api/3/issueLink", "POST /rest/api/3/issueLink")
+def _create_link(request, payload):
+    request.fake.store.link(payload.get("type"), (payload.get("inwardIssue") or {}).get("key"),
+                            (payload.get("outwardIssue") or {}).get("key"))
+    return 201, None
+
+
+@route("GET", r"/rest/api/3/issueLink/(\d+)", "GET /rest/api/3/issueLink/{id}")
+def _get_link(request, link_id, payload):
+    link = request.fake.store.links.get(link_id)
+    if not link:
+        raise FakeJiraError(404, "链接不存在")
+    link_type, inward, outward = link
+    return 200, {"id": link_id, "type": link_type, "inwardIssue": inward.ref(), "outwardIssue": outward.ref()}
+
+
+@route("DELETE", r"/rest/api/3/issueLink/(\d+)", "DELETE /rest/api/3/issueLink/{id}")
+def _delete_link(request, link_id, payload):
+    request.fake.store.unlink(link_id)
+    return 204, None
+
+
+@route("GET", r"/rest/api/3/issueLinkType", "GET /rest/api/3/issueLinkType")
+def _link_types(request, payload):
+    return 200, {"issueLinkTypes": list(LINK_TYPES.values())}
+
+
+@route("GET", r"/rest/api/3/project/([^/]+)", "GET /rest/api/3/project/{key}")
+def _get_project(request, key, payload):
+    request.fake.store.ensure_project(key.upper())
+    return 200, {"id": str(abs(hash(key.upper())) % 100000), "key": key.upper(), "name": key.upper(),
+                 "issueTypes": ISSUE_TYPES}
+
+
+@route("GET", r"/rest/api/3/project/([^/]+)/statuses", "GET /rest/api/3/project/{key}/statuses")
+def _project_statuses(request, key, payload):
+    return 200, [{**issue_type, "statuses": list(STATUSES.values())} for issue_type in ISSUE_TYPES]
+
+
+@route("GET", r"/rest/api/3/issue/createmeta/([^/]+)/issuetypes", "GET /rest/api/3/issue/createmeta/{project}/issuetypes")
+def _createmeta_types(request, project, payload):
+    return 200, {"issueTypes": ISSUE_TYPES, "values": ISSUE_TYPES, "total": len(ISSUE_TYPES)}
+
+
+@route("GET", r"/rest/api/3/issue/createmeta/([^/]+)/issuetypes/(\d+)",
+       "GET /rest/api/3/issue/createmeta/{project}/issuetypes/{id}")
+def _createmeta_fields(request, project, type_id, payload):
+    if not any(issue_type["id"] == type_id for issue_type in ISSUE_TYPES):
+        raise FakeJiraError(404, "问题类型不存在")
+    fields = [{"fieldId": "summary", "key": "summary", "name": "Summary", "required": True, "hasDefaultValue": False},
+              {"fieldId": "issuetype", "key": "issuetype", "name": "Issue Type", "required": True, "hasDefaultValue": False},
+              {"fieldId": "project", "key": "project", "name": "Project", "required": True, "hasDefaultValue": False},
+              {"fieldId": "description", "key": "description", "name": "Description", "required": False,
+               "hasDefaultValue": False}]
+    if type_id == "10003":
+        fields.append({"fieldId": "parent", "key": "parent", "name": "Parent", "required": True, "hasDefaultValue": False})
+    return 200, {"fields": fields, "values": fields, "total": len(fields), "startAt": 0, "maxResults": 200}
+
+
+@route("GET", r"/rest/api/3/issuetype/project", "GET /rest/api/3/issuetype/project")
+def _project_issue_types(request, payload):
+    return 200, ISSUE_TYPES
+
+
+# ----- /rest/agile/1.0 -----
+
+@route("GET", r"/rest/agile/1.0/board", "GET /rest/agile/1.0/board")
+def _boards(request, payload):
+    store = request.fake.store
+    project = (request.query.get("projectKeyOrId") or "").upper()
+    if project:
+        store.ensure_project(project)
+    boards = [b for b in store.boards.values() if not project or b["project"] == project]
+    return 200, {"values": [{k: v for k, v in b.items() if k != "project"} for b in boards], "isLast": True}
+
+
+@route("GET", r"/rest/agile/1.0/board/(\d+)/sprint", "GET /rest/agile/1.0/board/{id}/sprint")
+def _board_sprints(request, board_id, payload):
+    states = set((request.query.get("state") or "future,active,closed").split(","))
+    sprints = [s for s in request.fake.store.sprints.values()
+               if str(s["originBoardId"]) == board_id and s["state"] in states]
+    return 200, {"values": sprints, "isLast": True}
+
+
+@route("POST", r"/rest/agile/1.0/sprint", "POST /rest/agile/1.0/sprint")
+def _create_sprint(request, payload):
+    store = request.fake.store
+    sprint_id = next(store.sprint_ids)
+    sprint = {"id": sprint_id, "state": "future", "name": payload.get("name") or f"Sprint {sprint_id}",
+              "originBoardId": payload.get("originBoardId"), "goal": payload.get("goal", ""),
+              "startDate": payload.get("startDate"), "endDate": payload.get("endDate")}
+    store.sprints[sprint_id] = sprint
+    return 201, sprint
+
+
+def _sprint(request, sprint_id):
+    sprint = request.fake.store.sprints.get(int(sprint_id))
+    if not sprint:
+        raise FakeJiraError(404, f"Sprint {sprint_id} 不存在")
+    return sprint
+
+
+@route("GET", r"/rest/agile/1.0/sprint/(\d+)", "GET /rest/agile/1.0/sprint/{id}")
+def _get_sprint(request, sprint_id, payload):
+    return 200, _sprint(request, sprint_id)
+
+
+@route("PUT", r"/rest/agile/1.0/sprint/(\d+)", "PUT /rest/agile/1.0/sprint/{id}")
+@route("POST", r"/rest/agile/1.0/sprint/(\d+)", "POST /rest/agile/1.0/sprint/{id}")
+def _update_sprint(request, sprint_id, payload):
+    sprint = _sprint(request, sprint_id)
+    sprint.update({k: v for k, v in payload.items() if k != "id"})
+    return 200, sprint
+
+
+@route("GET", r"/rest/agile/1.0/sprint/(\d+)/issue", "GET /rest/agile/1.0/sprint/{id}/issue")
+def _sprint_issues(request, sprint_id, payload):
+    _sprint(request, sprint_id)
+    offset = int(request.query.get("startAt") or 0)
+    matched, page, max_results = _search_page(request, f"sprint = {sprint_id}", None,
+                                              request.query.get("maxResults"), offset)
+    return 200, {"startAt": offset, "maxResults": max_results, "total": len(matched),
+                 "issues": [issue.render(_fields_param(request)) for issue in page]}, len(page)
+
+
+@route("POST", r"/rest/agile/1.0/sprint/(\d+)/issue", "POST /rest/agile/1.0/sprint/{id}/issue")
+def _move_to_sprint(request, sprint_id, payload):
+    _sprint(request, sprint_id)
+    store = request.fake.store
+    for key in payload.get("issues") or []:
+        issue = store.get(key)
+        issue.sprint = int(sprint_id)
+        issue.touch()
+    return 204, None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="离线JIRA替身服务")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--latency", type=float, default=0, help="每个请求的固定延迟（毫秒）")
+    parser.add_argument("--jitter", type=float, default=0, help="随机抖动上限（毫秒）")
+    parser.add_argument("--per-item", type=float, default=0, help="批量/搜索按条目额外延迟（毫秒）")
+    parser.add_argument("--rate-limit", type=float, default=0, help="每秒请求数上限，0为不限流")
+    parser.add_argument("--burst", type=float, default=None, help="令牌桶容量，默认等于 --rate-limit")
+    parser.add_argument("--error-rate", type=float, default=0, help="注入错误的概率（0-1）")
+    parser.add_argument("--error-status", type=int, action="append", help="注入的错误状态码，可重复，默认503")
+    parser.add_argument("--stall-rate", type=float, default=0, help="请求额外停顿的概率（0-1），模拟长尾延迟")
+    parser.add_argument("--stall-ms", type=float, default=2000, help="停顿时长（毫秒）")
+    parser.add_argument("--webhook-url", help="数据变化时推送webhook的地址")
+    parser.add_argument("--webhook-log", help="把推送的webhook逐行录制到该JSONL文件")
+    parser.add_argument("--seed", type=int, default=0, help="随机种子")
+    parser.add_argument("--seed-project", help="启动时预置层级数据的项目Key")
+    parser.add_argument("--seed-size", default="1x5x5", help="预置数据规模 Epic x Story x Subtask")
+    args = parser.parse_args()
+
+    fake = FakeJira(args.host, args.port, latency_ms=args.latency, jitter_ms=args.jitter, per_item_ms=args.per_item,
+                    rate_limit=args.rate_limit, burst=args.burst, error_rate=args.error_rate,
+                    error_statuses=args.error_status or [503], seed=args.seed,
+                    stall_rate=args.stall_rate, stall_ms=args.stall_ms,
+                    webhook_url=args.webhook_url, webhook_log=args.webhook_log)
+    if args.seed_project:
+        epics, stories, subtasks = (int(n) for n in args.seed_size.lower().split("x"))
+        seeded = fake.store.seed_tree(args.seed_project.upper(), epics, stories, subtasks)
+        print(f"📋 已预置 {len(seeded['epics'])} 个Epic、{len(seeded['stories'])} 个Story、{len(seeded['subtasks'])} 个Subtask")
+    fake.serve_forever()
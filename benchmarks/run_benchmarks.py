@@ -0,0 +1,282 @@
+"""
+插件脚本基准测试：在离线JIRA替身服务（fake_jira.py）上运行典型工作流，
+统计每个场景的耗时、请求数与传输字节数。
+
+场景：
+  decompose_story    批量创建子需求（create_subtask.create_subtasks_bulk）
+  create_dev_tasks   为每个子需求创建开发任务并链接（create_development_tasks.create_development_task）
+  create_dev_tasks_bulk 一次批量创建同一Story下全部开发任务（create_development_tasks.create_development_tasks_bulk）
+  validate_epic      验证Epic下全部Story的分解质量（validate_decomposition_quality.validate_decomposition）
+  cascade_delete     级联删除Epic（cascade_delete.cascade_delete）
+  discover_hierarchy 发现项目层级（discover_hierarchy.discover_hierarchy）
+  execute_plan       按依赖图执行完整分解计划：Epic → Story → 子需求 → 开发任务（execute_plan.execute_plan）
+
+每个场景在独立子进程中运行（全新的状态目录与进程内缓存），服务端在每次运行前重置数据与统计。
+
+用法：python run_benchmarks.py [场景 ...] [--subtasks 20] [--stories 10] [--per-story 5]
+                               [--latency 50] [--jitter 0] [--rate-limit 0] [--error-rate 0] [--stall-rate 0]
+                               [--repeat 3] [--json 结果.json] [--compare 基线.json] [--verbose]
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from fake_jira import FakeJira
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRIPT_DIRS = [
+    os.path.join(ROOT, "plugins", "waterfall-marketplace", "requirements-plugin", "scripts"),
+    os.path.join(ROOT, "plugins", "waterfall-marketplace", "pm-plugin", "scripts"),
+]
+PROJECT = "BENCH"
+DESCRIPTION = "业务目标：……\n功能边界：……\n验收标准：Given 用户已登录 When 提交 Then 保存成功"
+
+
+# ===== 场景：seed 在父进程中预置数据，run 在子进程中执行被测操作 =====
+
+def seed_decompose_story(store, options):
+    tree = store.seed_tree(PROJECT, epics=1, stories=1, subtasks=0)
+    story = store.get(tree["stories"][0])
+    return {"story_id": story.id, "count": options.subtasks}
+
+
+def run_decompose_story(params):
+    from create_subtask import create_subtasks_bulk
+    subtasks = [{"summary": f"子需求 {i + 1}", "description": DESCRIPTION} for i in range(params["count"])]
+    results = create_subtasks_bulk(subtasks, params["story_id"])
+    return {"items": len(results), "failed": sum(1 for r in results if not r or not r["ok"])}
+
+
+def seed_create_dev_tasks(store, options):
+    tree = store.seed_tree(PROJECT, epics=1, stories=1, subtasks=options.subtasks)
+    return {"story_key": tree["stories"][0], "subtask_keys": tree["subtasks"]}
+
+
+def run_create_dev_tasks(params):
+    from create_development_tasks import create_development_task
+    failed = 0
+    for subtask_key in params["subtask_keys"]:
+        if not create_development_task(subtask_key, f"实现 {subtask_key}", DESCRIPTION, params["story_key"]):
+            failed += 1
+    return {"items": len(params["subtask_keys"]), "failed": failed}
+
+
+def run_create_dev_tasks_bulk(params):
+    from create_development_tasks import create_development_tasks_bulk
+    tasks = [{"subtask_key": key, "summary": f"实现 {key}", "description": DESCRIPTION} for key in params["subtask_keys"]]
+    results = create_development_tasks_bulk(tasks, params["story_key"])
+    return {"items": len(results), "failed": sum(1 for r in results if not r["ok"])}
+
+
+def seed_epic_tree(store, options):
+    tree = store.seed_tree(PROJECT, epics=1, stories=options.stories, subtasks=options.per_story)
+    return {"epic_key": tree["epics"][0], "issues": 1 + len(tree["stories"]) + len(tree["subtasks"])}
+
+
+def run_validate_epic(params):
+    from validate_decomposition_quality import validate_decomposition
+    results = validate_decomposition([params["epic_key"]]) or {}
+    return {"items": sum(len(items) for items in results.values()), "failed": 0 if results else 1}
+
+
+def run_cascade_delete(params):
+    from cascade_delete import cascade_delete
+    result = cascade_delete(params["epic_key"]) or {"deleted": [], "failed": {"-": "查询失败"}}
+    return {"items": len(result["deleted"]), "failed": len(result["failed"])}
+
+
+def seed_discover_hierarchy(store, options):
+    store.seed_tree(PROJECT, epics=2, stories=options.stories // 2 or 1, subtasks=options.per_story)
+    return {"project": PROJECT}
+
+
+def run_discover_hierarchy(params):
+    from discover_hierarchy import discover_hierarchy
+    root = discover_hierarchy(params["project"])
+    return {"items": sum(root.rollup.values()), "failed": 0}
+
+
+def seed_execute_plan(store, options):
+    stories = max(1, options.stories // 2)
+    per_story = max(1, options.subtasks // stories)
+    nodes = [{"id": "epic", "type": "epic", "summary": "基准Epic", "description": DESCRIPTION}]
+    for s in range(stories):
+        nodes.append({"id": f"s{s}", "type": "story", "parent": "$epic", "summary": f"Story {s + 1}",
+                      "description": DESCRIPTION})
+        for r in range(per_story):
+            nodes.append({"id": f"r{s}-{r}", "type": "subtask", "parent": f"$s{s}", "summary": f"子需求 {r + 1}",
+                          "description": DESCRIPTION})
+            nodes.append({"id": f"d{s}-{r}", "type": "task", "implements": f"$r{s}-{r}", "summary": f"实现 {r + 1}",
+                          "description": DESCRIPTION})
+    return {"plan": {"project": PROJECT, "nodes": nodes}, "issues": len(nodes)}
+
+
+def run_execute_plan(params):
+    from execute_plan import execute_plan
+    with open("plan.json", "w", encoding="utf-8") as f:
+        json.dump(params["plan"], f, ensure_ascii=False)
+    created = execute_plan("plan.json") or {}
+    return {"items": len(created), "failed": params["issues"] - len(created)}
+
+
+SCENARIOS = {
+    "decompose_story": (seed_decompose_story, run_decompose_story),
+    "create_dev_tasks": (seed_create_dev_tasks, run_create_dev_tasks),
+    "create_dev_tasks_bulk": (seed_create_dev_tasks, run_create_dev_tasks_bulk),
+    "validate_epic": (seed_epic_tree, run_validate_epic),
+    "cascade_delete": (seed_epic_tree, run_cascade_delete),
+    "discover_hierarchy": (seed_discover_hierarchy, run_discover_hierarchy),
+    "execute_plan": (seed_execute_plan, run_execute_plan),
+}
+
+
+# ===== 子进程 =====
+
+def worker(scenario: str, params_path: str, result_path: str, verbose: bool):
+    """子进程入口：执行被测操作，把耗时与结果写入 result_path"""
+    sys.path[:0] = SCRIPT_DIRS
+    with open(params_path, "r", encoding="utf-8") as f:
+        params = json.load(f)
+
+    output = io.StringIO()
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(sys.stdout if verbose else output):
+        result = SCENARIOS[scenario][1](params)
+    result["wall"] = time.perf_counter() - started
+    with open(result_path, "w", encoding="utf-8") as f:
+        json.dump(result, f)
+
+
+def run_once(fake: FakeJira, scenario: str, options, workdir: str, index: int) -> dict:
+    fake.store.reset()
+    params = SCENARIOS[scenario][0](fake.store, options)
+    fake.reset_stats()
+
+    run_dir = os.path.join(workdir, f"{scenario}-{index}")
+    os.makedirs(run_dir)
+    params_path, result_path = os.path.join(run_dir, "params.json"), os.path.join(run_dir, "result.json")
+    with open(params_path, "w", encoding="utf-8") as f:
+        json.dump(params, f)
+
+    env = dict(os.environ, JIRA_MD_PATH=os.path.join(workdir, "jira.md"),
+               JIRA_PLUGIN_STATE_DIR=os.path.join(run_dir, "state"))
+    command = [sys.executable, os.path.abspath(__file__), "--worker", scenario, params_path, result_path]
+    if options.verbose:
+        command.append("--verbose")
+    completed = subprocess.run(command, env=env, cwd=run_dir)
+    if completed.returncode != 0:
+        raise RuntimeError(f"场景 {scenario} 执行失败（退出码 {completed.returncode}）")
+
+    with open(result_path, "r", encoding="utf-8") as f:
+        result = json.load(f)
+    stats = fake.stats()
+    return {**result, "requests": stats["requests"], "bytes_out": stats["bytes_in"], "bytes_in": stats["bytes_out"],
+            "rate_limited": stats["rate_limited"], "injected_errors": stats["injected_errors"],
+            "endpoints": stats["endpoints"]}
+
+
+def summarize(runs: list) -> dict:
+    """多次运行取耗时中位数；请求数与字节数取最后一次（同一输入下应保持一致）"""
+    summary = dict(runs[-1])
+    summary["wall"] = statistics.median(run["wall"] for run in runs)
+    summary["wall_runs"] = [round(run["wall"], 4) for run in runs]
+    return summary
+
+
+def print_table(results: dict, baseline: dict = None):
+    header = f"{'场景':<20}{'耗时(s)':>10}{'请求数':>8}{'上行KB':>10}{'下行KB':>10}{'429':>6}{'注入错误':>8}{'条目':>6}{'失败':>6}"
+    print(header)
+    print("-" * 96)
+    for name, result in results.items():
+        line = (f"{name:<20}{result['wall']:>10.3f}{result['requests']:>8}{result['bytes_out'] / 1024:>10.1f}"
+                f"{result['bytes_in'] / 1024:>10.1f}{result['rate_limited']:>6}{result['injected_errors']:>8}"
+                f"{result['items']:>6}{result['failed']:>6}")
+        base = (baseline or {}).get(name)
+        if base:
+            line += (f"   Δ耗时 {_delta(result['wall'], base['wall'])}  Δ请求 {_delta(result['requests'], base['requests'])}"
+                     f"  Δ字节 {_delta(result['bytes_in'] + result['bytes_out'], base['bytes_in'] + base['bytes_out'])}")
+        print(line)
+
+
+def _delta(current, base):
+    if not base:
+        return "n/a"
+    return f"{(current - base) / base * 100:+.1f}%"
+
+
+def print_endpoints(results: dict):
+    for name, result in results.items():
+        print(f"\n📊 {name}")
+        for endpoint, entry in sorted(result["endpoints"].items(), key=lambda item: -item[1]["requests"]):
+            print(f"   {entry['requests']:>5}  {entry['bytes_out'] / 1024:>8.1f}KB  {endpoint}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="插件脚本基准测试")
+    parser.add_argument("scenarios", nargs="*", help=f"要运行的场景，默认全部：{', '.join(SCENARIOS)}")
+    parser.add_argument("--subtasks", type=int, default=20, help="decompose_story / create_dev_tasks 的条目数")
+    parser.add_argument("--stories", type=int, default=10, help="Epic下的Story数量")
+    parser.add_argument("--per-story", type=int, default=5, help="每个Story的Subtask数量")
+    parser.add_argument("--latency", type=float, default=50, help="服务端固定延迟（毫秒）")
+    parser.add_argument("--jitter", type=float, default=0, help="服务端随机抖动（毫秒）")
+    parser.add_argument("--per-item", type=float, default=1, help="批量/搜索按条目额外延迟（毫秒）")
+    parser.add_argument("--rate-limit", type=float, default=0, help="服务端每秒请求数上限，0为不限流")
+    parser.add_argument("--burst", type=float, default=None)
+    parser.add_argument("--error-rate", type=float, default=0, help="服务端注入错误的概率")
+    parser.add_argument("--stall-rate", type=float, default=0, help="服务端请求长尾停顿的概率")
+    parser.add_argument("--stall-ms", type=float, default=2000, help="长尾停顿时长（毫秒）")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=1, help="每个场景重复次数，耗时取中位数")
+    parser.add_argument("--json", help="把结果写入JSON文件")
+    parser.add_argument("--compare", help="与之前 --json 输出的基线对比")
+    parser.add_argument("--endpoints", action="store_true", help="输出每个场景的接口明细")
+    parser.add_argument("--verbose", action="store_true", help="显示脚本自身的输出")
+    options = parser.parse_args()
+
+    unknown = [name for name in options.scenarios if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"未知场景: {', '.join(unknown)}")
+
+    fake = FakeJira(latency_ms=options.latency, jitter_ms=options.jitter, per_item_ms=options.per_item,
+                    rate_limit=options.rate_limit, burst=options.burst, error_rate=options.error_rate,
+                    seed=options.seed, stall_rate=options.stall_rate, stall_ms=options.stall_ms).start()
+    print(f"🧪 Fake JIRA: {fake.url}  延迟 {options.latency}ms  限流 {options.rate_limit or '无'}  "
+          f"错误率 {options.error_rate}")
+
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="jira-bench-") as workdir:
+        with open(os.path.join(workdir, "jira.md"), "w", encoding="utf-8") as f:
+            f.write(f'JIRA_DOMAIN = "{fake.url}"\nEMAIL = "bench@example.com"\nAPI_TOKEN = "bench"\n')
+        for name in options.scenarios or SCENARIOS:
+            runs = [run_once(fake, name, options, workdir, index) for index in range(options.repeat)]
+            results[name] = summarize(runs)
+    fake.stop()
+
+    baseline = None
+    if options.compare:
+        with open(options.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+    print()
+    print_table(results, baseline)
+    if options.endpoints:
+        print_endpoints(results)
+
+    if options.json:
+        with open(options.json, "w", encoding="utf-8") as f:
+            json.dump({"options": {k: v for k, v in vars(options).items() if k not in ("json", "compare")},
+                       "results": results}, f, ensure_ascii=False, indent=2)
+        print(f"\n💾 结果已写入 {options.json}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "--worker":
+        worker(sys.argv[2], sys.argv[3], sys.argv[4], "--verbose" in sys.argv)
+    else:
+        main()
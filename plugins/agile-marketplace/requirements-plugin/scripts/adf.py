@@ -0,0 +1,53 @@
+"""
+Atlassian Document Format (ADF) 工具函数
+注意：本模块在各插件的 scripts 目录中保持一致，修改时请同步。
+"""
+
+
+def text_to_adf(text: str) -> dict:
+    """将纯文本包装为单段落的ADF文档"""
+    return {
+        "type": "doc",
+        "version": 1,
+        "content": [
+            {"type": "paragraph", "content": [{"type": "text", "text": text}]}
+        ]
+    }
+
+
+# 这些块级节点结束后换行
+_BLOCK_NODES = {"paragraph", "heading", "blockquote", "codeBlock", "listItem", "tableRow", "panel", "rule"}
+
+
+def adf_to_text(node) -> str:
+    """提取ADF文档中的纯文本（单次遍历）；非ADF内容按字符串处理"""
+    if node is None:
+        return ""
+    if isinstance(node, str):
+        return node
+
+    parts = []
+    stack = [node]
+    while stack:
+        current = stack.pop()
+        if current == "\n":
+            parts.append("\n")
+            continue
+        if not isinstance(current, dict):
+            continue
+
+        node_type = current.get("type")
+        if node_type == "text":
+            parts.append(current.get("text", ""))
+        elif node_type == "hardBreak":
+            parts.append("\n")
+        elif node_type in ("mention", "emoji"):
+            attrs = current.get("attrs") or {}
+            parts.append(attrs.get("text") or attrs.get("shortName") or "")
+
+        if node_type in _BLOCK_NODES:
+            stack.append("\n")
+        stack.extend(reversed(current.get("content") or []))
+
+    lines = [line.strip() for line in "".join(parts).split("\n")]
+    return "\n".join(line for line in lines if line)
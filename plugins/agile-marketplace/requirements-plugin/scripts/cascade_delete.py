@@ -0,0 +1,132 @@
+"""
+级联删除Epic / Story及其全部下级issue
+
+先以少量查询收集整棵子树（根及其子issue一次查询，Story的Subtask再按 parent in (...) 分批查询），
+然后自底向上并发删除：先并发删除各Story（deleteSubtasks=true，连同其Subtask），最后删除根issue。
+
+用法：python cascade_delete.py <EPIC_KEY|STORY_KEY> [--dry-run]
+"""
+import sys
+import time
+
+from batch_journal import forget_issues
+from batch_runner import run_concurrently
+from create_subtask import read_jira_config
+from issue_cache import delete_issues
+from jira_client import JiraApiError, deadline, get_session, search_children
+from jira_metrics import jira_operation
+
+TREE_FIELDS = ["summary", "issuetype", "parent"]
+
+
+def _is_subtask(issue: dict) -> bool:
+    issuetype = issue["fields"].get("issuetype") or {}
+    if "subtask" in issuetype:
+        return bool(issuetype["subtask"])
+    return issuetype.get("name", "").lower() in ("subtask", "sub-task", "子任务")
+
+
+def collect_subtree(session, root_key: str) -> dict:
+    """
+    收集根issue的整棵子树
+    返回 {"root": issue, "stories": [issue, ...], "subtasks": {父key: [issue, ...]}}
+    """
+    first_level = list(search_children(session, [root_key], fields=TREE_FIELDS, include_parents=True))
+    root = next((issue for issue in first_level if issue["key"] == root_key), None)
+    if root is None:
+        return None
+
+    children = [issue for issue in first_level if issue["key"] != root_key]
+    stories = [issue for issue in children if not _is_subtask(issue)]
+    subtasks = {}
+    for issue in children:
+        if _is_subtask(issue):
+            subtasks.setdefault(root_key, []).append(issue)
+    for issue in search_children(session, [story["key"] for story in stories], fields=TREE_FIELDS,
+                                 prefetch=True):
+        parent_key = (issue["fields"].get("parent") or {}).get("key")
+        subtasks.setdefault(parent_key, []).append(issue)
+    return {"root": root, "stories": stories, "subtasks": subtasks}
+
+
+def _delete_with_subtasks(session, issue_key: str):
+    """删除issue及其Subtask，返回 (issue_key, 错误信息或None)"""
+    response = session.delete(f"/rest/api/3/issue/{issue_key}", params={"deleteSubtasks": "true"})
+    if response.status_code == 204:
+        return issue_key, None
+    return issue_key, f"{response.status_code} - {response.text}"
+
+
+@jira_operation("cascade_delete", summary=True)
+@deadline()
+def cascade_delete(root_key: str, dry_run: bool = False, max_workers: int = None):
+    """
+    级联删除Epic或Story及其全部下级issue
+    dry_run: 为True时只输出删除计划，不实际删除
+    返回汇总结果 {"deleted": [...], "failed": {key: 错误}, "planned": 数量}
+    """
+    config = read_jira_config()
+    if not config:
+        print("❌ 无法读取JIRA配置，删除失败")
+        return None
+    session = get_session(config["JIRA_DOMAIN"], config["EMAIL"], config["API_TOKEN"])
+
+    started = time.time()
+    try:
+        tree = collect_subtree(session, root_key)
+    except JiraApiError as e:
+        print(f"❌ 查询子树失败: {e}")
+        return None
+    if tree is None:
+        print(f"❌ 未找到: {root_key}")
+        return None
+
+    stories, subtasks = tree["stories"], tree["subtasks"]
+    subtask_count = sum(len(items) for items in subtasks.values())
+    planned = 1 + len(stories) + subtask_count
+    root_type = (tree["root"]["fields"].get("issuetype") or {}).get("name", "")
+
+    print(f"🗂  {root_type} {root_key}: {len(stories)} 个Story，{subtask_count} 个Subtask，共 {planned} 个issue")
+    if dry_run:
+        for story in stories:
+            print(f"   🗑 [{story['key']}] {story['fields'].get('summary', '')}（含 {len(subtasks.get(story['key'], []))} 个Subtask）")
+        for subtask in subtasks.get(root_key, []):
+            print(f"   🗑 [{subtask['key']}] {subtask['fields'].get('summary', '')}")
+        print(f"🔍 Dry-run：未执行删除，计划删除 {planned} 个issue")
+        return {"deleted": [], "failed": {}, "planned": planned}
+
+    deleted, failed = [], {}
+
+    # 自底向上：先并发删除Story（连同其Subtask），全部成功后再删除根issue
+    for key, error in run_concurrently(_delete_with_subtasks, [(session, s["key"]) for s in stories], max_workers):
+        if error:
+            failed[key] = error
+        else:
+            deleted.append(key)
+            deleted.extend(issue["key"] for issue in subtasks.get(key, []))
+
+    if failed:
+        print(f"⚠️ 有 {len(failed)} 个Story删除失败，保留 {root_key} 以免遗留孤立issue")
+    else:
+        key, error = _delete_with_subtasks(session, root_key)
+        if error:
+            failed[key] = error
+        else:
+            deleted.append(key)
+            deleted.extend(issue["key"] for issue in subtasks.get(key, []))
+
+    delete_issues(session, deleted)
+    forget_issues(deleted)
+
+    print(f"✅ 级联删除完成: 删除 {len(deleted)} / {planned} 个issue，耗时 {time.time() - started:.1f}s")
+    for key, error in failed.items():
+        print(f"❌ 删除失败 {key}: {error}")
+    return {"deleted": deleted, "failed": failed, "planned": planned}
+
+
+if __name__ == "__main__":
+    args = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    if not args:
+        print("用法: python cascade_delete.py <EPIC_KEY|STORY_KEY> [--dry-run]")
+        sys.exit(1)
+    cascade_delete(args[0], dry_run="--dry-run" in sys.argv)
@@ -1,8 +1,10 @@
-import requests
 import json
-from requests.auth import HTTPBasicAuth
 from pathlib import Path
 
+from jira_client import get_session
+from jira_metadata import resolve_issue_types
+from jira_metrics import jira_operation
+
 # ============ 你的JIRA信息 ============
 JIRA_DOMAIN = ""
 EMAIL = ""
@@ -19,11 +21,10 @@ def extract_epic_summary(requirements_file: str) -> str:
     else:
         return text[:500]
 
+@jira_operation("create_jira_epic")
 def create_jira_epic(summary: str, description: str):
     """在JIRA中创建Epic"""
-    url = f"https://{JIRA_DOMAIN}/rest/api/3/issue"
-    auth = HTTPBasicAuth(EMAIL, API_TOKEN)
-    headers = {"Accept": "application/json", "Content-Type": "application/json"}
+    session = get_session(JIRA_DOMAIN, EMAIL, API_TOKEN)
 
     payload = {
         "fields": {
@@ -41,7 +42,8 @@ def create_jira_epic(summary: str, description: str):
         }
     }
 
-    response = requests.post(url, data=json.dumps(payload), headers=headers, auth=auth)
+    resolve_issue_types(session, [payload])
+    response = session.post("/rest/api/3/issue", data=json.dumps(payload))
     if response.status_code == 201:
         print(f"✅ Epic 创建成功: {response.json()['key']}")
     else:
@@ -1,5 +1,8 @@
-import requests, json
-from requests.auth import HTTPBasicAuth
+import json
+
+from jira_client import get_session
+from jira_metadata import resolve_issue_types
+from jira_metrics import jira_operation
 
 # ===== Jira 配置 =====
 JIRA = ""
@@ -8,11 +11,10 @@ TOKEN = ""
 PROJECT = ""
 # =====================
 
+@jira_operation("create_story")
 def create_story(epic_id, summary, description=""):
     """创建 Team-managed 项目下的 Story，并绑定 Epic"""
-    url = f"https://{JIRA}/rest/api/3/issue"
-    auth = HTTPBasicAuth(EMAIL, TOKEN)
-    headers = {"Accept": "application/json", "Content-Type": "application/json"}
+    session = get_session(JIRA, EMAIL, TOKEN)
 
     payload = {
         "fields": {
@@ -30,7 +32,8 @@ def create_story(epic_id, summary, description=""):
         }
     }
 
-    r = requests.post(url, headers=headers, auth=auth, data=json.dumps(payload))
+    resolve_issue_types(session, [payload])
+    r = session.post("/rest/api/3/issue", data=json.dumps(payload))
     if r.status_code == 201:
         print(f"✅ Story 创建成功: {r.json()['key']}")
     else:
@@ -1,5 +1,7 @@
-import requests
-from requests.auth import HTTPBasicAuth
+from batch_journal import forget_issues
+from issue_cache import delete_issues
+from jira_client import get_session
+from jira_metrics import jira_operation
 
 # ============ 你的JIRA信息 ============
 JIRA_DOMAIN = ""
@@ -8,19 +10,20 @@ API_TOKEN = ""
 # ====================================
 
 
+@jira_operation("delete_jira_epic")
 def delete_jira_epic(epic_key: str):
     """
     删除指定的Epic。
     epic_key: 例如 "CMT-123"
     """
-    url = f"https://{JIRA_DOMAIN}/rest/api/3/issue/{epic_key}"
-    auth = HTTPBasicAuth(EMAIL, API_TOKEN)
-    headers = {"Accept": "application/json"}
+    session = get_session(JIRA_DOMAIN, EMAIL, API_TOKEN)
 
     print(f"🗑 正在删除 Epic: {epic_key} ...")
-    response = requests.delete(url, headers=headers, auth=auth)
+    response = session.delete(f"/rest/api/3/issue/{epic_key}")
 
     if response.status_code == 204:
+        delete_issues(session, [epic_key])
+        forget_issues([epic_key])
         print(f"✅ Epic 删除成功: {epic_key}")
     elif response.status_code == 404:
         print(f"❌ 未找到该 Epic: {epic_key}")
@@ -1,5 +1,7 @@
-import requests
-from requests.auth import HTTPBasicAuth
+from batch_journal import forget_issues
+from issue_cache import delete_issues
+from jira_client import JiraApiError, get_session, has_issues
+from jira_metrics import jira_operation
 
 # ===== Jira 配置 =====
 JIRA_DOMAIN = ""
@@ -9,27 +11,30 @@ TOKEN = ""
 
 def has_subtasks(story_key):
     """检查指定 Story 是否包含 Sub-task"""
-    url = f"https://{JIRA_DOMAIN}/rest/api/3/issue/{story_key}?fields=subtasks"
-    auth = HTTPBasicAuth(EMAIL, TOKEN)
-    headers = {"Accept": "application/json"}
-    r = requests.get(url, headers=headers, auth=auth)
-    if r.status_code != 200:
-        print(f"❌ 查询失败: {r.status_code} - {r.text}")
+    session = get_session(JIRA_DOMAIN, EMAIL, TOKEN)
+
+    # 删除前的检查直接查询JIRA：本地缓存可能还没有其他主机刚创建的子任务
+    try:
+        return has_issues(session, f"parent = {story_key}")
+    except JiraApiError as e:
+        print(f"❌ 查询失败: {e}")
         return None
-    data = r.json()
-    subtasks = data["fields"].get("subtasks", [])
-    return len(subtasks) > 0
 
+@jira_operation("delete_story")
 def delete_story(story_key):
     """删除 Story（若无子任务）"""
-    if has_subtasks(story_key):
-        print(f"⚠️ Story {story_key} 含有 Sub-task，禁止删除。请先删除子任务。")
+    children = has_subtasks(story_key)
+    if children is None:
+        print(f"❌ 无法确认 Story {story_key} 是否含有 Sub-task，未删除")
+        return
+    if children:
+        print(f"⚠️ Story {story_key} 含有 Sub-task，禁止删除。请先删除子任务，或使用 cascade_delete.py 级联删除。")
         return
-    url = f"https://{JIRA_DOMAIN}/rest/api/3/issue/{story_key}"
-    auth = HTTPBasicAuth(EMAIL, TOKEN)
-    headers = {"Accept": "application/json"}
-    r = requests.delete(url, headers=headers, auth=auth)
+    session = get_session(JIRA_DOMAIN, EMAIL, TOKEN)
+    r = session.delete(f"/rest/api/3/issue/{story_key}")
     if r.status_code == 204:
+        delete_issues(session, [story_key])
+        forget_issues([story_key])
         print(f"✅ Story 删除成功: {story_key}")
     else:
         print(f"❌ 删除失败: {r.status_code} - {r.text}")
@@ -1,5 +1,7 @@
-import requests
-from requests.auth import HTTPBasicAuth
+from batch_journal import forget_issues
+from issue_cache import delete_issues
+from jira_client import get_session
+from jira_metrics import jira_operation
 
 # ===== Jira 配置 =====
 JIRA_DOMAIN = ""
@@ -7,17 +9,17 @@ EMAIL = ""
 TOKEN = ""
 # =====================
 
+@jira_operation("delete_subtask")
 def delete_subtask(subtask_key: str):
     """
     删除指定 Sub-task
     subtask_key: Sub-task Key（如 CMT-4，注意这是JIRA系统生成的Key，不是TASK编号）
     """
-    url = f"https://{JIRA_DOMAIN}/rest/api/3/issue/{subtask_key}"
-    auth = HTTPBasicAuth(EMAIL, TOKEN)
-    headers = {"Accept": "application/json"}
-
-    response = requests.delete(url, headers=headers, auth=auth)
+    session = get_session(JIRA_DOMAIN, EMAIL, TOKEN)
+    response = session.delete(f"/rest/api/3/issue/{subtask_key}")
     if response.status_code == 204:
+        delete_issues(session, [subtask_key])
+        forget_issues([subtask_key])
         print(f"✅ Sub-task 删除成功: {subtask_key}")
     else:
         print(f"❌ 删除失败: {response.status_code} - {response.text}")
@@ -0,0 +1,246 @@
+"""
+子需求近似重复检测（MinHash + LSH）
+
+从Summary与描述（ADF转纯文本）提取特征：去掉 [REQ-...] 编号前缀并归一化后，
+中文等CJK文本取相邻两字，英文与数字按单词取字符三元组（Augmentation2 与 Augmentation 大部分相同）。
+每个issue计算 128 维 MinHash 签名，分成 32 段 × 4 行做 LSH 分桶：只有在某一段上完全相同的issue
+才比较签名，整个项目的查重近似线性时间，不做两两比较。
+项目中issue的签名保存在本地issue缓存的 minhash 表，文本未变化时不重新计算。
+  - find_duplicates()   项目内的近似重复对（默认只看 REQ/TASK 子需求）
+  - check_duplicates()  创建前检查，与项目中已缓存的子需求及同批条目比较；
+                        create_subtask.create_subtasks_bulk 创建前默认提示疑似重复
+环境变量：JIRA_DUPLICATE_THRESHOLD  相似度阈值（默认0.7）
+
+用法：python duplicate_detector.py scan <PROJECT_KEY> [--threshold 0.7] [--sync] [--all]
+     python duplicate_detector.py check <PROJECT_KEY> <标题> [描述]
+注意：本模块在各插件的 scripts 目录中保持一致，修改时请同步。
+"""
+import hashlib
+import os
+import re
+import sys
+import unicodedata
+from array import array
+from functools import lru_cache
+
+from issue_cache import connect
+
+DUPLICATE_THRESHOLD = float(os.environ.get("JIRA_DUPLICATE_THRESHOLD", "0.7"))
+
+NUM_PERM = 128
+BANDS = 32  # 每段4行：相似度0.7的issue成为候选的概率约99.9%，0.3时约23%
+
+_NUMBER_PREFIX = re.compile(r"^\s*\[(REQ|TASK|DEV)-[A-Z][A-Z0-9_]*-\d+(-\d+)?\]\s*")
+_TOKEN = re.compile(r"[぀-ヿ㐀-䶿一-鿿가-힯]+|[a-z0-9]+")
+_CJK = re.compile(r"[぀-ヿ㐀-䶿一-鿿가-힯]")
+
+
+def issue_text(summary: str, description: str = "") -> str:
+    """用于查重的文本：去掉编号前缀的Summary + 描述"""
+    return f"{_NUMBER_PREFIX.sub('', summary or '')}\n{description or ''}"
+
+
+def shingles(text: str) -> set:
+    """提取特征：CJK连续文本取相邻两字，英文/数字单词取首尾加边界的字符三元组"""
+    text = unicodedata.normalize("NFKC", text).lower()
+    result = set()
+    for token in _TOKEN.findall(text):
+        if _CJK.match(token):
+            result.update(token[i:i + 2] for i in range(max(1, len(token) - 1)))
+        else:
+            padded = f" {token} "
+            result.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return result
+
+
+@lru_cache(maxsize=65536)
+def _feature_hashes(feature: str) -> array:
+    """特征在 NUM_PERM 个独立哈希函数下的取值（shake_128 输出切分为32位整数，跨进程一致）"""
+    return array("I", hashlib.shake_128(feature.encode("utf-8")).digest(NUM_PERM * 4))
+
+
+def minhash(features: set) -> list:
+    """特征集合的MinHash签名：每个哈希函数取全部特征中的最小值（空集合返回None）"""
+    if not features:
+        return None
+    return list(map(min, zip(*(_feature_hashes(feature) for feature in features))))
+
+
+def signature_of(text: str) -> list:
+    return minhash(shingles(text))
+
+
+def similarity(first: list, second: list) -> float:
+    """两个签名估计的Jaccard相似度"""
+    return sum(1 for a, b in zip(first, second) if a == b) / NUM_PERM
+
+
+class LSHIndex:
+    """MinHash签名的LSH分桶索引"""
+
+    def __init__(self, bands: int = BANDS):
+        self.rows = NUM_PERM // bands
+        self.buckets = [{} for _ in range(bands)]  # 每段：段内签名 -> [key, ...]
+        self.signatures = {}
+        self.order = {}  # key -> 加入顺序，输出的key对按此排列
+
+    def _band_keys(self, signature: list):
+        return (tuple(signature[i * self.rows:(i + 1) * self.rows]) for i in range(len(self.buckets)))
+
+    def add(self, key, signature: list):
+        self.signatures[key] = signature
+        self.order.setdefault(key, len(self.order))
+        for bucket, band_key in zip(self.buckets, self._band_keys(signature)):
+            bucket.setdefault(band_key, []).append(key)
+
+    def query(self, signature: list, threshold: float = DUPLICATE_THRESHOLD) -> list:
+        """与签名相似度不低于阈值的已索引key [(key, 相似度)]，按相似度降序"""
+        candidates = set()
+        for bucket, band_key in zip(self.buckets, self._band_keys(signature)):
+            candidates.update(bucket.get(band_key, ()))
+        matches = [(key, similarity(signature, self.signatures[key])) for key in candidates]
+        return sorted((match for match in matches if match[1] >= threshold), key=lambda match: -match[1])
+
+    def pairs(self, threshold: float = DUPLICATE_THRESHOLD) -> list:
+        """索引内相似度不低于阈值的全部key对 [(key1, key2, 相似度)]，只比较同桶的候选"""
+        checked = set()
+        result = []
+        for bucket in self.buckets:
+            for keys in bucket.values():
+                for i, first in enumerate(keys):
+                    for second in keys[i + 1:]:
+                        pair = (first, second) if self.order[first] < self.order[second] else (second, first)
+                        if pair in checked:
+                            continue
+                        checked.add(pair)
+                        score = similarity(self.signatures[first], self.signatures[second])
+                        if score >= threshold:
+                            result.append((*pair, score))
+        return sorted(result, key=lambda item: -item[2])
+
+
+def similar_pairs(texts: dict, threshold: float = DUPLICATE_THRESHOLD) -> list:
+    """内存中查重：texts 为 {key: 文本}，返回 [(key1, key2, 相似度)]"""
+    index = LSHIndex()
+    for key, text in texts.items():
+        signature = signature_of(text)
+        if signature:
+            index.add(key, signature)
+    return index.pairs(threshold)
+
+
+def _digest(text: str) -> str:
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=8).hexdigest()
+
+
+def project_index(session, project_key: str, kinds=("REQ", "TASK")):
+    """
+    由本地缓存构建项目的LSH索引，返回 (LSHIndex, {key: {"summary", "parent"}})
+    kinds: 只索引带这些追溯编号的issue；为None时索引项目中全部已缓存的issue
+    签名按文本摘要保存在缓存中，只为新增或文本变化的issue重新计算
+    """
+    conn = connect(session)
+    if kinds:
+        marks = ",".join("?" * len(kinds))
+        rows = conn.execute(
+            "SELECT i.key, i.parent, i.summary, i.description, m.digest, m.signature FROM issues i "
+            "LEFT JOIN minhash m ON m.key = i.key WHERE i.project = ? AND EXISTS "
+            f"(SELECT 1 FROM trace t WHERE t.key = i.key AND t.kind IN ({marks})) ORDER BY CAST(i.id AS INTEGER)",
+            (project_key, *kinds)).fetchall()
+    else:
+        rows = conn.execute(
+            "SELECT i.key, i.parent, i.summary, i.description, m.digest, m.signature FROM issues i "
+            "LEFT JOIN minhash m ON m.key = i.key WHERE i.project = ? ORDER BY CAST(i.id AS INTEGER)",
+            (project_key,)).fetchall()
+
+    index, info, updates = LSHIndex(), {}, []
+    for row in rows:
+        text = issue_text(row["summary"], row["description"])
+        digest = _digest(text)
+        if row["digest"] == digest:
+            signature = list(array("I", row["signature"])) if row["signature"] else None
+        else:
+            signature = signature_of(text)
+            updates.append((row["key"], digest, array("I", signature).tobytes() if signature else None))
+        if signature:
+            index.add(row["key"], signature)
+            info[row["key"]] = {"summary": row["summary"], "parent": row["parent"]}
+    if updates:
+        with conn:
+            conn.executemany("INSERT OR REPLACE INTO minhash (key, digest, signature) VALUES (?, ?, ?)", updates)
+    return index, info
+
+
+def find_duplicates(session, project_key: str, threshold: float = DUPLICATE_THRESHOLD, kinds=("REQ", "TASK")) -> list:
+    """
+    项目内的近似重复对（基于本地缓存，需要时先 sync_project），按相似度降序：
+    [{"keys": (key1, key2), "similarity", "summaries": (...), "same_parent": bool}]
+    """
+    index, info = project_index(session, project_key, kinds)
+    return [{"keys": (first, second), "similarity": score,
+             "summaries": (info[first]["summary"], info[second]["summary"]),
+             "same_parent": info[first]["parent"] == info[second]["parent"]}
+            for first, second, score in index.pairs(threshold)]
+
+
+def check_duplicates(session, project_key: str, items: list, threshold: float = DUPLICATE_THRESHOLD) -> list:
+    """
+    创建前检查：items 为 [{"summary", "description"}]，与项目中已缓存的子需求及同批中排在前面的条目比较
+    返回与 items 对应的列表：无疑似重复为None，否则为最相似的一项
+    {"key": 已有issue的Key 或 None, "index": 同批条目下标 或 None, "summary", "similarity"}
+    """
+    index, info = project_index(session, project_key)
+    results = []
+    for position, item in enumerate(items):
+        signature = signature_of(issue_text(item.get("summary", ""), item.get("description", "")))
+        if not signature:
+            results.append(None)
+            continue
+        matches = index.query(signature, threshold)
+        if matches:
+            match, score = matches[0]
+            if isinstance(match, int):
+                results.append({"key": None, "index": match, "summary": items[match].get("summary", ""),
+                                "similarity": score})
+            else:
+                results.append({"key": match, "index": None, "summary": info[match]["summary"],
+                                "similarity": score})
+        else:
+            results.append(None)
+        index.add(position, signature)
+    return results
+
+
+if __name__ == "__main__":
+    from issue_cache import sync_project
+    from jira_client import session_from_config
+    from jira_config import load_jira_config
+
+    if len(sys.argv) < 3 or sys.argv[1] not in ("scan", "check") or (sys.argv[1] == "check" and len(sys.argv) < 4):
+        print("用法: python duplicate_detector.py scan <PROJECT_KEY> [--threshold 0.7] [--sync] [--all]")
+        print("     python duplicate_detector.py check <PROJECT_KEY> <标题> [描述]")
+        sys.exit(1)
+
+    session = session_from_config(load_jira_config([os.path.join(os.getcwd(), "jira.md")], required=True))
+    project = sys.argv[2]
+    threshold = float(sys.argv[sys.argv.index("--threshold") + 1]) if "--threshold" in sys.argv else DUPLICATE_THRESHOLD
+    if "--sync" in sys.argv:
+        print(f"🔄 增量同步 {project}: {sync_project(session, project)} 个issue")
+
+    if sys.argv[1] == "check":
+        match = check_duplicates(session, project, [{"summary": sys.argv[3],
+                                                     "description": sys.argv[4] if len(sys.argv) > 4 else ""}],
+                                 threshold)[0]
+        if match:
+            print(f"⚠️  疑似与 {match['key']} 重复（相似度 {match['similarity']:.2f}）: {match['summary']}")
+            sys.exit(2)
+        print("✅ 未发现疑似重复")
+        sys.exit(0)
+
+    duplicates = find_duplicates(session, project, threshold, kinds=None if "--all" in sys.argv else ("REQ", "TASK"))
+    for item in duplicates:
+        scope = "同一Story" if item["same_parent"] else "跨Story"
+        print(f"⚠️  {item['keys'][0]} ≈ {item['keys'][1]}  相似度 {item['similarity']:.2f}（{scope}）")
+        print(f"     {item['summaries'][0]}")
+        print(f"     {item['summaries'][1]}")
+    print(f"\n📊 {project}: 疑似重复 {len(duplicates)} 对（阈值 {threshold}）")
@@ -1,5 +1,6 @@
 import { exit } from 'process';
 import { readJiraConfig } from '../scripts/lib/config'
+import { isStatusChange, pendingEvents } from '../scripts/lib/webhookEvents'
 
 const cfg = (() => {
     try {
@@ -13,6 +14,7 @@ const cfg = (() => {
 if (!cfg) exit(0)
 
 const { domain } = cfg
+const baseUrl = domain.includes('://') ? domain : `https://${domain}`
 const auth = Buffer.from(`${cfg.email}:${cfg.apiToken}`).toString('base64');
 const headers = {
     'Authorization': `Basic ${auth}`,
@@ -30,37 +32,48 @@ async function checkAndNotify() {
                 .filter((s) => /^[A-Z][A-Z0-9]+-\d+$/.test(s))
             : []
         const projectKey = String(process.env.SPRINT_HOOK_PROJECT_KEY ?? cfg?.projectKey ?? '').trim()
-        const jql =
-            keys.length > 0
-                ? `key in (${keys.join(',')}) AND status = Done AND updated >= -5m ORDER BY updated DESC`
-                : projectKey
-                    ? `project = ${projectKey} AND status = Done AND updated >= -5m ORDER BY updated DESC`
-                    : 'status = Done AND updated >= -5m ORDER BY updated DESC';
-        const searchUrl = `https://${domain}/rest/api/3/search?jql=${encodeURIComponent(jql)}&maxResults=5`;
-        
-        const searchRes = await fetch(searchUrl, { headers });
-        if (!searchRes.ok) {
-            console.error(`[hook-dev] JIRA search failed: ${searchRes.status} ${searchRes.statusText}`)
-            return;
-        }
-
-        const searchData = await searchRes.json() as any;
-        const issues = searchData.issues || [];
+        const isSubtask = (issueType: string) =>
+            !issueType || issueType.toLowerCase() === 'sub-task' || issueType.toLowerCase() === 'subtask';
 
-        for (const issue of issues) {
-            const issueKey = issue.key;
+        // 1. Find subtasks that just moved to Done (webhook receiver events when it is running, otherwise search)
+        let issueKeys: string[] = [];
+        const pending = pendingEvents(baseUrl, 'dev-completion');
+        if (pending) {
+            issueKeys = [...new Set(pending.events
+                .filter((e) => isStatusChange(e, 'Done') && e.key && isSubtask(String(e.type ?? '')))
+                .filter((e) => keys.length > 0 ? keys.includes(e.key as string) : !projectKey || e.project === projectKey)
+                .map((e) => e.key as string))];
+        } else {
+            const jql =
+                keys.length > 0
+                    ? `key in (${keys.join(',')}) AND status = Done AND updated >= -5m ORDER BY updated DESC`
+                    : projectKey
+                        ? `project = ${projectKey} AND status = Done AND updated >= -5m ORDER BY updated DESC`
+                        : 'status = Done AND updated >= -5m ORDER BY updated DESC';
+            const searchUrl = `${baseUrl}/rest/api/3/search?jql=${encodeURIComponent(jql)}&maxResults=5`;
 
-            const issueType = String(issue.fields?.issuetype?.name ?? '');
-            if (issueType && issueType.toLowerCase() !== 'sub-task' && issueType.toLowerCase() !== 'subtask') {
-                continue;
+            const searchRes = await fetch(searchUrl, { headers });
+            if (!searchRes.ok) {
+                console.error(`[hook-dev] JIRA search failed: ${searchRes.status} ${searchRes.statusText}`)
+                return;
             }
 
+            const searchData = await searchRes.json() as any;
+            issueKeys = (searchData.issues || [])
+                .filter((issue: any) => isSubtask(String(issue.fields?.issuetype?.name ?? '')))
+                .map((issue: any) => issue.key);
+        }
+
+        // 处理失败的 issue 不推进游标，下次运行重试（已通知检查保证重复处理安全）
+        const failedKeys: string[] = [];
+        for (const issueKey of issueKeys) {
             // 2. Check comments to avoid duplicate notifications
-            const commentUrl = `https://${domain}/rest/api/3/issue/${issueKey}/comment`;
+            const commentUrl = `${baseUrl}/rest/api/3/issue/${issueKey}/comment`;
             const commentRes = await fetch(commentUrl, { headers });
             
             if (!commentRes.ok) {
                 console.error(`[hook-dev] Get comments failed for ${issueKey}: ${commentRes.status} ${commentRes.statusText}`)
+                failedKeys.push(issueKey);
                 continue;
             }
 
@@ -101,11 +114,13 @@ async function checkAndNotify() {
             });
             if (!postRes.ok) {
                 console.error(`[hook-dev] Post comment failed for ${issueKey}: ${postRes.status} ${postRes.statusText}`)
+                failedKeys.push(issueKey);
                 continue;
             }
 
             console.error(`✓ Auto-notification sent for ${issueKey}`);
         }
+        pending?.commit(failedKeys);
 
     } catch (error) {
         console.error(`[hook-dev] Unexpected error: ${String((error as any)?.message ?? error)}`)
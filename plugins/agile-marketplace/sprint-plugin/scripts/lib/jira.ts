@@ -1,3 +1,5 @@
+import { findIssueType, IssueTypeMeta, JiraMetadataCache, workflowKey } from './jiraMetadata'
+
 export type JiraIssue = {
   id: string
   key: string
@@ -29,20 +31,32 @@ export type JiraBoard = {
 export type JiraTransition = {
   id: string
   name: string
+  to?: { id?: string | null; name?: string | null }
+}
+
+export class JiraHttpError extends Error {
+  constructor(public readonly status: number, message: string) {
+    super(message)
+  }
 }
 
 export class JiraClient {
-  private readonly domain: string
+  private readonly baseUrl: string
   private readonly authHeader: string
+  private readonly metadata: JiraMetadataCache
+  // 本进程读取过的issue的类型与状态，用于定位缓存的工作流转换
+  private readonly issueStates = new Map<string, { type: string; status: string }>()
 
   constructor(params: { domain: string; email: string; apiToken: string }) {
-    this.domain = params.domain
+    // 允许 JIRA_DOMAIN 带协议（如本地替身服务 http://127.0.0.1:8080）
+    this.baseUrl = params.domain.includes('://') ? params.domain : `https://${params.domain}`
     const token = Buffer.from(`${params.email}:${params.apiToken}`).toString('base64')
     this.authHeader = `Basic ${token}`
+    this.metadata = new JiraMetadataCache(this.baseUrl)
   }
 
   public async requestJson<T>(method: string, path: string, body?: unknown): Promise<T> {
-    const url = `https://${this.domain}${path.startsWith('/') ? path : `/${path}`}`
+    const url = `${this.baseUrl}${path.startsWith('/') ? path : `/${path}`}`
     const res = await fetch(url, {
       method,
       headers: {
@@ -55,7 +69,7 @@ export class JiraClient {
 
     if (!res.ok) {
       const text = await res.text().catch(() => '')
-      throw new Error(`JIRA API error ${res.status} ${res.statusText}: ${text.slice(0, 500)}`)
+      throw new JiraHttpError(res.status, `JIRA API error ${res.status} ${res.statusText}: ${text.slice(0, 500)}`)
     }
 
     // Handle empty responses (e.g., 204 No Content)
@@ -138,6 +152,7 @@ export class JiraClient {
         `/rest/agile/1.0/sprint/${sprintId}/issue?startAt=${startAt}&maxResults=${maxResults}`
       )
       issues.push(...(data.issues ?? []))
+      this.rememberIssues(data.issues ?? [])
       startAt += data.maxResults
       if (issues.length >= data.total) break
     }
@@ -146,7 +161,9 @@ export class JiraClient {
   }
 
   async getIssue(issueKey: string): Promise<JiraIssue> {
-    return await this.requestJson<JiraIssue>('GET', `/rest/api/3/issue/${encodeURIComponent(issueKey)}`)
+    const issue = await this.requestJson<JiraIssue>('GET', `/rest/api/3/issue/${encodeURIComponent(issueKey)}`)
+    this.rememberIssues([issue])
+    return issue
   }
 
   async searchIssuesByJql(jql: string, maxResults = 50): Promise<JiraIssue[]> {
@@ -154,6 +171,7 @@ export class JiraClient {
       'GET',
       `/rest/api/3/search?jql=${encodeURIComponent(jql)}&maxResults=${maxResults}`
     )
+    this.rememberIssues(data.issues ?? [])
     return data.issues ?? []
   }
 
@@ -185,16 +203,76 @@ export class JiraClient {
     return data.transitions ?? []
   }
 
+  // 已知issue的类型与状态时使用缓存的转换id直接提交（一次请求），被拒绝时说明本地状态已过期，
+  // 重新获取转换列表后重试一次（不再写入该工作流键）
   async transitionIssue(issueKey: string, transitionName: string): Promise<void> {
-    const transitions = await this.getTransitions(issueKey)
-    const target = transitions.find((t) => t.name.toLowerCase() === transitionName.toLowerCase())
-    if (!target) {
-      const names = transitions.map((t) => t.name).join(', ')
-      throw new Error(`Transition not found for ${issueKey}: ${transitionName}. Available: ${names}`)
+    const state = this.issueStates.get(issueKey)
+    const key = state ? workflowKey(issueKey.replace(/-\d+$/, ''), state.type, state.status) : undefined
+
+    for (const refresh of [false, true]) {
+      let transitions = key && !refresh ? this.metadata.getTransitions(key) : undefined
+      if (!transitions) {
+        transitions = await this.getTransitions(issueKey)
+        if (key && !refresh) this.metadata.setTransitions(key, transitions)
+      }
+      const target = transitions.find((t) => t.name.toLowerCase() === transitionName.toLowerCase())
+      if (!target) {
+        if (refresh || !key) {
+          const names = transitions.map((t) => t.name).join(', ')
+          throw new Error(`Transition not found for ${issueKey}: ${transitionName}. Available: ${names}`)
+        }
+        this.issueStates.delete(issueKey)
+        continue
+      }
+      try {
+        await this.requestJson('POST', `/rest/api/3/issue/${encodeURIComponent(issueKey)}/transitions`, {
+          transition: { id: target.id }
+        })
+      } catch (error) {
+        const stale = error instanceof JiraHttpError && [400, 404, 409].includes(error.status)
+        if (refresh || !key || !stale) throw error
+        this.issueStates.delete(issueKey)
+        continue
+      }
+      if (state && !refresh && target.to?.name) this.issueStates.set(issueKey, { ...state, status: target.to.name })
+      return
     }
-    await this.requestJson('POST', `/rest/api/3/issue/${encodeURIComponent(issueKey)}/transitions`, {
-      transition: { id: target.id }
-    })
+  }
+
+  private rememberIssues(issues: JiraIssue[]): void {
+    for (const issue of issues) {
+      const type = issue.fields?.issuetype?.name
+      const status = issue.fields?.status?.name
+      if (issue.key && type && status) this.issueStates.set(issue.key, { type, status })
+    }
+  }
+
+  async getIssueTypes(projectKey: string): Promise<IssueTypeMeta[]> {
+    const cached = this.metadata.getIssueTypes(projectKey)
+    if (cached) return cached
+    const data = await this.requestJson<{ issueTypes?: any[]; values?: any[] }>(
+      'GET',
+      `/rest/api/3/issue/createmeta/${encodeURIComponent(projectKey)}/issuetypes?maxResults=200`
+    )
+    const items: IssueTypeMeta[] = (data.issueTypes ?? data.values ?? []).map((t) => ({
+      id: String(t.id),
+      name: String(t.name ?? ''),
+      subtask: Boolean(t.subtask),
+      hierarchyLevel: t.hierarchyLevel ?? null
+    }))
+    this.metadata.setIssueTypes(projectKey, items)
+    return items
+  }
+
+  // 按项目的实际类型解析为 { id }；元数据不可用或找不到时保留名称
+  async issueTypeRef(projectKey: string, name: string): Promise<{ id: string } | { name: string }> {
+    try {
+      const match = findIssueType(await this.getIssueTypes(projectKey), name)
+      if (match) return { id: match.id }
+    } catch {
+      // 元数据获取失败时按名称创建
+    }
+    return { name }
   }
 
   async updateIssueFields(issueKey: string, fields: Record<string, unknown>): Promise<void> {
@@ -227,7 +305,7 @@ export class JiraClient {
       fields: {
         project: { key: params.projectKey },
         summary: params.summary,
-        issuetype: { name: 'Bug' },
+        issuetype: await this.issueTypeRef(params.projectKey, 'Bug'),
         ...(params.priorityName ? { priority: { name: params.priorityName } } : {}),
         ...(description ? { description } : {}),
         ...(components.length > 0 ? { components } : {}),
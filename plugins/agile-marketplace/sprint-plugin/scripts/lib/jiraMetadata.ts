@@ -0,0 +1,117 @@
+import { existsSync, mkdirSync, readFileSync, renameSync, writeFileSync } from 'fs'
+import { homedir } from 'os'
+import { join } from 'path'
+
+// 与 Python 脚本的 jira_metadata.py 共用同一个元数据文件（状态目录下的 jira-metadata-<站点>.json）。
+// Python 侧写入时持有 local_state.file_lock（flock），Node 没有对应的文件锁，因此这里的写入不加锁：
+// 与 Python 同时写入时双方都可能丢失对方刚写入的条目。丢失的条目只会在下次使用时重新请求，
+// 为把影响限制在可重新获取的工作流转换上，TS 侧只写 transitions，issue类型只在进程内缓存。
+const METADATA_TTL_MS = Number(process.env.JIRA_METADATA_TTL ?? '86400') * 1000
+
+export type IssueTypeMeta = {
+  id: string
+  name: string
+  subtask: boolean
+  hierarchyLevel?: number | null
+}
+
+export type TransitionMeta = {
+  id: string
+  name: string
+  to?: { id?: string | null; name?: string | null }
+}
+
+type Entry<T> = { fetched_at: number; items: T }
+
+type MetadataFile = {
+  projects: Record<string, { issue_types?: Entry<IssueTypeMeta[]>; required_fields?: Record<string, unknown> }>
+  transitions: Record<string, Entry<TransitionMeta[]>>
+}
+
+const ISSUE_TYPE_ALIASES: string[][] = [
+  ['subtask', 'sub-task', '子任务', '子需求'],
+  ['story', '故事', '用户故事'],
+  ['epic', '长篇故事', '史诗'],
+  ['task', '任务'],
+  ['bug', '缺陷', '故障']
+]
+
+export function stateDir(): string {
+  const dir = process.env.JIRA_PLUGIN_STATE_DIR || join(homedir(), '.cache', 'jira-plugins')
+  mkdirSync(dir, { recursive: true })
+  return dir
+}
+
+export function workflowKey(projectKey: string, issueType: string, status: string): string {
+  return `${projectKey}/${issueType}/${status}`
+}
+
+export function findIssueType(types: IssueTypeMeta[], name: string): IssueTypeMeta | undefined {
+  const wanted = name.toLowerCase()
+  const exact = types.find((t) => t.name.toLowerCase() === wanted)
+  if (exact) return exact
+  const group = ISSUE_TYPE_ALIASES.find((names) => names.includes(wanted)) ?? []
+  const alias = types.find((t) => group.includes(t.name.toLowerCase()))
+  if (alias) return alias
+  if (group.includes('subtask')) return types.find((t) => t.subtask)
+  if (group.includes('epic')) return types.find((t) => t.hierarchyLevel === 1)
+  return undefined
+}
+
+export class JiraMetadataCache {
+  private readonly filePath: string
+  private readonly issueTypes = new Map<string, Entry<IssueTypeMeta[]>>()
+
+  constructor(baseUrl: string) {
+    const host = new URL(baseUrl).host.replace(/[^A-Za-z0-9.-]/g, '_')
+    this.filePath = join(stateDir(), `jira-metadata-${host}.json`)
+  }
+
+  private read(): MetadataFile {
+    try {
+      if (existsSync(this.filePath)) {
+        const data = JSON.parse(readFileSync(this.filePath, 'utf8'))
+        return { projects: data.projects ?? {}, transitions: data.transitions ?? {} }
+      }
+    } catch {
+      // 文件损坏时视为空缓存
+    }
+    return { projects: {}, transitions: {} }
+  }
+
+  // 读取-修改-原子写回，保留其他进程此前写入的条目（不加锁，见文件头说明）
+  private update(mutate: (data: MetadataFile) => void): void {
+    const data = this.read()
+    mutate(data)
+    const tmpPath = `${this.filePath}.${process.pid}.tmp`
+    writeFileSync(tmpPath, JSON.stringify(data, null, 2), 'utf8')
+    renameSync(tmpPath, this.filePath)
+  }
+
+  private fresh<T>(entry: Entry<T> | undefined): entry is Entry<T> {
+    return Boolean(entry) && Date.now() - (entry as Entry<T>).fetched_at * 1000 <= METADATA_TTL_MS
+  }
+
+  getIssueTypes(projectKey: string): IssueTypeMeta[] | undefined {
+    const entry = this.read().projects[projectKey]?.issue_types
+    if (this.fresh(entry)) return entry.items
+    const local = this.issueTypes.get(projectKey)
+    return this.fresh(local) ? local.items : undefined
+  }
+
+  // 只在进程内缓存：不写共享文件，避免无锁写入覆盖 Python 侧的项目元数据
+  setIssueTypes(projectKey: string, items: IssueTypeMeta[]): void {
+    this.issueTypes.set(projectKey, { fetched_at: Date.now() / 1000, items })
+  }
+
+  getTransitions(key: string): TransitionMeta[] | undefined {
+    const entry = this.read().transitions[key]
+    return this.fresh(entry) ? entry.items : undefined
+  }
+
+  setTransitions(key: string, items: TransitionMeta[]): void {
+    this.update((data) => {
+      data.transitions[key] = { fetched_at: Date.now() / 1000, items }
+    })
+  }
+}
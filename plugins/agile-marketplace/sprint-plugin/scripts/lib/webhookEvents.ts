@@ -0,0 +1,96 @@
+import { existsSync, readFileSync, renameSync, writeFileSync } from 'fs'
+import { join } from 'path'
+import { stateDir } from './jiraMetadata'
+
+// 读取 jira_webhook_receiver.py 写入的事件（状态目录下的 webhook-events-<站点>.jsonl）。
+// 接收器运行且心跳新鲜时，hook 按各自的游标读取新事件，不再轮询 JIRA 搜索。
+const HEARTBEAT_TIMEOUT_MS = 60 * 1000
+// 首次读取（没有游标）时只处理最近这段时间内的事件，与轮询时的 updated >= -5m 一致
+const INITIAL_WINDOW_MS = 5 * 60 * 1000
+
+export type WebhookChange = { field: string; from?: string | null; to?: string | null }
+
+export type WebhookEvent = {
+  seq: number
+  ts: number
+  event: string
+  key?: string
+  id?: string
+  project?: string
+  type?: string
+  status?: string
+  parent?: string
+  changes?: WebhookChange[]
+  link_id?: string
+  inward?: string
+  outward?: string
+}
+
+function siteName(baseUrl: string): string {
+  return new URL(baseUrl).host.replace(/[^A-Za-z0-9_.-]/g, '_')
+}
+
+function readJson(path: string): any {
+  try {
+    return existsSync(path) ? JSON.parse(readFileSync(path, 'utf8')) : undefined
+  } catch {
+    return undefined
+  }
+}
+
+export function receiverActive(baseUrl: string): boolean {
+  const status = readJson(join(stateDir(), `webhook-receiver-${siteName(baseUrl)}.json`))
+  return Boolean(status) && Date.now() - Number(status.heartbeat ?? 0) * 1000 <= HEARTBEAT_TIMEOUT_MS
+}
+
+export function readWebhookEvents(baseUrl: string, after = 0): WebhookEvent[] {
+  const path = join(stateDir(), `webhook-events-${siteName(baseUrl)}.jsonl`)
+  const events: WebhookEvent[] = []
+  for (const candidate of [`${path}.1`, path]) {
+    if (!existsSync(candidate)) continue
+    for (const line of readFileSync(candidate, 'utf8').split('\n')) {
+      if (!line.trim()) continue
+      try {
+        const event = JSON.parse(line) as WebhookEvent
+        if (event.seq > after) events.push(event)
+      } catch {
+        // 忽略写入中途的半行
+      }
+    }
+  }
+  return events
+}
+
+// 状态变为 toStatus 的 issue_updated 事件
+export function isStatusChange(event: WebhookEvent, toStatus: string): boolean {
+  return (
+    event.event === 'jira:issue_updated' &&
+    (event.changes ?? []).some((c) => c.field === 'status' && String(c.to ?? '').toLowerCase() === toStatus.toLowerCase())
+  )
+}
+
+// 接收器未运行时返回 undefined（调用方回退到轮询）；处理完事件后调用 commit() 推进该消费者的游标。
+// commit(failedKeys) 只推进到第一个处理失败的 issue 的事件之前，下次运行从该事件重新处理
+export function pendingEvents(
+  baseUrl: string,
+  consumer: string
+): { events: WebhookEvent[]; commit: (failedKeys?: Iterable<string>) => void } | undefined {
+  if (!receiverActive(baseUrl)) return undefined
+  const cursorPath = join(stateDir(), `webhook-cursor-${consumer}-${siteName(baseUrl)}.json`)
+  const cursor = readJson(cursorPath)
+  const unread = readWebhookEvents(baseUrl, typeof cursor?.seq === 'number' ? cursor.seq : 0)
+  const since = (Date.now() - INITIAL_WINDOW_MS) / 1000
+  const events = typeof cursor?.seq === 'number' ? unread : unread.filter((e) => e.ts >= since)
+  return {
+    events,
+    commit: (failedKeys = []) => {
+      const failed = new Set(failedKeys)
+      const firstFailed = events.find((e) => e.key !== undefined && failed.has(e.key))
+      const last = firstFailed ? firstFailed.seq - 1 : unread.length > 0 ? unread[unread.length - 1].seq : undefined
+      if (typeof last !== 'number' || (typeof cursor?.seq === 'number' && last <= cursor.seq)) return
+      const tmpPath = `${cursorPath}.${process.pid}.tmp`
+      writeFileSync(tmpPath, JSON.stringify({ seq: last, updated_at: Date.now() / 1000 }), 'utf8')
+      renameSync(tmpPath, cursorPath)
+    }
+  }
+}
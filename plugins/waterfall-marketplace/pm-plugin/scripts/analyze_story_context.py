@@ -1,46 +1,57 @@
-import requests
 import json
-from requests.auth import HTTPBasicAuth
+
+from adf import adf_to_text
+from issue_cache import CACHE_FIELDS, get_cached_children, get_cached_issue, upsert_issues
+from jira_client import JiraApiError, search_children, session_from_config
+from jira_config import load_jira_config
+from jira_metrics import jira_operation
 
 def read_jira_config():
     """读取当前目录下的jira.md配置文件"""
-    with open("jira.md", "r") as f:
-        content = f.read()
-
-    config = {}
-    for line in content.split('\n'):
-        if '=' in line:
-            key, value = line.split('=', 1)
-            config[key.strip()] = value.strip().strip('\"\'')
-
-    return config
+    return load_jira_config(["jira.md"], required=True)
 
+@jira_operation("get_story_details")
 def get_story_details(story_key: str):
     """获取Story详情"""
     config = read_jira_config()
 
-    JIRA_DOMAIN = config["JIRA_DOMAIN"]
-    EMAIL = config["EMAIL"]
-    API_TOKEN = config["API_TOKEN"]
-
-    url = f"https://{JIRA_DOMAIN}/rest/api/3/issue/{story_key}?fields=summary,description,parent,subtasks"
-    auth = HTTPBasicAuth(EMAIL, API_TOKEN)
-    headers = {"Accept": "application/json"}
+    session = session_from_config(config)
 
-    response = requests.get(url, headers=headers, auth=auth)
-
-    if response.status_code == 200:
-        data = response.json()
+    # 优先使用本地issue缓存（项目近期同步过时）
+    story = get_cached_issue(session, story_key)
+    children = get_cached_children(session, story_key)
+    if story and children is not None:
         return {
             "story_key": story_key,
-            "summary": data["fields"].get("summary", ""),
-            "description": data["fields"].get("description", ""),
-            "parent_epic": data["fields"].get("parent", {}).get("key", "") if data["fields"].get("parent") else "",
-            "subtasks": data["fields"].get("subtasks", [])
+            "summary": story["summary"],
+            "description": story["description"],
+            "parent_epic": story["parent"],
+            "subtasks": [{"key": c["key"], "fields": {"summary": c["summary"], "status": {"name": c["status"]}}}
+                         for c in children]
         }
-    else:
-        print(f"❌ 获取Story详情失败: {response.text}")
+
+    # 一次查询取回Story及其全部子issue（逐页跟随翻页，不受subtasks字段条数限制）
+    try:
+        issues = list(search_children(session, [story_key], fields=CACHE_FIELDS, include_parents=True, hedge=True))
+    except JiraApiError as e:
+        print(f"❌ 获取Story详情失败: {e.text}")
+        return None
+    upsert_issues(session, issues)
+
+    story = next((issue for issue in issues if issue["key"] == story_key), None)
+    if story is None:
+        print(f"❌ 获取Story详情失败: 未找到 {story_key}")
         return None
+    fields = story["fields"]
+    return {
+        "story_key": story_key,
+        "summary": fields.get("summary", ""),
+        "description": adf_to_text(fields.get("description")),
+        "parent_epic": fields.get("parent", {}).get("key", "") if fields.get("parent") else "",
+        "subtasks": [{"key": issue["key"], "fields": {"summary": issue["fields"].get("summary", ""),
+                                                      "status": issue["fields"].get("status") or {}}}
+                     for issue in issues if issue["key"] != story_key]
+    }
 
 def analyze_story_context(story_key: str):
     """分析Story上下文"""
@@ -0,0 +1,234 @@
+"""
+批量变更操作日志（write-ahead log）
+
+每类批量操作（create_subtask、create_development_task、execute_plan ...）在状态目录下
+维护一个只追加的 journal-<名称>.jsonl：执行变更前先写入 planned 记录（含幂等键与请求内容），
+成功后写入 done 记录（含结果）。中断后重新执行同一批次时：
+  - done 的步骤先用一次 key in (...) 搜索确认记录的issue仍然存在，存在的直接返回记录的结果，
+    已被删除的作废后按新步骤重新执行；
+  - planned 但未确认的创建步骤，按写入issue的 idem-<幂等键> 标签一次查询核对，
+    已创建的补记为 done，未创建的沿用计划中的payload（编号不变）重新提交。
+删除issue或链接的脚本调用 forget_issues() / forget_links() 作废各日志中指向它们的完成记录。
+
+用法：python batch_journal.py status|clear <名称>
+注意：本模块在各插件的 scripts 目录中保持一致，修改时请同步。
+"""
+import hashlib
+import json
+import os
+import re
+import sys
+import time
+
+from batch_runner import run_concurrently
+from jira_client import JiraApiError, search_issues
+from local_state import file_lock, state_dir, state_path
+
+IDEM_LABEL_PREFIX = "idem-"
+LINK_ARROW = " → "  # 链接步骤的结果记为 "源Key → 目标Key"
+
+_ISSUE_KEY = re.compile(r"^[A-Z][A-Z0-9_]*-\d+$")
+
+
+def idempotency_key(*parts) -> str:
+    """由操作内容生成稳定的幂等键，相同输入重复执行得到相同的键"""
+    raw = "\x1f".join(str(part) for part in parts)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:16]
+
+
+def idem_label(key: str) -> str:
+    """写入创建payload的幂等标签，用于崩溃后核对创建是否已生效"""
+    return f"{IDEM_LABEL_PREFIX}{key}"
+
+
+class BatchJournal:
+    """某一类批量操作的只追加日志"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.path = state_path(f"journal-{name}.jsonl")
+        self.entries = {}   # 幂等键 -> 最新记录
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue  # 崩溃时可能留下半行，忽略
+                    self.entries[record["key"]] = record
+        except OSError:
+            pass
+
+    def _append(self, records: list):
+        if not records:
+            return
+        with file_lock(f"journal-{self.name}"):
+            with open(self.path, "a", encoding="utf-8") as f:
+                for record in records:
+                    f.write(json.dumps(record, ensure_ascii=False) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+        for record in records:
+            self.entries[record["key"]] = record
+
+    def result(self, key: str):
+        """已完成步骤的结果，未完成返回None"""
+        record = self.entries.get(key)
+        return record["result"] if record and record["status"] == "done" else None
+
+    def planned(self, key: str):
+        """已计划但未确认完成的步骤记录"""
+        record = self.entries.get(key)
+        return record if record and record["status"] == "planned" else None
+
+    def plan(self, key: str, data: dict = None):
+        self.plan_many([(key, data)])
+
+    def plan_many(self, items: list):
+        """批量写入计划记录 [(幂等键, 数据), ...]，在发起请求前调用"""
+        now = time.time()
+        self._append([{"key": key, "status": "planned", "data": data or {}, "ts": now} for key, data in items])
+
+    def done(self, key: str, result=None):
+        self.done_many([(key, result)])
+
+    def done_many(self, items: list):
+        """批量写入完成记录 [(幂等键, 结果), ...]"""
+        now = time.time()
+        self._append([{"key": key, "status": "done", "result": result if result is not None else True, "ts": now}
+                      for key, result in items])
+
+    def invalidate(self, keys: list, reason: str):
+        """作废步骤（记录为 cleared），之后 result() / planned() 都返回None，按新步骤重新执行"""
+        now = time.time()
+        self._append([{"key": key, "status": "cleared", "reason": reason, "ts": now} for key in keys])
+
+    def done_targets(self, keys=None) -> dict:
+        """已完成步骤记录的issue Key：{幂等键: [Key, ...]}（链接步骤为两端的Key）"""
+        targets = {}
+        for key in (self.entries if keys is None else keys):
+            result = self.result(key)
+            if isinstance(result, dict) and isinstance(result.get("key"), str):
+                targets[key] = [part for part in result["key"].split(LINK_ARROW) if _ISSUE_KEY.match(part)]
+        return targets
+
+    def verify_done(self, session, keys: list) -> list:
+        """
+        确认已完成步骤记录的issue仍然存在（每100个Key一次搜索），作废已被删除的步骤，返回作废的幂等键
+        查询失败时抛出 JiraApiError（调用方应中止，避免把已删除的issue当作已完成）
+        """
+        targets = self.done_targets(dict.fromkeys(keys))
+        missing = set(missing_issue_keys(session, [k for ks in targets.values() for k in ks]))
+        stale = [key for key, issue_keys in targets.items() if missing.intersection(issue_keys)]
+        if stale:
+            self.invalidate(stale, "issue已删除")
+            print(f"🔁 {len(stale)} 个已完成的步骤指向已删除的issue，将重新执行")
+        return stale
+
+    def pending(self) -> list:
+        """全部已计划但未确认的记录"""
+        return [record for record in self.entries.values() if record["status"] == "planned"]
+
+    def clear(self):
+        with file_lock(f"journal-{self.name}"):
+            if os.path.exists(self.path):
+                os.remove(self.path)
+        self.entries = {}
+
+
+def _key_exists(session, key: str) -> bool:
+    response = session.get(f"/rest/api/3/issue/{key}", params={"fields": "status"}, hedge=True)
+    if response.status_code == 404:
+        return False
+    if response.status_code != 200:
+        raise JiraApiError(response)
+    return True
+
+
+def missing_issue_keys(session, issue_keys: list) -> list:
+    """JIRA中已不存在的Key；按 key in (...) 批量搜索，JQL因Key不存在被拒绝（400）时逐个确认该批"""
+    issue_keys = list(dict.fromkeys(issue_keys))
+    missing = []
+    for start in range(0, len(issue_keys), 100):
+        chunk = issue_keys[start:start + 100]
+        try:
+            found = {issue["key"] for issue in search_issues(session, f"key in ({', '.join(chunk)})", fields=["status"])}
+        except JiraApiError as e:
+            if e.status_code != 400:
+                raise
+            exists = run_concurrently(_key_exists, [(session, key) for key in chunk])
+            if any(result is None for result in exists):
+                raise
+            found = {key for key, result in zip(chunk, exists) if result}
+        missing += [key for key in chunk if key not in found]
+    return missing
+
+
+def _journals() -> list:
+    return [BatchJournal(name[len("journal-"):-len(".jsonl")]) for name in sorted(os.listdir(state_dir()))
+            if name.startswith("journal-") and name.endswith(".jsonl")]
+
+
+def forget_issues(issue_keys) -> int:
+    """删除issue后调用：作废各操作日志中指向这些issue（或以其为一端的链接）的完成记录，返回作废的步骤数"""
+    deleted = set(issue_keys)
+    count = 0
+    for journal in _journals():
+        stale = [key for key, targets in journal.done_targets().items() if deleted.intersection(targets)]
+        if stale:
+            journal.invalidate(stale, "issue已删除")
+            count += len(stale)
+    return count
+
+
+def forget_links(pairs) -> int:
+    """删除链接后调用：pairs 为 [(源Key, 目标Key), ...]，作废记录了这些链接的完成记录"""
+    removed = {f"{inward}{LINK_ARROW}{outward}" for inward, outward in pairs}
+    count = 0
+    for journal in _journals():
+        stale = [key for key in journal.entries
+                 if isinstance(journal.result(key), dict) and journal.result(key).get("key") in removed]
+        if stale:
+            journal.invalidate(stale, "链接已删除")
+            count += len(stale)
+    return count
+
+
+def reconcile_created(session, journal: BatchJournal, keys: list, fields=("summary",)) -> dict:
+    """
+    按 idem-<键> 标签核对已计划但未确认的创建步骤，已创建的补记为done
+    返回 {幂等键: {"key", "id"}}（仅含已在JIRA中找到的）
+    """
+    found = {}
+    for start in range(0, len(keys), 50):
+        chunk = keys[start:start + 50]
+        labels = ", ".join(f'"{idem_label(key)}"' for key in chunk)
+        for issue in search_issues(session, f"labels in ({labels})", fields=["labels", *fields]):
+            for label in issue["fields"].get("labels") or []:
+                if label.startswith(IDEM_LABEL_PREFIX) and label[len(IDEM_LABEL_PREFIX):] in chunk:
+                    found[label[len(IDEM_LABEL_PREFIX):]] = {"key": issue["key"], "id": issue["id"]}
+    if found:
+        # 计划中除payload外的元数据（如需求编号）一并并入结果
+        journal.done_many([(key, {**{k: v for k, v in journal.planned(key)["data"].items() if k != "payload"},
+                                  "ok": True, **value}) for key, value in found.items()])
+        print(f"🔁 核对未确认的创建: {len(found)} / {len(keys)} 个已在JIRA中存在")
+    return found
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3 or sys.argv[1] not in ("status", "clear"):
+        print("用法: python batch_journal.py status|clear <名称>")
+        sys.exit(1)
+
+    journal = BatchJournal(sys.argv[2])
+    if sys.argv[1] == "clear":
+        journal.clear()
+        print(f"🗑  已清空操作日志: {journal.path}")
+    else:
+        done = sum(1 for record in journal.entries.values() if record["status"] == "done")
+        print(f"📋 {journal.path}: 已完成 {done}，未确认 {len(journal.pending())}")
+        for record in journal.pending():
+            print(f"   ⏳ {record['key']} {json.dumps(record['data'], ensure_ascii=False)[:120]}")
@@ -1,98 +1,216 @@
-import requests
+"""
+创建开发任务（DEV）并链接到对应的子需求
+
+Story 信息优先读取本地issue缓存，DEV编号由编号分配器按Story一次性预留（同一Story下的
+各子需求共用一次查询），链接通过创建payload中的 update.issuelinks 随创建一并完成。
+同一Story的多个开发任务用 create_development_tasks_bulk() 一次批量提交。
+
+用法：python create_development_tasks.py <任务文件.json> [STORY_KEY]
+  任务文件为 [{"subtask_key": ..., "summary": ..., "description": ..., "story_key": 可选}, ...]
+"""
 import json
-from requests.auth import HTTPBasicAuth
+import sys
+
+from adf import text_to_adf
+from batch_journal import LINK_ARROW, BatchJournal, idem_label, idempotency_key, reconcile_created
+from batch_runner import run_concurrently
+from issue_cache import fetch_issue, index_created
+from jira_client import JiraApiError, bulk_create_issues, deadline, get_session, session_from_config
+from jira_config import load_jira_config
+from jira_metadata import resolve_issue_types
+from jira_metrics import jira_operation
+from sequence_allocator import allocate_number_groups, allocate_numbers
 
 def read_jira_config():
     """读取当前目录下的jira.md配置文件"""
-    with open("jira.md", "r") as f:
-        content = f.read()
-
-    config = {}
-    for line in content.split('\n'):
-        if '=' in line:
-            key, value = line.split('=', 1)
-            config[key.strip()] = value.strip().strip('\"\'')
+    return load_jira_config(["jira.md"], required=True)
 
-    return config
+def _dev_number_jql(story_key):
+    return f'parent = {story_key} AND labels = implementation'  # 编号从Summary前缀/标签解析，无需全文检索
 
 def get_next_dev_task_number(story_key, subtask_key, jira_domain, email, api_token):
-    """获取下一个开发任务序号"""
-    auth = HTTPBasicAuth(email, api_token)
-    headers = {"Accept": "application/json"}
+    """获取下一个开发任务序号（跨进程加锁预留，避免并发重复）"""
+    session = get_session(jira_domain, email, api_token)
+    return allocate_numbers(session, f"DEV-{subtask_key}", _dev_number_jql(story_key))
 
-    jql = f'parent = {story_key} AND labels = implementation AND summary ~ "\\[DEV-{subtask_key}"'  # 使用Summary匹配
-    url = f"https://{jira_domain}/rest/api/3/search/jql"
-
-    response = requests.get(url, headers=headers, auth=auth, params={"jql": jql, "maxResults": 100})
-    if response.status_code == 200:
-        return len(response.json()['issues']) + 1
-    else:
-        print(f"⚠️  查询开发任务失败: {response.text}")
-        return 1
-
-def create_development_task(subtask_key: str, summary: str, description: str, story_key: str = None):
-    """创建开发任务并链接到对应的子需求"""
-    config = read_jira_config()
-    JIRA_DOMAIN, EMAIL, API_TOKEN = config["JIRA_DOMAIN"], config["EMAIL"], config["API_TOKEN"]
-    auth = HTTPBasicAuth(EMAIL, API_TOKEN)
-
-    # 获取Story信息
-    story_response = requests.get(f"https://{JIRA_DOMAIN}/rest/api/3/issue/{story_key}",
-                                 headers={"Accept": "application/json"}, auth=auth)
-    if story_response.status_code != 200:
-        print(f"❌ 获取Story信息失败: {story_response.text}")
-        return None
-
-    story_id = story_response.json()['id']
-    dev_task_number = get_next_dev_task_number(story_key, subtask_key, JIRA_DOMAIN, EMAIL, API_TOKEN)
-    formatted_summary = f"[DEV-{subtask_key}-{dev_task_number}] {summary}"
-
-    # 创建开发任务
+def build_dev_task_payload(story_id, subtask_key, dev_task_number, summary, description):
+    """
+    生成开发任务的创建payload（创建时即链接到子需求）
+    返回 (开发任务编号, payload)
+    """
+    task_number = f"DEV-{subtask_key}-{dev_task_number}"
     payload = {
         "fields": {
             "project": {"key": subtask_key.split('-')[0]},
             "issuetype": {"name": "Subtask"},
-            "summary": formatted_summary,
+            "summary": f"[{task_number}] {summary}",
             "parent": {"id": story_id},
-            "labels": ["implementation", f"DEV-{subtask_key}-{dev_task_number}"],
-            "description": {
-                "type": "doc", "version": 1,
-                "content": [{"type": "paragraph", "content": [{"type": "text", "text": description}]}]
-            }
+            "labels": ["implementation", task_number],
+            "description": text_to_adf(description)
+        },
+        "update": {
+            "issuelinks": [{"add": {"type": {"name": "Relates"}, "outwardIssue": {"key": subtask_key}}}]
         }
     }
+    return task_number, payload
+
+def _link_to_subtask(session, journal, task_key, subtask_key, link_step):
+    """单独创建链接（仅用于续跑旧版本日志中创建后尚未链接的任务）"""
+    link_payload = {
+        "type": {"name": "Relates"},
+        "inwardIssue": {"key": task_key},
+        "outwardIssue": {"key": subtask_key}
+    }
+    journal.plan(link_step, {"payload": link_payload})
+    with jira_operation("create_link"):
+        link_response = session.post("/rest/api/3/issueLink", data=json.dumps(link_payload), idempotency_key=link_step)
+    if link_response.status_code == 201:
+        journal.done(link_step, {"ok": True, "key": f"{task_key}{LINK_ARROW}{subtask_key}"})
+        print(f"✅ 链接创建成功: {task_key} → {subtask_key}")
+        return True
+    print(f"⚠️  链接创建失败: {link_response.text}")
+    return False
 
-    headers = {"Accept": "application/json", "Content-Type": "application/json"}
-    response = requests.post(f"https://{JIRA_DOMAIN}/rest/api/3/issue",
-                            data=json.dumps(payload), headers=headers, auth=auth)
+def _create_tasks(tasks, story_key=None):
+    config = read_jira_config()
+    session = session_from_config(config)
+    journal = BatchJournal("create_development_task")
+    results = [None] * len(tasks)
+    steps = [idempotency_key(task["subtask_key"], task["summary"], task.get("description", "")) for task in tasks]
 
-    if response.status_code == 201:
-        task_key = response.json()['key']
-        print(f"✅ 开发任务创建成功: {task_key}")
+    # 上次中断时已提交但未确认的创建，先按幂等标签核对，避免重复创建
+    # 已完成的步骤确认其开发任务仍然存在，被删除的按新步骤重新创建
+    unconfirmed = [step for step in dict.fromkeys(steps) if journal.planned(step)]
+    try:
+        if unconfirmed:
+            reconcile_created(session, journal, unconfirmed)
+        journal.verify_done(session, steps)
+    except JiraApiError as e:
+        print(f"❌ 核对上次执行的结果失败，为避免重复创建已中止: {e}")
+        return [{"ok": False, "error": str(e)} for _ in tasks]
 
-        # 创建链接
-        link_payload = {
-            "type": {"name": "Relates"},
-            "inwardIssue": {"key": task_key},
-            "outwardIssue": {"key": subtask_key}
-        }
-        link_response = requests.post(f"https://{JIRA_DOMAIN}/rest/api/3/issueLink",
-                                     data=json.dumps(link_payload), headers=headers, auth=auth)
-        if link_response.status_code == 201:
-            print(f"✅ 链接创建成功: {task_key} → {subtask_key}")
+    planned = []  # (输入下标, 编号, payload)
+    fresh = []    # 尚未计划过的输入下标
+    for index, step in enumerate(steps):
+        done = journal.result(step)
+        if done:
+            results[index] = {**done, "skipped": True}
+        elif journal.planned(step):
+            data = journal.planned(step)["data"]
+            planned.append((index, data.get("number"), data["payload"]))  # 沿用原编号
         else:
-            print(f"⚠️  链接创建失败: {link_response.text}")
+            fresh.append(index)
+
+    # Story 信息读缓存，每个Story只取一次
+    stories = {}    # Story Key -> Story ID
+    story_of = {}   # 输入下标 -> Story Key
+    for index in fresh:
+        task = tasks[index]
+        try:
+            with jira_operation("get_story"):
+                item_story_key = task.get("story_key") or story_key or fetch_issue(session, task["subtask_key"])["parent"]
+                if not item_story_key:
+                    results[index] = {"ok": False, "error": f"{task['subtask_key']} 没有父级Story"}
+                    continue
+                if item_story_key not in stories:
+                    stories[item_story_key] = fetch_issue(session, item_story_key)["id"]
+        except JiraApiError as e:
+            results[index] = {"ok": False, "error": f"获取Story信息失败: {e}"}
+            continue
+        story_of[index] = item_story_key
+
+    # 每个Story一次查询，同时预留其下各子需求的DEV编号
+    by_story = {}
+    for index in fresh:
+        if results[index] is None:
+            prefix = f"DEV-{tasks[index]['subtask_key']}"
+            counts = by_story.setdefault(story_of[index], {})
+            counts[prefix] = counts.get(prefix, 0) + 1
+    with jira_operation("allocate_number"):
+        story_keys = list(by_story)
+        firsts = run_concurrently(allocate_number_groups, [(session, by_story[key], _dev_number_jql(key))
+                                                            for key in story_keys])
+    next_numbers = {}
+    for key, group_firsts in zip(story_keys, firsts):
+        next_numbers.update(group_firsts or {})
+
+    new_plans = []
+    for index in fresh:
+        if results[index] is not None:
+            continue
+        task = tasks[index]
+        prefix = f"DEV-{task['subtask_key']}"
+        if prefix not in next_numbers:
+            results[index] = {"ok": False, "error": "预留编号失败"}
+            continue
+        task_number, payload = build_dev_task_payload(stories[story_of[index]], task["subtask_key"],
+                                                      next_numbers[prefix], task["summary"], task.get("description", ""))
+        payload["fields"]["labels"].append(idem_label(steps[index]))
+        next_numbers[prefix] += 1
+        planned.append((index, task_number, payload))
+        new_plans.append((steps[index], {"number": task_number, "linked": True, "payload": payload}))
+
+    resolve_issue_types(session, [payload for _, _, payload in planned])
+    # 先写日志再提交，中断后可据此恢复
+    journal.plan_many(new_plans)
+    with jira_operation("create_issue"):
+        created = bulk_create_issues(session, [payload for _, _, payload in planned])
+    index_created(session, [payload for _, _, payload in planned], created)
+
+    completed = []
+    for (index, task_number, payload), result in zip(planned, created):
+        result["number"] = task_number
+        results[index] = result
+        if result["ok"]:
+            result["linked"] = "update" in payload
+            completed.append((steps[index], result))
+    journal.done_many(completed)
 
-        return task_key
-    else:
-        print(f"❌ 创建失败: {response.text}")
-        return None
+    # 旧版本日志中创建时未带链接的任务，补建链接
+    relink = [(session, journal, result["key"], task["subtask_key"], idempotency_key(step, "link"))
+              for task, step, result in zip(tasks, steps, results)
+              if result["ok"] and not result.get("linked") and not journal.result(idempotency_key(step, "link"))]
+    run_concurrently(_link_to_subtask, relink)
+
+    for task, result in zip(tasks, results):
+        if result.get("skipped"):
+            print(f"⏭️  开发任务已创建: {result['key']}（跳过）")
+        elif result["ok"]:
+            print(f"✅ 开发任务创建成功: {result['number']} → {result['key']}")
+        else:
+            print(f"❌ 创建失败 {task['subtask_key']}: {result['error']}")
+    return results
+
+@jira_operation("create_development_tasks_bulk", summary=True)
+@deadline()
+def create_development_tasks_bulk(tasks, story_key=None):
+    """
+    批量创建开发任务（/rest/api/3/issue/bulk，每批最多50个），每个任务创建时即链接到其子需求
+    tasks: [{"subtask_key": ..., "summary": ..., "description": ..., "story_key": 可选}, ...]
+    story_key: 未在条目中指定 story_key 时使用的默认Story；都未指定时取子需求的父级
+    计划与结果记录在操作日志中，中断后重新执行同一批次：已完成的任务直接跳过，
+    已提交但未确认的创建按幂等标签核对后沿用原编号重新提交。
+    返回与输入顺序一致的结果列表：{"ok", "key", "id", "number"} 或 {"ok": False, "error"}
+    """
+    return _create_tasks(tasks, story_key)
+
+@jira_operation("create_development_task")
+@deadline()
+def create_development_task(subtask_key: str, summary: str, description: str, story_key: str = None):
+    """
+    创建开发任务并链接到对应的子需求，返回开发任务Key（失败返回None）
+    story_key 为空时取子需求的父级Story
+    """
+    result = _create_tasks(
+        [{"subtask_key": subtask_key, "summary": summary, "description": description}], story_key)[0]
+    return result["key"] if result["ok"] else None
 
 if __name__ == "__main__":
-    # 示例用法
-    create_development_task(
-        subtask_key="CMT-76",
-        summary="实现用户登录功能",
-        description="开发用户登录界面和认证逻辑",
-        story_key="CMT-75"
-    )
\ No newline at end of file
+    if len(sys.argv) < 2:
+        print("用法: python create_development_tasks.py <任务文件.json> [STORY_KEY]")
+        sys.exit(1)
+
+    with open(sys.argv[1], "r", encoding="utf-8") as f:
+        task_list = json.load(f)
+    results = create_development_tasks_bulk(task_list, sys.argv[2] if len(sys.argv) > 2 else None)
+    print(f"📊 完成: 成功 {sum(1 for r in results if r['ok'])} / {len(results)}")
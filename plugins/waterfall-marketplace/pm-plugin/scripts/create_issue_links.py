@@ -1,51 +1,29 @@
-import requests
-import json
-from requests.auth import HTTPBasicAuth
+from jira_client import deadline
+from jira_config import load_jira_config
+from jira_metrics import jira_operation
+from link_manager import ensure_links
 
 def read_jira_config():
     """读取当前目录下的jira.md配置文件"""
-    with open("jira.md", "r") as f:
-        content = f.read()
-
-    config = {}
-    for line in content.split('\n'):
-        if '=' in line:
-            key, value = line.split('=', 1)
-            config[key.strip()] = value.strip().strip('\"\'')
-
-    return config
+    return load_jira_config(["jira.md"], required=True)
 
+@jira_operation("create_issue_link")
+@deadline()
 def create_issue_link(source_issue_key: str, target_issue_key: str, link_type: str = "Relates"):
-    """创建issue链接"""
-    config = read_jira_config()
-
-    JIRA_DOMAIN = config["JIRA_DOMAIN"]
-    EMAIL = config["EMAIL"]
-    API_TOKEN = config["API_TOKEN"]
-
-    url = f"https://{JIRA_DOMAIN}/rest/api/3/issueLink"
-    auth = HTTPBasicAuth(EMAIL, API_TOKEN)
-    headers = {"Accept": "application/json", "Content-Type": "application/json"}
-
-    payload = {
-        "type": {"name": link_type},
-        "inwardIssue": {"key": source_issue_key},
-        "outwardIssue": {"key": target_issue_key}
-    }
-
-    response = requests.post(url, data=json.dumps(payload), headers=headers, auth=auth)
-
-    if response.status_code == 201:
-        print(f"✅ 链接创建成功: {source_issue_key} → {target_issue_key}")
-        return True
-    else:
-        print(f"❌ 链接创建失败: {response.text}")
-        return False
-
-def link_tasks_to_story(task_keys: list, story_key: str):
-    """将任务链接到Story"""
-    for task_key in task_keys:
-        create_issue_link(task_key, story_key, "Relates")
+    """
+    创建issue链接
+    先查询两端issue的现有链接，已存在时不再创建（见 link_manager.py），重复执行不会产生重复关系
+    """
+    return ensure_links([{"from": source_issue_key, "to": target_issue_key, "type": link_type}])[0]
+
+@jira_operation("link_tasks_to_story")
+@deadline()
+def link_tasks_to_story(task_keys: list, story_key: str, max_workers: int = None):
+    """
+    将任务链接到Story，返回与输入顺序一致的结果列表
+    先一次查询现有链接，只并发创建缺失的（见 link_manager.py），重复执行只需一次查询
+    """
+    return ensure_links([{"from": task_key, "to": story_key, "type": "Relates"} for task_key in task_keys], max_workers)
 
 if __name__ == "__main__":
     # 示例：创建链接
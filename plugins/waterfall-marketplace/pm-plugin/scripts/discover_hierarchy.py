@@ -0,0 +1,147 @@
+"""
+项目层级发现：project → epic → story → subtask
+
+按层分页流式查询（Epic一次、之后每层以 parent in (...) 分批），只取构建树所需字段，
+在内存中构建紧凑的层级树，并汇总每个节点的子节点数量与状态分布。
+
+用法：python discover_hierarchy.py <PROJECT_KEY> [EPIC_KEY ...] [--json]
+"""
+import json
+import sys
+
+from jira_client import JiraApiError, search_children, search_issues, session_from_config
+from jira_config import load_jira_config
+from jira_metrics import jira_operation
+
+# 构建层级树所需的最少字段
+TREE_FIELDS = ["summary", "status", "issuetype", "parent", "priority"]
+
+# JIRA状态类别：new(待办) / indeterminate(进行中) / done(完成)
+STATUS_CATEGORIES = ("new", "indeterminate", "done")
+
+NO_EPIC = "(无Epic)"
+
+def read_jira_config():
+    """读取当前目录下的jira.md配置文件"""
+    return load_jira_config(["jira.md"], required=True)
+
+class Node:
+    """层级树中的一个issue"""
+    __slots__ = ("key", "summary", "type", "status", "category", "priority", "children", "rollup")
+
+    def __init__(self, issue):
+        fields = issue.get("fields") or {}
+        status = fields.get("status") or {}
+        self.key = issue["key"]
+        self.summary = fields.get("summary") or ""
+        self.type = (fields.get("issuetype") or {}).get("name", "")
+        self.status = status.get("name", "")
+        self.category = (status.get("statusCategory") or {}).get("key", "new")
+        self.priority = (fields.get("priority") or {}).get("name", "")
+        self.children = []
+        self.rollup = None
+
+    def compute_rollup(self):
+        """汇总全部后代issue的状态类别数量"""
+        rollup = dict.fromkeys(STATUS_CATEGORIES, 0)
+        for child in self.children:
+            rollup[child.category] = rollup.get(child.category, 0) + 1
+            for category, count in child.compute_rollup().items():
+                rollup[category] = rollup.get(category, 0) + count
+        self.rollup = rollup
+        return rollup
+
+    def to_dict(self):
+        return {
+            "key": self.key, "summary": self.summary, "type": self.type, "status": self.status,
+            "priority": self.priority, "rollup": self.rollup,
+            "children": [child.to_dict() for child in self.children],
+        }
+
+def _attach(nodes, parent_index, issues):
+    """把一层查询结果挂到父节点下，返回本层新节点"""
+    level = []
+    for issue in issues:
+        node = Node(issue)
+        parent_key = ((issue.get("fields") or {}).get("parent") or {}).get("key")
+        parent = parent_index.get(parent_key)
+        if parent is None:
+            continue
+        parent.children.append(node)
+        nodes[node.key] = node
+        level.append(node)
+    return level
+
+@jira_operation("discover_hierarchy", summary=True)
+def discover_hierarchy(project_key: str, epic_keys: list = None):
+    """
+    构建项目的层级树，返回虚拟根节点（children 为Epic，另含一个 "(无Epic)" 分组）
+    epic_keys: 只发现指定Epic时传入
+    """
+    config = read_jira_config()
+    session = session_from_config(config)
+
+    root = Node({"key": project_key, "fields": {"summary": project_key}})
+    nodes = {}
+
+    if epic_keys:
+        epic_jql = f"key in ({', '.join(epic_keys)})"
+    else:
+        epic_jql = f"project = {project_key} AND issuetype = Epic ORDER BY key"
+    for issue in search_issues(session, epic_jql, fields=TREE_FIELDS):
+        node = Node(issue)
+        root.children.append(node)
+        nodes[node.key] = node
+
+    # 第二层：Epic下的Story；未指定Epic时，无父级的非Epic issue归入 "(无Epic)"
+    stories = _attach(nodes, nodes, search_children(session, list(nodes), fields=TREE_FIELDS, prefetch=True))
+    if not epic_keys:
+        orphan_group = Node({"key": NO_EPIC, "fields": {"summary": NO_EPIC}})
+        orphan_jql = (f"project = {project_key} AND parent is EMPTY AND issuetype != Epic "
+                      f"AND issuetype not in subTaskIssueTypes() ORDER BY key")
+        for issue in search_issues(session, orphan_jql, fields=TREE_FIELDS):
+            node = Node(issue)
+            orphan_group.children.append(node)
+            nodes[node.key] = node
+            stories.append(node)
+        if orphan_group.children:
+            root.children.append(orphan_group)
+
+    # 第三层：Story下的Subtask
+    story_index = {node.key: node for node in stories}
+    _attach(nodes, story_index, search_children(session, list(story_index), fields=TREE_FIELDS, prefetch=True))
+
+    root.compute_rollup()
+    return root
+
+def _progress(node):
+    total = sum(node.rollup.values())
+    return f"{node.rollup.get('done', 0)}/{total} 完成" if total else "无子项"
+
+def print_hierarchy(root):
+    """按命令约定的格式输出层级树"""
+    print(f"🎯 项目 [{root.key}] 层级结构: {_progress(root)}")
+    for index, epic in enumerate(root.children, 1):
+        print(f"{index}. [{epic.key}] {epic.summary} - 状态: {epic.status or '-'} - Story数量: {len(epic.children)} - {_progress(epic)}")
+        for story in epic.children:
+            print(f"   📖 [{story.key}] {story.summary} - 状态: {story.status} - 优先级: {story.priority or '-'} "
+                  f"- Subtask: {len(story.children)} ({_progress(story)})")
+            for subtask in story.children:
+                print(f"      - [{subtask.key}] {subtask.summary} - 状态: {subtask.status}")
+
+if __name__ == "__main__":
+    args = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    if not args:
+        print("用法: python discover_hierarchy.py <PROJECT_KEY> [EPIC_KEY ...] [--json]")
+        sys.exit(1)
+
+    try:
+        tree = discover_hierarchy(args[0], args[1:] or None)
+    except JiraApiError as e:
+        print(f"❌ 查询失败: {e}")
+        sys.exit(1)
+
+    if "--json" in sys.argv:
+        print(json.dumps(tree.to_dict(), ensure_ascii=False, indent=2))
+    else:
+        print_hierarchy(tree)
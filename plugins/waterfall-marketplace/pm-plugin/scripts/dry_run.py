@@ -0,0 +1,339 @@
+"""
+演练模式：预估一次运行的JIRA调用量、可合并的调用与限流下的耗时
+
+设置 JIRA_DRY_RUN=1 后，JiraSession 照常发出读取请求（分解与规划需要真实数据），
+创建、更新、转换、链接、删除等写操作不发送，只记录下来并返回模拟的成功响应：
+新建的issue按 <项目>-900001 起编号，之后对这些issue的读取同样在本地模拟（计入调用数）。
+演练使用临时状态目录（复制当前的issue缓存与元数据缓存），操作日志、编号预留等不影响真实运行。
+进程退出时打印报告：
+  - 按接口统计的调用数（实际发出的读取 / 模拟的写入）与条目数
+  - 可合并的调用：逐个创建或未装满的批量创建可合并为 /issue/bulk（每批50个），逐个读取issue可改为按 key in (...) 搜索（每页100个）；
+    只合并同一阶段内的调用
+  - 按 JIRA_RATE_LIMIT / JIRA_RATE_BURST 与 JIRA_MAX_WORKERS 估算的耗时，以及其中等待限流的时间
+阶段：每次调用记录所属的 jira_operation，连续属于同一操作的调用为一个阶段（如计划执行的一层、
+创建前的编号预留）。阶段之间存在依赖、按顺序执行，阶段内的调用相互独立；
+并发耗时按各阶段依次执行的关键路径估算，后一阶段的调用不会与前一阶段合并。
+环境变量：
+  JIRA_DRY_RUN_REPORT   写出JSON报告（含全部拟提交的写操作），可用 estimate 按其他限流与并发重新估算
+  JIRA_DRY_RUN_LATENCY  单次调用耗时（秒）；未设置时读取取演练中实际读取的中位耗时，写入按读取的2倍估算
+
+用法：JIRA_DRY_RUN=1 python create_subtask.py ...
+     python dry_run.py estimate <report.json> [--rate 10] [--burst 20] [--concurrency 8]
+注意：本模块在各插件的 scripts 目录中保持一致，修改时请同步。
+"""
+import atexit
+import itertools
+import json
+import math
+import os
+import re
+import shutil
+import sqlite3
+import sys
+import tempfile
+import threading
+from urllib.parse import urlencode, urlparse
+
+import requests
+
+from batch_runner import MAX_WORKERS
+from jira_metrics import current_operation, endpoint_template
+from local_state import state_dir
+from rate_limit import RATE_BURST, RATE_LIMIT
+
+DRY_RUN = os.environ.get("JIRA_DRY_RUN", "0") not in ("", "0")
+REPORT_FILE = os.environ.get("JIRA_DRY_RUN_REPORT", "")
+CALL_LATENCY = float(os.environ.get("JIRA_DRY_RUN_LATENCY", "0"))
+DEFAULT_LATENCY = 0.3  # 演练中没有实际读取时使用
+WRITE_LATENCY_FACTOR = 2.0
+
+# 只读的POST接口（照常发送）
+READ_ONLY_POSTS = ("/rest/api/3/search", "/rest/api/3/search/jql", "/rest/api/3/issue/bulkfetch",
+                   "/rest/api/3/jql/parse")
+
+# 可合并的调用：(方法, 接口) -> (合并后的方法, 接口, 每次合并的条目数)
+BATCHABLE = {
+    ("POST", "/rest/api/3/issue"): ("POST", "/rest/api/3/issue/bulk", 50),
+    ("POST", "/rest/api/3/issue/bulk"): ("POST", "/rest/api/3/issue/bulk", 50),
+    ("GET", "/rest/api/3/issue/{key}"): ("GET", "/rest/api/3/search/jql", 100),
+}
+
+_SIMULATED_KEY = re.compile(r"\b[A-Z][A-Z0-9_]*-9\d{5,}\b")
+
+_lock = threading.Lock()
+_calls = []       # {"method", "endpoint", "sent", "items", "latency", "operation"}
+_mutations = []   # 拟提交的写操作 {"method", "path", "body"}
+_issues = {}      # 模拟创建的issue：key -> issue
+_numbers = itertools.count(900001)
+_ids = itertools.count(990000001)
+
+
+def is_mutation(method: str, url: str) -> bool:
+    """演练模式下不发送的请求"""
+    method = method.upper()
+    if method in ("GET", "HEAD", "OPTIONS"):
+        return False
+    path = urlparse(url).path.rstrip("/")
+    return not (method == "POST" and path in READ_ONLY_POSTS)
+
+
+def touches_simulated(url: str, params=None, data=None) -> bool:
+    """读取是否涉及模拟创建的issue（JIRA上不存在，需在本地模拟）"""
+    text = f"{url} {json.dumps(params, ensure_ascii=False, default=str) if params else ''} {data or ''}"
+    return any(key in _issues for key in _SIMULATED_KEY.findall(text))
+
+
+def _body(data):
+    if not data:
+        return None
+    try:
+        return json.loads(data)
+    except (TypeError, ValueError):
+        return data
+
+
+def _response(method: str, url: str, status: int, payload=None, params=None) -> requests.Response:
+    response = requests.Response()
+    response.status_code = status
+    response.url = f"{url}?{urlencode(params)}" if params else url
+    response._content = json.dumps(payload, ensure_ascii=False).encode("utf-8") if payload is not None else b""
+    response.headers["Content-Type"] = "application/json;charset=UTF-8"
+    response.encoding = "utf-8"
+    response.request = requests.Request(method.upper(), response.url).prepare()
+    return response
+
+
+def _simulate_issue(fields: dict) -> dict:
+    """按创建payload在本地生成issue（状态为 To Do）"""
+    fields = dict(fields or {})
+    project = (fields.get("project") or {}).get("key") or ""
+    parent = (fields.get("parent") or {}).get("key")
+    if not project and parent:
+        project = parent.rsplit("-", 1)[0]
+    with _lock:
+        key, issue_id = f"{project or 'DRY'}-{next(_numbers)}", str(next(_ids))
+    fields.setdefault("status", {"name": "To Do", "statusCategory": {"key": "new"}})
+    fields["project"] = {"key": project}
+    issue = {"id": issue_id, "key": key, "self": f"/rest/api/3/issue/{issue_id}", "fields": fields}
+    _issues[key] = issue
+    _issues[issue_id] = issue
+    return issue
+
+
+def _record(method: str, url: str, sent: bool, items: int = 1, latency: float = None):
+    path = urlparse(url).path
+    with _lock:
+        _calls.append({"method": method.upper(), "endpoint": endpoint_template(path), "sent": sent,
+                       "items": items, "latency": latency, "operation": current_operation()})
+
+
+def record_sent(method: str, url: str, latency: float):
+    """记录演练中实际发出的读取（由 JiraSession 调用，latency 不含限流等待）"""
+    _record(method, url, True, latency=latency)
+
+
+def simulate(method: str, url: str, params=None, data=None) -> requests.Response:
+    """记录写操作（或涉及模拟issue的读取）并返回模拟的成功响应"""
+    method = method.upper()
+    path = urlparse(url).path.rstrip("/")
+    body = _body(data)
+    segments = path.split("/")
+
+    if method == "GET" or (method == "POST" and path in READ_ONLY_POSTS):
+        _record(method, url, False)
+        if "/search" in path:
+            return _response(method, url, 200, {"issues": [], "isLast": True, "total": 0}, params)
+        if len(segments) == 6 and segments[4] == "issue" and segments[5] in _issues:
+            return _response(method, url, 200, _issues[segments[5]], params)
+        return _response(method, url, 200, {"transitions": [], "comments": [], "values": []}, params)
+
+    with _lock:
+        _mutations.append({"method": method, "path": path, "body": body})
+
+    if method == "POST" and path == "/rest/api/3/issue/bulk":
+        updates = (body or {}).get("issueUpdates") or []
+        created = [_simulate_issue(update.get("fields")) for update in updates]
+        _record(method, url, False, items=len(updates))
+        return _response(method, url, 201, {"issues": [{"id": issue["id"], "key": issue["key"], "self": issue["self"]}
+                                                       for issue in created], "errors": []})
+    _record(method, url, False)
+    if method == "POST" and path == "/rest/api/3/issue":
+        issue = _simulate_issue((body or {}).get("fields"))
+        return _response(method, url, 201, {"id": issue["id"], "key": issue["key"], "self": issue["self"]})
+    if method == "POST" and path.endswith("/comment"):
+        return _response(method, url, 201, {"id": "0"})
+    if method == "POST" and path == "/rest/api/3/issueLink":
+        return _response(method, url, 201)
+    if method == "DELETE":
+        _issues.pop(segments[-1], None)
+    return _response(method, url, 204)
+
+
+def _isolate_state():
+    """演练使用临时状态目录：复制issue缓存与元数据缓存，其余状态（操作日志、编号预留等）从空开始"""
+    source = state_dir()
+    target = tempfile.mkdtemp(prefix="jira-dry-run-")
+    for name in os.listdir(source):
+        path = os.path.join(source, name)
+        if name.startswith("issues-") and name.endswith(".sqlite3"):
+            src, dst = sqlite3.connect(path), sqlite3.connect(os.path.join(target, name))
+            try:
+                src.backup(dst)
+            except sqlite3.Error:
+                pass
+            finally:
+                src.close()
+                dst.close()
+        elif name.startswith("jira-metadata-") and name.endswith(".json"):
+            shutil.copy(path, target)
+    os.environ["JIRA_PLUGIN_STATE_DIR"] = target
+    atexit.register(shutil.rmtree, target, True)
+
+
+def stages(calls: list) -> list:
+    """按调用顺序把连续属于同一 jira_operation 的调用划为一个阶段，返回 [[调用, ...], ...]"""
+    result = []
+    for call in calls:
+        if result and result[-1][0].get("operation") == call.get("operation"):
+            result[-1].append(call)
+        else:
+            result.append([call])
+    return result
+
+
+def estimate(calls: list, rate: float = RATE_LIMIT, burst: float = RATE_BURST, concurrency: int = MAX_WORKERS,
+             latency: float = None) -> dict:
+    """
+    估算耗时：顺序执行为各调用耗时之和；并发执行时各阶段依次执行（关键路径），
+    阶段内为其调用耗时之和除以并发数、且不少于其中最慢的一次调用；
+    超出令牌桶容量的调用至少需要 (调用数 - 容量) / 速率 秒，二者取大，差值即等待限流的时间
+    """
+    read_latencies = sorted(call["latency"] for call in calls if call.get("latency") is not None)
+    if latency is None:
+        latency = CALL_LATENCY or (read_latencies[len(read_latencies) // 2] if read_latencies else DEFAULT_LATENCY)
+
+    def cost(call):
+        if call.get("latency") is not None:
+            return call["latency"]
+        return latency * (WRITE_LATENCY_FACTOR if call["method"] != "GET" else 1.0)
+
+    concurrency = max(1, concurrency)
+    phases = stages(calls)
+    work = sum(cost(call) for call in calls)
+    critical_path = sum(max(sum(cost(call) for call in stage) / concurrency, max(cost(call) for call in stage))
+                        for stage in phases)
+    throttle_floor = max(0.0, (len(calls) - burst) / rate) if rate > 0 else 0.0
+    result = {"calls": len(calls), "latency": latency, "rate": rate, "burst": burst, "concurrency": concurrency,
+              "stages": len(phases)}
+    for name, busy in (("sequential", work), ("concurrent", critical_path)):
+        result[name] = {"seconds": max(busy, throttle_floor), "throttled": max(0.0, throttle_floor - busy)}
+    return result
+
+
+def batching(calls: list) -> list:
+    """同一阶段内可合并的调用 [{"operation", "stage", "endpoint", "calls", "items", "into", "batched_calls"}]"""
+    result = []
+    for index, stage in enumerate(stages(calls)):
+        for (method, endpoint), (into_method, into_endpoint, size) in BATCHABLE.items():
+            group = [call for call in stage if call["method"] == method and call["endpoint"] == endpoint]
+            items = sum(call["items"] for call in group)
+            if len(group) > math.ceil(items / size):
+                result.append({"operation": stage[0].get("operation"), "stage": index,
+                               "endpoint": f"{method} {endpoint}", "calls": len(group), "items": items,
+                               "into": f"{into_method} {into_endpoint}", "batched_calls": math.ceil(items / size)})
+    return result
+
+
+def batched_calls(calls: list) -> list:
+    """把可合并的调用替换为合并后的调用（留在原阶段内，用于估算合并后的耗时）"""
+    groups = batching(calls)
+    result = []
+    for index, stage in enumerate(stages(calls)):
+        merged = [group for group in groups if group["stage"] == index]
+        endpoints = {tuple(group["endpoint"].split(" ", 1)) for group in merged}
+        result += [call for call in stage if (call["method"], call["endpoint"]) not in endpoints]
+        for group in merged:
+            method, endpoint = group["into"].split(" ", 1)
+            size = math.ceil(group["items"] / group["batched_calls"])
+            result += [{"method": method, "endpoint": endpoint, "sent": False, "items": size, "latency": None,
+                        "operation": group["operation"]} for _ in range(group["batched_calls"])]
+    return result
+
+
+def build_report(calls: list = None, rate: float = RATE_LIMIT, burst: float = RATE_BURST,
+                 concurrency: int = MAX_WORKERS) -> dict:
+    calls = _calls if calls is None else calls
+    endpoints = {}
+    for call in calls:
+        entry = endpoints.setdefault(f"{call['method']} {call['endpoint']}", {"sent": 0, "simulated": 0, "items": 0})
+        entry["sent" if call["sent"] else "simulated"] += 1
+        entry["items"] += call["items"]
+    groups = batching(calls)
+    latency = estimate(calls, rate, burst, concurrency)["latency"]
+    return {"endpoints": endpoints, "batchable": groups, "estimate": estimate(calls, rate, burst, concurrency),
+            "estimate_batched": estimate(batched_calls(calls), rate, burst, concurrency, latency) if groups else None,
+            "calls": calls, "mutations": _mutations}
+
+
+def _format_seconds(seconds: float) -> str:
+    return f"{seconds:.1f}s" if seconds < 120 else f"{seconds / 60:.1f}min"
+
+
+def print_report(report: dict):
+    """打印演练报告"""
+    endpoints = report["endpoints"]
+    if not endpoints:
+        print("\n🧪 演练结束：没有JIRA调用")
+        return
+    sent = sum(entry["sent"] for entry in endpoints.values())
+    simulated = sum(entry["simulated"] for entry in endpoints.values())
+    print(f"\n🧪 演练报告: 共 {sent + simulated} 次调用（实际读取 {sent}，模拟 {simulated}，"
+          f"拟提交写操作 {len(report['mutations'])}）")
+    print(f"   {'读取':>5} {'模拟':>5} {'条目':>6}  接口")
+    for endpoint, entry in sorted(endpoints.items(), key=lambda item: -(item[1]["sent"] + item[1]["simulated"])):
+        print(f"   {entry['sent']:>5} {entry['simulated']:>5} {entry['items']:>6}  {endpoint}")
+    for group in report["batchable"]:
+        print(f"   💡 [{group.get('operation') or '-'}] {group['endpoint']} {group['calls']} 次（{group['items']} 条）"
+              f"可合并为 {group['into']} {group['batched_calls']} 次")
+
+    for title, result in (("预计耗时", report["estimate"]), ("合并后预计", report.get("estimate_batched"))):
+        if not result:
+            continue
+        rate = f"限流 {result['rate']:g}/s（容量 {result['burst']:g}）" if result["rate"] > 0 else "不限流"
+        print(f"   ⏱  {title}（{rate}，单次约 {result['latency'] * 1000:.0f}ms）: "
+              f"顺序 {_format_seconds(result['sequential']['seconds'])}"
+              f"（等待限流 {_format_seconds(result['sequential']['throttled'])}），"
+              f"并发{result['concurrency']}（{result.get('stages', 1)} 个依次执行的阶段）"
+              f" {_format_seconds(result['concurrent']['seconds'])}"
+              f"（等待限流 {_format_seconds(result['concurrent']['throttled'])}）")
+
+
+def _finish():
+    report = build_report()
+    print_report(report)
+    if REPORT_FILE:
+        with open(REPORT_FILE, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"   📄 报告已写入 {REPORT_FILE}")
+
+
+if DRY_RUN:
+    _isolate_state()
+    atexit.register(_finish)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3 or sys.argv[1] != "estimate":
+        print("用法: python dry_run.py estimate <report.json> [--rate 10] [--burst 20] [--concurrency 8]")
+        sys.exit(1)
+
+    with open(sys.argv[2], "r", encoding="utf-8") as f:
+        saved = json.load(f)
+
+    def option(name, default):
+        return type(default)(sys.argv[sys.argv.index(name) + 1]) if name in sys.argv else default
+
+    rate = option("--rate", float(RATE_LIMIT))
+    burst = option("--burst", max(1.0, rate * 2) if "--rate" in sys.argv else float(RATE_BURST))
+    _mutations[:] = saved.get("mutations") or []
+    print_report(build_report(saved["calls"], rate, burst, option("--concurrency", MAX_WORKERS)))
@@ -1,31 +1,20 @@
-import requests
 import json
-from requests.auth import HTTPBasicAuth
+
+from batch_runner import run_concurrently
+from jira_client import session_from_config
+from jira_config import load_jira_config
+from jira_metrics import jira_operation
 
 def read_jira_config():
     """读取当前目录下的jira.md配置文件"""
-    with open("jira.md", "r") as f:
-        content = f.read()
-
-    config = {}
-    for line in content.split('\n'):
-        if '=' in line:
-            key, value = line.split('=', 1)
-            config[key.strip()] = value.strip().strip('\"\'')
-
-    return config
+    return load_jira_config(["jira.md"], required=True)
 
+@jira_operation("update_subtask_description")
 def update_subtask_description(subtask_key: str, description: str):
     """更新Subtask描述"""
     config = read_jira_config()
 
-    JIRA_DOMAIN = config["JIRA_DOMAIN"]
-    EMAIL = config["EMAIL"]
-    API_TOKEN = config["API_TOKEN"]
-
-    url = f"https://{JIRA_DOMAIN}/rest/api/3/issue/{subtask_key}"
-    auth = HTTPBasicAuth(EMAIL, API_TOKEN)
-    headers = {"Accept": "application/json", "Content-Type": "application/json"}
+    session = session_from_config(config)
 
     payload = {
         "fields": {
@@ -39,7 +28,7 @@ def update_subtask_description(subtask_key: str, description: str):
         }
     }
 
-    response = requests.put(url, data=json.dumps(payload), headers=headers, auth=auth)
+    response = session.put(f"/rest/api/3/issue/{subtask_key}", data=json.dumps(payload))
 
     if response.status_code == 204:
         print(f"✅ Subtask描述更新成功: {subtask_key}")
@@ -48,10 +37,10 @@ def update_subtask_description(subtask_key: str, description: str):
         print(f"❌ 更新失败: {response.text}")
         return False
 
-def enrich_subtasks(subtask_keys: list, descriptions: list):
-    """批量充实Subtask内容"""
-    for subtask_key, description in zip(subtask_keys, descriptions):
-        update_subtask_description(subtask_key, description)
+@jira_operation("enrich_subtasks", summary=True)
+def enrich_subtasks(subtask_keys: list, descriptions: list, max_workers: int = None):
+    """批量充实Subtask内容（有界并发），返回与输入顺序一致的结果列表"""
+    return run_concurrently(update_subtask_description, list(zip(subtask_keys, descriptions)), max_workers)
 
 if __name__ == "__main__":
     # 示例：更新单个Subtask描述
@@ -0,0 +1,372 @@
+"""
+按依赖图执行完整的分解计划
+
+计划文件（JSON 或 JSONL）描述 Epic → Story → 子需求 → 开发任务 → 链接 的依赖图，
+节点之间用 "$节点ID" 引用，执行时替换为已创建issue的Key；不以 $ 开头的引用视为已有issue的Key。
+执行器按依赖分层：同一层的节点全部就绪后一起执行，创建走 /issue/bulk（每50个一批，多批并发），
+链接并发提交，编号按Story/子需求一次性预留。总耗时约等于依赖图的层数，而不是issue个数。
+
+计划格式：
+{
+  "project": "CMT",
+  "nodes": [
+    {"id": "epic", "type": "epic", "summary": "...", "description": "..."},
+    {"id": "login", "type": "story", "parent": "$epic", "summary": "...", "description": "..."},
+    {"id": "req1", "type": "subtask", "parent": "$login", "summary": "...", "description": "..."},
+    {"id": "dev1", "type": "task", "implements": "$req1", "summary": "...", "description": "实现 ${req1}"},
+    {"type": "link", "from": "$dev1", "to": "CMT-12", "link_type": "Blocks"}
+  ]
+}
+  subtask  子需求，编号 [REQ-<Story Key>-N]
+  task     开发任务，编号 [DEV-<子需求Key>-N]，parent 默认取所实现子需求的Story，创建时即链接到子需求（Relates）
+  link     inwardIssue=from，outwardIssue=to，link_type 默认 Relates
+  summary/description 中的 ${节点ID} 替换为对应Key；节点可带 labels 追加标签
+JSONL格式每行一个节点，只含 "project" 的行设置项目。
+
+执行记录在操作日志（batch_journal）中，中断后重新执行同一计划：已完成的节点直接跳过，
+已提交但未确认的创建按幂等标签核对，编号不变。
+
+用法：python execute_plan.py <计划文件> [--dry-run] [--json]
+"""
+import json
+import re
+import sys
+
+from adf import text_to_adf
+from batch_journal import LINK_ARROW, BatchJournal, idem_label, idempotency_key, reconcile_created
+from batch_runner import run_concurrently
+from issue_cache import index_created
+from jira_client import BULK_CREATE_LIMIT, JiraApiError, bulk_create_issues, session_from_config
+from jira_config import load_jira_config
+from jira_metadata import resolve_issue_types
+from jira_metrics import jira_operation
+from sequence_allocator import allocate_number_groups
+
+ISSUE_TYPES = {"epic": "Epic", "story": "Story", "subtask": "Subtask", "task": "Subtask"}
+REF_FIELDS = ("parent", "implements", "from", "to")
+_TEXT_REF = re.compile(r"\$\{([\w.-]+)\}")
+
+
+def read_jira_config():
+    """读取当前目录下的jira.md配置文件"""
+    return load_jira_config(["jira.md"], required=True)
+
+
+def load_plan(plan_file: str):
+    """读取计划文件，返回 (项目Key, 节点列表)；链接节点未指定ID时自动编号"""
+    with open(plan_file, "r", encoding="utf-8") as f:
+        content = f.read()
+
+    project = None
+    if plan_file.endswith(".jsonl"):
+        nodes = []
+        for line in content.splitlines():
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            if set(item) == {"project"}:
+                project = item["project"]
+            else:
+                nodes.append(item)
+    else:
+        data = json.loads(content)
+        if isinstance(data, dict):
+            project, nodes = data.get("project"), data.get("nodes", [])
+        else:
+            nodes = data
+
+    for index, node in enumerate(nodes):
+        node.setdefault("id", f"{node.get('type', 'node')}-{index + 1}")
+        if node.get("type") == "link":
+            node.setdefault("link_type", "Relates")
+    return project, nodes
+
+
+def node_refs(node: dict) -> list:
+    """节点引用的其他计划节点ID（按出现顺序去重）"""
+    refs = [node[field][1:] for field in REF_FIELDS if str(node.get(field, "")).startswith("$")]
+    for field in ("summary", "description"):
+        refs += _TEXT_REF.findall(node.get(field) or "")
+    return list(dict.fromkeys(refs))
+
+
+def plan_levels(nodes: list) -> list:
+    """
+    校验计划并按依赖分层，返回 [[节点, ...], ...]
+    开发任务未指定 parent 时补为所实现子需求的Story；引用不存在或存在环时抛出 ValueError
+    """
+    by_id = {}
+    for node in nodes:
+        if node["id"] in by_id:
+            raise ValueError(f"节点ID重复: {node['id']}")
+        if node.get("type") not in (*ISSUE_TYPES, "link"):
+            raise ValueError(f"节点 {node['id']} 类型无效: {node.get('type')}")
+        by_id[node["id"]] = node
+
+    for node in nodes:
+        if node["type"] == "task" and not node.get("parent"):
+            implemented = by_id.get(str(node.get("implements", ""))[1:])
+            if implemented and implemented.get("parent"):
+                node["parent"] = implemented["parent"]
+        if node["type"] in ("subtask", "task") and not node.get("parent"):
+            raise ValueError(f"节点 {node['id']} 缺少 parent")
+        if node["type"] == "link" and not (node.get("from") and node.get("to")):
+            raise ValueError(f"链接节点 {node['id']} 缺少 from/to")
+        missing = [ref for ref in node_refs(node) if ref not in by_id]
+        if missing:
+            raise ValueError(f"节点 {node['id']} 引用了不存在的节点: {', '.join(missing)}")
+        # 链接节点不产生 Issue，不能被 parent/implements/from/to 或 ${id} 引用
+        links = [f"${ref}" for ref in node_refs(node) if by_id[ref]["type"] == "link"]
+        if links:
+            raise ValueError(f"节点 {node['id']} 引用了链接节点: {', '.join(links)}")
+
+    levels, depth = [], {}
+    remaining = list(nodes)
+    while remaining:
+        ready = [node for node in remaining if all(ref in depth for ref in node_refs(node))]
+        if not ready:
+            raise ValueError(f"计划中存在循环依赖: {', '.join(node['id'] for node in remaining)}")
+        for node in ready:
+            depth[node["id"]] = len(levels)
+        levels.append(ready)
+        remaining = [node for node in remaining if node["id"] not in depth]
+    return levels
+
+
+def _step_key(project: str, node: dict) -> str:
+    """节点的幂等键，只取计划中的原始内容，重新执行同一计划时保持不变"""
+    return idempotency_key(project, node["id"], node["type"], node.get("summary", ""), node.get("description", ""),
+                           *(str(node.get(field, "")) for field in REF_FIELDS))
+
+
+class _Context:
+    """一次计划执行的共享状态"""
+
+    def __init__(self, session, project: str, journal: BatchJournal):
+        self.session = session
+        self.project = project
+        self.journal = journal
+        self.resolved = {}   # 节点ID -> {"key", "id"}
+        self.failed = {}     # 节点ID -> 原因
+        self.created = set()  # 本次执行中新创建的节点ID
+
+    def ref(self, value: str) -> dict:
+        """引用 -> {"key", "id"}；已有issue只知道Key"""
+        value = str(value)
+        return self.resolved[value[1:]] if value.startswith("$") else {"key": value, "id": None}
+
+    def text(self, value: str) -> str:
+        return _TEXT_REF.sub(lambda m: self.resolved[m.group(1)]["key"], value or "")
+
+
+def _build_payload(ctx: _Context, node: dict, number) -> dict:
+    """生成创建payload；number 为预留的 REQ/DEV 编号（Epic、Story为None）"""
+    fields = {
+        "project": {"key": node.get("project") or ctx.project},
+        "issuetype": {"name": ISSUE_TYPES[node["type"]]},
+        "summary": ctx.text(node["summary"]),
+        "description": text_to_adf(ctx.text(node.get("description", ""))),
+        "labels": list(node.get("labels") or []),
+    }
+    payload = {"fields": fields}
+    if node.get("parent"):
+        parent = ctx.ref(node["parent"])
+        fields["parent"] = {"id": parent["id"]} if parent["id"] else {"key": parent["key"]}
+
+    if node["type"] in ("epic", "story"):
+        fields["labels"].insert(0, "requirement")
+    elif node["type"] == "subtask":
+        story_key = ctx.ref(node["parent"])["key"]
+        fields["summary"] = f"[{number}] {fields['summary']}"
+        fields["labels"][:0] = ["requirement", f"REQ-{story_key}"]
+    else:
+        fields["summary"] = f"[{number}] {fields['summary']}"
+        fields["labels"][:0] = ["implementation", number]
+        if node.get("implements"):
+            # 创建时直接链接到子需求，省去单独的链接请求
+            payload["update"] = {"issuelinks": [{"add": {"type": {"name": "Relates"},
+                                                         "outwardIssue": {"key": ctx.ref(node["implements"])["key"]}}}]}
+    return payload
+
+
+def _allocate(ctx: _Context, nodes: list) -> dict:
+    """
+    一次性预留本层所需的编号，返回 {节点ID: 编号}
+    同一Story下的 DEV 前缀共用一次查询，不同Story并发查询；预留失败的节点不在返回结果中
+    """
+    groups = {}  # JQL -> {前缀: [节点ID]}
+    for node in nodes:
+        story_key = ctx.ref(node["parent"])["key"] if node.get("parent") else None
+        if node["type"] == "subtask":
+            owner = node["parent"]
+            prefix, jql = f"REQ-{story_key}", f"parent = {story_key}"
+        elif node["type"] == "task":
+            owner = node.get("implements") or node["parent"]
+            prefix, jql = f"DEV-{ctx.ref(owner)['key']}", f"parent = {story_key} AND labels = implementation"
+        else:
+            continue
+        if str(owner).startswith("$") and owner[1:] in ctx.created:
+            jql = None  # 编号所属的issue刚刚创建，JIRA中不会有已用编号
+        groups.setdefault(jql, {}).setdefault(prefix, []).append(node["id"])
+
+    queries = list(groups)
+    with jira_operation("allocate_number"):
+        firsts = run_concurrently(allocate_number_groups, [
+            (ctx.session, {prefix: len(ids) for prefix, ids in groups[jql].items()}, jql) for jql in queries])
+    numbers = {}
+    for jql, group_firsts in zip(queries, firsts):
+        if not group_firsts:
+            continue
+        for prefix, node_ids in groups[jql].items():
+            for offset, node_id in enumerate(node_ids):
+                numbers[node_id] = f"{prefix}-{group_firsts[prefix] + offset}"
+    return numbers
+
+
+def _create_link(ctx: _Context, node: dict, step: str):
+    payload = {"type": {"name": node["link_type"]},
+               "inwardIssue": {"key": ctx.ref(node["from"])["key"]},
+               "outwardIssue": {"key": ctx.ref(node["to"])["key"]}}
+    ctx.journal.plan(step, {"payload": payload})
+    response = ctx.session.post("/rest/api/3/issueLink", data=json.dumps(payload), idempotency_key=step)
+    if response.status_code != 201:
+        return {"ok": False, "error": f"{response.status_code} - {response.text}"}
+    result = {"ok": True, "key": f"{payload['inwardIssue']['key']}{LINK_ARROW}{payload['outwardIssue']['key']}"}
+    ctx.journal.done(step, result)
+    return result
+
+
+def _run_step(ctx: _Context, kind: str, arg):
+    if kind == "bulk":
+        results = bulk_create_issues(ctx.session, resolve_issue_types(ctx.session, arg))
+        index_created(ctx.session, arg, results)
+        return results
+    return _create_link(ctx, *arg)
+
+
+def _execute_level(ctx: _Context, level: list, steps: dict):
+    creates, links = [], []
+    for node in level:
+        if any(ref in ctx.failed for ref in node_refs(node)):
+            ctx.failed[node["id"]] = "依赖的节点未完成"
+            print(f"⏭️  {node['id']}: 依赖的节点未完成，跳过")
+            continue
+        done = ctx.journal.result(steps[node["id"]])
+        if done:
+            if node["type"] != "link":
+                ctx.resolved[node["id"]] = {"key": done["key"], "id": done.get("id")}
+            print(f"⏭️  {node['id']} → {done['key']}（已完成，跳过）")
+        elif node["type"] == "link":
+            links.append(node)
+        else:
+            creates.append(node)
+
+    planned = []  # (节点, payload)
+    fresh = [node for node in creates if not ctx.journal.planned(steps[node["id"]])]
+    numbers = _allocate(ctx, fresh)
+    new_plans = []
+    for node in creates:
+        plan = ctx.journal.planned(steps[node["id"]])
+        if plan:
+            planned.append((node, plan["data"]["payload"]))  # 沿用原编号
+            continue
+        if node["type"] in ("subtask", "task") and node["id"] not in numbers:
+            ctx.failed[node["id"]] = "预留编号失败"
+            print(f"❌ {node['id']}: 预留编号失败，跳过")
+            continue
+        payload = _build_payload(ctx, node, numbers.get(node["id"]))
+        payload["fields"]["labels"].append(idem_label(steps[node["id"]]))
+        planned.append((node, payload))
+        new_plans.append((steps[node["id"]], {"payload": payload}))
+    ctx.journal.plan_many(new_plans)
+
+    # 创建按批并发，链接与之同时提交（链接只依赖之前各层的节点）
+    chunks = [planned[start:start + BULK_CREATE_LIMIT] for start in range(0, len(planned), BULK_CREATE_LIMIT)]
+    outcomes = run_concurrently(_run_step, [(ctx, "bulk", [payload for _, payload in chunk]) for chunk in chunks]
+                                + [(ctx, "link", (node, steps[node["id"]])) for node in links])
+
+    completed = []
+    for chunk, results in zip(chunks, outcomes[:len(chunks)]):
+        for (node, _), result in zip(chunk, results or [{"ok": False, "error": "批量创建失败"}] * len(chunk)):
+            if result["ok"]:
+                ctx.resolved[node["id"]] = {"key": result["key"], "id": result["id"]}
+                ctx.created.add(node["id"])
+                completed.append((steps[node["id"]], result))
+                print(f"✅ {node['id']} → {result['key']}")
+            else:
+                ctx.failed[node["id"]] = result["error"]
+                print(f"❌ {node['id']} 创建失败: {result['error']}")
+    ctx.journal.done_many(completed)
+
+    for node, result in zip(links, outcomes[len(chunks):]):
+        if result and result["ok"]:
+            print(f"🔗 {node['id']}: {result['key']}")
+        else:
+            ctx.failed[node["id"]] = result["error"] if result else "链接失败"
+            print(f"❌ {node['id']} 链接失败: {ctx.failed[node['id']]}")
+
+
+@jira_operation("execute_plan", summary=True)
+def execute_plan(plan_file: str, dry_run: bool = False):
+    """
+    执行分解计划，返回 {节点ID: issue Key}（只含已创建的issue节点）
+    计划无效或无法核对上次中断的创建时返回None
+    """
+    try:
+        project, nodes = load_plan(plan_file)
+        levels = plan_levels(nodes)
+    except (OSError, ValueError) as e:
+        print(f"❌ 计划无效: {e}")
+        return None
+
+    print(f"📋 计划 {plan_file}: {len(nodes)} 个节点，{len(levels)} 层")
+    if dry_run:
+        for depth, level in enumerate(levels, 1):
+            counts = {}
+            for node in level:
+                counts[node["type"]] = counts.get(node["type"], 0) + 1
+            print(f"   第{depth}层: " + "，".join(f"{kind} {count}" for kind, count in counts.items()))
+        return {}
+
+    if not project and any(node["type"] != "link" and not node.get("project") for node in nodes):
+        print("❌ 计划未指定 project")
+        return None
+
+    config = read_jira_config()
+    session = session_from_config(config)
+    journal = BatchJournal("execute_plan")
+    steps = {node["id"]: _step_key(project, node) for node in nodes}
+
+    # 上次中断时已提交但未确认的创建，先按幂等标签核对，避免重复创建
+    # 已完成的节点确认其issue（链接为两端的issue）仍然存在，被删除的按新步骤重新执行
+    unconfirmed = [steps[node["id"]] for node in nodes
+                   if node["type"] != "link" and journal.planned(steps[node["id"]])]
+    try:
+        if unconfirmed:
+            reconcile_created(session, journal, unconfirmed)
+        journal.verify_done(session, list(steps.values()))
+    except JiraApiError as e:
+        print(f"❌ 核对上次执行的结果失败，为避免重复创建已中止: {e}")
+        return None
+
+    ctx = _Context(session, project, journal)
+    for depth, level in enumerate(levels, 1):
+        print(f"\n🚀 第{depth}/{len(levels)}层: {len(level)} 个节点")
+        # 每层单独记为一个操作：各层依次执行，演练报告不会把不同层的调用合并
+        with jira_operation(f"level_{depth}"):
+            _execute_level(ctx, level, steps)
+
+    created = {node["id"]: ctx.resolved[node["id"]]["key"] for node in nodes if node["id"] in ctx.resolved}
+    print(f"\n{'✅' if not ctx.failed else '⚠️ '} 计划执行完成: {len(created)} 个issue，失败 {len(ctx.failed)} 个节点")
+    return created
+
+
+if __name__ == "__main__":
+    args = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    if not args:
+        print("用法: python execute_plan.py <计划文件> [--dry-run] [--json]")
+        sys.exit(1)
+    result = execute_plan(args[0], dry_run="--dry-run" in sys.argv)
+    if result is not None and "--json" in sys.argv:
+        print(json.dumps(result, ensure_ascii=False, indent=2))
+    sys.exit(0 if result is not None else 1)
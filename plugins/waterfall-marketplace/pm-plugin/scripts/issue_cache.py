@@ -0,0 +1,431 @@
+"""
+本地SQLite issue缓存
+
+缓存issue的 key、id、类型、父级、标题、状态、标签、描述纯文本与链接，
+链接另存为邻接表 issue_links（inward → outward，与创建链接时的字段一致），
+REQ/TASK/DEV 编号（来自标签与Summary前缀）另存为追溯索引 trace（查询见 traceability.py），
+近似重复检测的 MinHash 签名另存为 minhash（见 duplicate_detector.py），
+每个JIRA站点一个数据库文件（位于状态目录）。通过 sync_project() 以
+JQL "updated >= -Nm" 增量同步，所有脚本都可以先读本地数据，未命中或
+过期时再回源JIRA。增量查询看不到已删除的issue，因此全量同步时、以及增量同步
+距上次核对超过 JIRA_CACHE_RECONCILE_INTERVAL 秒时，按只返回id的查询核对项目的全部issue，
+移除JIRA中已不存在的行。删除前的安全检查（如是否还有子issue）不读缓存，直接查询JIRA。
+运行 jira_webhook_receiver.py 时，推送的变更直接写入缓存，
+接收器覆盖的项目在其心跳新鲜期间始终视为最新。
+注意：本模块在各插件的 scripts 目录中保持一致，修改时请同步。
+
+命令行：python issue_cache.py sync <PROJECT_KEY> [--full]
+"""
+import json
+import math
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+from urllib.parse import urlparse
+
+from adf import adf_to_text
+from jira_client import JiraApiError, search_issues
+from local_state import read_json_state, state_path
+
+# 缓存数据的有效期（秒）：行本身或所属项目在此时间内同步过即视为新鲜
+CACHE_MAX_AGE = int(os.environ.get("JIRA_CACHE_MAX_AGE", "600"))
+# webhook接收器的心跳超过该秒数未更新即视为已停止
+WEBHOOK_HEARTBEAT_TIMEOUT = 60
+# 增量同步时核对已删除issue的最小间隔（秒）
+RECONCILE_INTERVAL = int(os.environ.get("JIRA_CACHE_RECONCILE_INTERVAL", "3600"))
+
+CACHE_FIELDS = ["summary", "issuetype", "parent", "status", "labels", "description", "issuelinks", "updated", "project"]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS issues (
+    key         TEXT PRIMARY KEY,
+    id          TEXT UNIQUE,
+    project     TEXT,
+    type        TEXT,
+    parent      TEXT,
+    summary     TEXT,
+    status      TEXT,
+    labels      TEXT,
+    description TEXT,
+    links       TEXT,
+    updated     TEXT,
+    cached_at   REAL
+);
+CREATE INDEX IF NOT EXISTS idx_issues_parent ON issues(parent);
+CREATE INDEX IF NOT EXISTS idx_issues_project ON issues(project);
+CREATE TABLE IF NOT EXISTS issue_links (
+    id      TEXT,
+    type    TEXT,
+    inward  TEXT,
+    outward TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_links_inward ON issue_links(inward);
+CREATE INDEX IF NOT EXISTS idx_links_outward ON issue_links(outward);
+CREATE TABLE IF NOT EXISTS trace (
+    project TEXT,
+    kind    TEXT,
+    number  TEXT,
+    owner   TEXT,
+    seq     INTEGER,
+    key     TEXT,
+    PRIMARY KEY (project, kind, number)
+);
+CREATE INDEX IF NOT EXISTS idx_trace_number ON trace(number);
+CREATE INDEX IF NOT EXISTS idx_trace_key ON trace(key);
+CREATE INDEX IF NOT EXISTS idx_trace_owner ON trace(kind, owner);
+CREATE TABLE IF NOT EXISTS minhash (
+    key       TEXT PRIMARY KEY,
+    digest    TEXT,
+    signature BLOB
+);
+CREATE TABLE IF NOT EXISTS sync_state (
+    project        TEXT PRIMARY KEY,
+    last_sync      REAL,
+    last_reconcile REAL
+);
+"""
+
+_local = threading.local()
+
+# REQ-<Story Key>-N / TASK-<Story Key>-N / DEV-<子需求Key>-N；不带序号的分组标签（如 REQ-CMT-5）不匹配
+TRACE_KINDS = ("REQ", "TASK", "DEV")
+_TRACE_LABEL = re.compile(r"^(REQ|TASK|DEV)-([A-Z][A-Z0-9_]*-\d+)-(\d+)$")
+_TRACE_SUMMARY = re.compile(r"^\s*\[(REQ|TASK|DEV)-([A-Z][A-Z0-9_]*-\d+)-(\d+)\]")
+
+
+def site_name(session) -> str:
+    """JIRA站点在状态目录文件名中的标识"""
+    return re.sub(r"[^A-Za-z0-9_.-]", "_", urlparse(session.base_url).netloc or "default")
+
+
+def _db_path(session) -> str:
+    return state_path(f"issues-{site_name(session)}.sqlite3")
+
+
+def connect(session) -> sqlite3.Connection:
+    """获取当前线程对应站点的缓存连接"""
+    connections = getattr(_local, "connections", None)
+    if connections is None:
+        connections = _local.connections = {}
+
+    path = _db_path(session)
+    conn = connections.get(path)
+    if conn is None:
+        conn = sqlite3.connect(path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        _migrate(conn)
+        conn.executescript(_SCHEMA)
+        connections[path] = conn
+    return conn
+
+
+def _columns(conn, table: str) -> list:
+    return [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+
+
+def _migrate(conn):
+    """升级旧版本的缓存库：trace 改为按 (项目, 类别, 编号) 存储后由缓存的issue重建，sync_state 增加核对时间"""
+    with conn:
+        columns = _columns(conn, "trace")
+        if columns and "project" not in columns:
+            conn.execute("DROP TABLE trace")
+            conn.executescript(_SCHEMA)
+            _replace_trace(conn, [(row[0], row[1], json.loads(row[2] or "[]"))
+                                  for row in conn.execute("SELECT key, summary, labels FROM issues")])
+        columns = _columns(conn, "sync_state")
+        if columns and "last_reconcile" not in columns:
+            conn.execute("ALTER TABLE sync_state ADD COLUMN last_reconcile REAL")
+
+
+def issue_to_row(issue: dict) -> dict:
+    """将JIRA返回的issue转换为缓存行"""
+    fields = issue.get("fields") or {}
+    links = []
+    for link in fields.get("issuelinks") or []:
+        link_type = (link.get("type") or {}).get("name", "")
+        if link.get("outwardIssue"):
+            links.append({"id": link.get("id"), "type": link_type, "direction": "outward",
+                          "key": link["outwardIssue"].get("key")})
+        if link.get("inwardIssue"):
+            links.append({"id": link.get("id"), "type": link_type, "direction": "inward",
+                          "key": link["inwardIssue"].get("key")})
+
+    key = issue["key"]
+    project = (fields.get("project") or {}).get("key") or key.rsplit("-", 1)[0]
+    return {
+        "key": key,
+        "id": str(issue.get("id", "")),
+        "project": project,
+        "type": (fields.get("issuetype") or {}).get("name", ""),
+        "parent": (fields.get("parent") or {}).get("key", ""),
+        "summary": fields.get("summary") or "",
+        "status": (fields.get("status") or {}).get("name", ""),
+        "labels": fields.get("labels") or [],
+        "description": adf_to_text(fields.get("description")),
+        "links": links,
+        "updated": fields.get("updated") or "",
+    }
+
+
+def _row_to_dict(row: sqlite3.Row) -> dict:
+    data = dict(row)
+    data["labels"] = json.loads(data["labels"] or "[]")
+    data["links"] = json.loads(data["links"] or "[]")
+    return data
+
+
+def upsert_issues(session, issues):
+    """写入（或更新）一批JIRA issue，返回写入数量"""
+    rows = [issue_to_row(issue) for issue in issues]
+    now = time.time()
+    conn = connect(session)
+    with conn:
+        conn.executemany(
+            "INSERT OR REPLACE INTO issues "
+            "(key, id, project, type, parent, summary, status, labels, description, links, updated, cached_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            [(r["key"], r["id"], r["project"], r["type"], r["parent"], r["summary"], r["status"],
+              json.dumps(r["labels"], ensure_ascii=False), r["description"],
+              json.dumps(r["links"], ensure_ascii=False), r["updated"], now) for r in rows])
+
+        # issue视图包含其两端的全部链接：以本次返回的链接替换该issue在邻接表中的记录
+        linked = [(issue, row) for issue, row in zip(issues, rows) if "issuelinks" in (issue.get("fields") or {})]
+        conn.executemany("DELETE FROM issue_links WHERE inward = ? OR outward = ?",
+                         [(row["key"], row["key"]) for _, row in linked])
+        conn.executemany("INSERT INTO issue_links (id, type, inward, outward) "
+                         "SELECT ?, ?, ?, ? WHERE NOT EXISTS (SELECT 1 FROM issue_links WHERE id = ?)",
+                         [(link["id"], link["type"], *_link_ends(row["key"], link), link["id"])
+                          for _, row in linked for link in row["links"]])
+        _replace_trace(conn, [(row["key"], row["summary"], row["labels"]) for row in rows])
+    return len(rows)
+
+
+def trace_numbers(summary: str, labels) -> list:
+    """从Summary前缀与标签中解析编号，返回 [(编号, 类别, 所属issue, 序号), ...]"""
+    matches = [_TRACE_SUMMARY.match(summary or "")] + [_TRACE_LABEL.match(label) for label in labels or []]
+    numbers = {}
+    for match in filter(None, matches):
+        kind, owner, seq = match.group(1), match.group(2), int(match.group(3))
+        numbers[f"{kind}-{owner}-{seq}"] = (kind, owner, seq)
+    return [(number, *value) for number, value in numbers.items()]
+
+
+def _replace_trace(conn, entries):
+    """entries: [(key, summary, labels)]，以解析结果替换这些issue在追溯索引中的记录"""
+    conn.executemany("DELETE FROM trace WHERE key = ?", [(key,) for key, _, _ in entries])
+    conn.executemany("INSERT OR REPLACE INTO trace (project, kind, number, owner, seq, key) VALUES (?, ?, ?, ?, ?, ?)",
+                     [(key.rsplit("-", 1)[0], kind, number, owner, seq, key) for key, summary, labels in entries
+                      for number, kind, owner, seq in trace_numbers(summary, labels)])
+
+
+def index_trace(session, issues):
+    """用只含 summary/labels 的查询结果更新追溯索引（如编号分配时的查询）"""
+    conn = connect(session)
+    with conn:
+        _replace_trace(conn, [(issue["key"], (issue.get("fields") or {}).get("summary"),
+                               (issue.get("fields") or {}).get("labels")) for issue in issues])
+
+
+def index_created(session, payloads, results):
+    """创建成功后立即登记编号：payloads 为创建payload，results 为对应的 {"ok", "key"} 结果"""
+    index_trace(session, [{"key": result["key"], "fields": payload["fields"]}
+                          for payload, result in zip(payloads, results) if result and result.get("ok")])
+
+
+def trace_max_numbers(session, prefixes) -> dict:
+    """追溯索引中各编号前缀（如 DEV-CMT-76）的最大序号（不存在时为0）"""
+    conn = connect(session)
+    max_numbers = {}
+    for prefix in prefixes:
+        kind, owner = prefix.split("-", 1)
+        row = conn.execute("SELECT MAX(seq) AS seq FROM trace WHERE kind = ? AND owner = ?", (kind, owner)).fetchone()
+        max_numbers[prefix] = row["seq"] or 0
+    return max_numbers
+
+
+def _link_ends(key: str, link: dict) -> tuple:
+    """issue视图中的一条链接 -> (inward, outward)；视图中的 outwardIssue 表示本issue是inward一端"""
+    return (key, link["key"]) if link["direction"] == "outward" else (link["key"], key)
+
+
+def get_links(session, keys) -> list:
+    """从邻接表读取与这些issue相关的全部链接 [{"id", "type", "inward", "outward"}, ...]"""
+    keys = list(keys)
+    rows = []
+    conn = connect(session)
+    for start in range(0, len(keys), 400):
+        chunk = keys[start:start + 400]
+        marks = ",".join("?" * len(chunk))
+        rows += conn.execute(f"SELECT * FROM issue_links WHERE inward IN ({marks}) OR outward IN ({marks})",
+                             chunk + chunk).fetchall()
+    unique = {(row["id"], row["type"], row["inward"], row["outward"]): dict(row) for row in rows}
+    return list(unique.values())
+
+
+def add_links(session, links):
+    """把新建的链接写入邻接表 [{"id": 可为None, "type", "inward", "outward"}, ...]"""
+    conn = connect(session)
+    with conn:
+        conn.executemany("INSERT INTO issue_links (id, type, inward, outward) VALUES (?, ?, ?, ?)",
+                         [(link.get("id"), link["type"], link["inward"], link["outward"]) for link in links])
+
+
+def remove_links(session, link_ids):
+    """从邻接表移除已删除的链接"""
+    conn = connect(session)
+    with conn:
+        conn.executemany("DELETE FROM issue_links WHERE id = ?", [(link_id,) for link_id in link_ids])
+
+
+def update_status(session, key: str, status: str):
+    """转换成功后更新缓存中该issue的状态（未缓存时不做任何事）"""
+    conn = connect(session)
+    with conn:
+        conn.execute("UPDATE issues SET status = ? WHERE key = ?", (status, key))
+
+
+def delete_issues(session, keys):
+    """从缓存中移除已删除的issue"""
+    conn = connect(session)
+    with conn:
+        conn.executemany("DELETE FROM issues WHERE key = ?", [(key,) for key in keys])
+        conn.executemany("DELETE FROM issue_links WHERE inward = ? OR outward = ?", [(key, key) for key in keys])
+        conn.executemany("DELETE FROM trace WHERE key = ?", [(key,) for key in keys])
+        conn.executemany("DELETE FROM minhash WHERE key = ?", [(key,) for key in keys])
+
+
+def last_sync(session, project_key: str):
+    """项目最近一次同步的时间戳（未同步返回None）"""
+    row = connect(session).execute(
+        "SELECT last_sync FROM sync_state WHERE project = ?", (project_key,)).fetchone()
+    return row["last_sync"] if row else None
+
+
+def webhook_covers(session, project_key: str, synced: float) -> bool:
+    """webhook接收器在 synced 这次同步之前就已运行、覆盖该项目且心跳新鲜时，缓存由推送保持最新"""
+    status = read_json_state(f"webhook-receiver-{site_name(session)}.json", None) or {}
+    return (project_key in status.get("projects", ()) and status.get("started_at", float("inf")) <= synced
+            and time.time() - status.get("heartbeat", 0) <= WEBHOOK_HEARTBEAT_TIMEOUT)
+
+
+def is_project_fresh(session, project_key: str, max_age: int = CACHE_MAX_AGE) -> bool:
+    """项目是否在 max_age 秒内同步过，或由运行中的webhook接收器保持最新（max_age 为0时不考虑接收器）"""
+    synced = last_sync(session, project_key)
+    if synced is None:
+        return False
+    return time.time() - synced <= max_age or (max_age > 0 and webhook_covers(session, project_key, synced))
+
+
+def get_cached_issue(session, key_or_id: str, max_age: int = CACHE_MAX_AGE):
+    """按key或内部id读取缓存中的新鲜issue（未命中或过期返回None）"""
+    column = "id" if str(key_or_id).isdigit() else "key"
+    row = connect(session).execute(f"SELECT * FROM issues WHERE {column} = ?", (str(key_or_id),)).fetchone()
+    if row is None:
+        return None
+    if time.time() - row["cached_at"] > max_age and not is_project_fresh(session, row["project"], max_age):
+        return None
+    return _row_to_dict(row)
+
+
+def get_cached_children(session, parent_key: str, max_age: int = CACHE_MAX_AGE):
+    """读取父issue的全部子issue；仅当所属项目近期同步过时可信，否则返回None"""
+    if not is_project_fresh(session, parent_key.rsplit("-", 1)[0], max_age):
+        return None
+    rows = connect(session).execute(
+        "SELECT * FROM issues WHERE parent = ? ORDER BY CAST(id AS INTEGER)", (parent_key,)).fetchall()
+    return [_row_to_dict(row) for row in rows]
+
+
+def fetch_issue(session, key_or_id: str, max_age: int = CACHE_MAX_AGE):
+    """先读缓存，未命中时从JIRA获取并写入缓存；获取失败抛出 JiraApiError"""
+    cached = get_cached_issue(session, key_or_id, max_age)
+    if cached is not None:
+        return cached
+
+    response = session.get(f"/rest/api/3/issue/{key_or_id}", params={"fields": ",".join(CACHE_FIELDS)}, hedge=True)
+    if response.status_code != 200:
+        raise JiraApiError(response)
+    issue = response.json()
+    upsert_issues(session, [issue])
+    return issue_to_row(issue)
+
+
+def _remove_missing(session, project_key: str, present_ids: set) -> int:
+    """移除缓存中属于该项目、但不在 present_ids 中的issue（已在JIRA中删除或移走），返回移除数量"""
+    rows = connect(session).execute("SELECT key, id FROM issues WHERE project = ?", (project_key,)).fetchall()
+    missing = [row["key"] for row in rows if row["id"] not in present_ids]
+    if missing:
+        delete_issues(session, missing)
+    return len(missing)
+
+
+def reconcile_deleted(session, project_key: str) -> int:
+    """以只返回issue id的查询列出项目的全部issue，移除缓存中已不存在的，返回移除数量"""
+    started = time.time()
+    present = {str(issue["id"]) for issue in search_issues(session, f"project = {project_key}", page_size=1000)}
+    removed = _remove_missing(session, project_key, present)
+    conn = connect(session)
+    with conn:
+        conn.execute("UPDATE sync_state SET last_reconcile = ? WHERE project = ?", (started, project_key))
+    return removed
+
+
+def sync_project(session, project_key: str, full: bool = False) -> int:
+    """
+    增量同步项目的issue到本地缓存，返回本次写入的issue数
+    首次同步或 full=True 时全量拉取（并移除JIRA中已不存在的issue），之后只拉取上次同步以来更新过的issue
+    （JQL按分钟计时，额外回看1分钟避免漏掉边界上的更新）；距上次核对超过 RECONCILE_INTERVAL 时
+    另以只返回id的查询核对已删除的issue。
+    """
+    started = time.time()
+    previous = None if full else last_sync(session, project_key)
+
+    jql = f"project = {project_key}"
+    if previous is not None:
+        minutes = math.ceil((started - previous) / 60) + 1
+        jql += f" AND updated >= -{minutes}m"
+    jql += " ORDER BY updated ASC"
+
+    count = 0
+    batch = []
+    seen = set()
+    for issue in search_issues(session, jql, fields=CACHE_FIELDS, prefetch=True):
+        batch.append(issue)
+        seen.add(str(issue["id"]))
+        if len(batch) >= 200:
+            count += upsert_issues(session, batch)
+            batch = []
+    if batch:
+        count += upsert_issues(session, batch)
+
+    conn = connect(session)
+    row = conn.execute("SELECT last_reconcile FROM sync_state WHERE project = ?", (project_key,)).fetchone()
+    reconciled = row["last_reconcile"] if row else None
+    if previous is None:
+        _remove_missing(session, project_key, seen)  # 全量结果即项目的全部issue
+        reconciled = started
+    with conn:
+        conn.execute("INSERT OR REPLACE INTO sync_state (project, last_sync, last_reconcile) VALUES (?, ?, ?)",
+                     (project_key, started, reconciled))
+    if reconciled is None or started - reconciled >= RECONCILE_INTERVAL:
+        reconcile_deleted(session, project_key)
+    return count
+
+
+if __name__ == "__main__":
+    from jira_client import session_from_config
+    from jira_config import load_jira_config
+
+    if len(sys.argv) < 3 or sys.argv[1] != "sync":
+        print("用法: python issue_cache.py sync <PROJECT_KEY> [--full]")
+        sys.exit(1)
+
+    config = load_jira_config([os.path.join(os.getcwd(), "jira.md")], required=True)
+    session = session_from_config(config)
+    project = sys.argv[2]
+    synced = sync_project(session, project, full="--full" in sys.argv)
+    print(f"✅ 项目 {project} 同步完成: {synced} 个issue → {_db_path(session)}")
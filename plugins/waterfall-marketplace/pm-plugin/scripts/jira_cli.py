@@ -0,0 +1,116 @@
+"""
+JIRA脚本函数的轻量命令行客户端
+
+守护进程（jira_daemon.py）运行时通过Unix socket调用，省去每次启动解释器、导入requests、
+读取配置与TLS握手的开销；守护进程未运行时直接在本进程内调用同名函数，行为一致。
+本模块只导入标准库，不加载 requests。
+
+用法：python jira_cli.py <操作> [位置参数 ...] [--参数名=值 ...] [--json] [--no-daemon]
+     python jira_cli.py - [--json]      从标准输入逐行读取 {"op", "args", "kwargs"}，复用同一连接依次执行
+  参数值以 [ 或 { 开头时按JSON解析（如列表），其余按字符串传入
+  --json       输出函数返回值（JSON）
+  --no-daemon  不使用守护进程
+环境变量：JIRA_DAEMON_AUTOSTART=1  守护进程未运行时自动在后台启动
+          JIRA_DRY_RUN=1           演练：不使用守护进程，写操作只记录不发送（见 dry_run.py）
+
+示例：python jira_cli.py create_subtask 10001 "用户登录" "业务目标：……"
+     python jira_cli.py link_tasks_to_story '["DEV-1","DEV-2"]' STORY-1
+注意：本模块在各插件的 scripts 目录中保持一致，修改时请同步。
+"""
+import json
+import os
+import sys
+
+import jira_daemon
+
+
+def _parse_value(value: str):
+    if value[:1] in ("[", "{"):
+        try:
+            return json.loads(value)
+        except ValueError:
+            pass
+    return value
+
+
+def parse_command(argv: list) -> dict:
+    """把命令行参数转换为请求 {"op", "args", "kwargs"}"""
+    args, kwargs = [], {}
+    for arg in argv[1:]:
+        if arg.startswith("--") and "=" in arg:
+            name, value = arg[2:].split("=", 1)
+            kwargs[name.replace("-", "_")] = _parse_value(value)
+        elif not arg.startswith("--"):
+            args.append(_parse_value(arg))
+    return {"op": argv[0], "args": args, "kwargs": kwargs}
+
+
+def run_local(payload: dict) -> dict:
+    """在本进程内执行（守护进程不可用时）"""
+    try:
+        func = jira_daemon.resolve_operation(payload["op"])
+    except (LookupError, ImportError) as e:
+        return {"ok": False, "error": str(e)}
+    try:
+        result = func(*(payload.get("args") or []), **(payload.get("kwargs") or {}))
+    except Exception as e:
+        return {"ok": False, "error": f"{type(e).__name__}: {e}"}
+    return {"ok": True, "result": jira_daemon.to_jsonable(result)}
+
+
+def connect(use_daemon: bool):
+    """连接守护进程，不可用时返回None"""
+    if not use_daemon or not hasattr(jira_daemon.socket, "AF_UNIX"):
+        return None
+    if os.environ.get("JIRA_DAEMON_AUTOSTART") == "1" and not jira_daemon.ping():
+        jira_daemon.start_background()
+    try:
+        return jira_daemon.DaemonConnection()
+    except OSError:
+        return None
+
+
+def execute(connection, payload: dict) -> dict:
+    if connection is None:
+        return run_local(payload)
+    response = connection.call(payload)
+    sys.stdout.write(response.get("output") or "")
+    sys.stdout.flush()
+    return response
+
+
+def report(response: dict, as_json: bool) -> bool:
+    """输出错误与返回值，返回是否成功（函数返回 None/False 视为失败）"""
+    if not response["ok"]:
+        print(f"❌ {response.get('error')}")
+        return False
+    if as_json:
+        print(json.dumps(response.get("result"), ensure_ascii=False))
+    return response.get("result") not in (None, False)
+
+
+def main(argv: list) -> int:
+    as_json = "--json" in argv
+    # 演练（JIRA_DRY_RUN）在本进程内执行，报告随本进程输出
+    use_daemon = "--no-daemon" not in argv and os.environ.get("JIRA_DRY_RUN", "0") in ("", "0")
+    argv = [arg for arg in argv if arg not in ("--json", "--no-daemon")]
+    if not argv:
+        print(__doc__.strip().split("注意")[0].rstrip())
+        return 1
+
+    if argv[0] == "-":
+        payloads = [json.loads(line) for line in sys.stdin if line.strip()]
+    else:
+        payloads = [parse_command(argv)]
+
+    connection = connect(use_daemon)
+    try:
+        results = [report(execute(connection, payload), as_json) for payload in payloads]
+    finally:
+        if connection is not None:
+            connection.close()
+    return 0 if all(results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
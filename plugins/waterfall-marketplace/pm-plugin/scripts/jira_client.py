@@ -0,0 +1,421 @@
+"""
+共享的JIRA HTTP传输层
+
+所有脚本通过 get_session() 获取同一个保持长连接的 requests.Session，
+复用TLS连接、认证与请求头，避免每次调用都重新握手。
+
+每个请求都带连接/读取超时；多次调用组成的操作可用 deadline() 限定总时间，
+其中的请求、重试与等待都不会超过截止时间。幂等GET可传 hedge=True：
+超过该接口近期p95仍未返回时再发一个相同请求，取先返回的结果。
+JIRA_DRY_RUN=1 时写操作只记录不发送，退出时打印调用量与耗时估算（见 dry_run.py）。
+注意：本模块在各插件的 scripts 目录中保持一致，修改时请同步。
+"""
+import contextvars
+import json
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.auth import HTTPBasicAuth
+
+from dry_run import DRY_RUN, is_mutation, record_sent, simulate, touches_simulated
+from jira_metrics import endpoint_template, record_call
+from rate_limit import acquire_token, block_until, parse_retry_after, site_key
+
+# 连接池参数，可通过环境变量调整
+POOL_CONNECTIONS = int(os.environ.get("JIRA_POOL_CONNECTIONS", "4"))
+POOL_MAXSIZE = int(os.environ.get("JIRA_POOL_MAXSIZE", "32"))
+
+DEFAULT_HEADERS = {"Accept": "application/json", "Content-Type": "application/json"}
+
+# 重试策略：429 一律重试（请求未被处理）；5xx 与连接错误只对幂等请求或带幂等键的请求重试
+MAX_RETRIES = int(os.environ.get("JIRA_MAX_RETRIES", "4"))
+RETRY_BACKOFF_BASE = float(os.environ.get("JIRA_RETRY_BACKOFF", "0.5"))
+RETRY_BACKOFF_CAP = 30.0
+RETRY_STATUSES = {429, 502, 503, 504}
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+
+# 超时（秒）：单次请求的连接/读取超时，以及 deadline() 未指定时长时的操作总预算
+CONNECT_TIMEOUT = float(os.environ.get("JIRA_CONNECT_TIMEOUT", "5"))
+READ_TIMEOUT = float(os.environ.get("JIRA_READ_TIMEOUT", "30"))
+OPERATION_BUDGET = float(os.environ.get("JIRA_OPERATION_BUDGET", "300"))
+
+# 对冲读取：JIRA_HEDGE=0 关闭；JIRA_HEDGE_DELAY 固定对冲等待时间，未设置时取接口近期p95
+HEDGE_ENABLED = os.environ.get("JIRA_HEDGE", "1") != "0"
+HEDGE_DELAY = float(os.environ.get("JIRA_HEDGE_DELAY", "0"))
+HEDGE_MIN_DELAY = 0.05
+HEDGE_DEFAULT_DELAY = 1.0  # 样本不足时使用
+HEDGE_MIN_SAMPLES = 20
+
+_deadline = contextvars.ContextVar("jira_deadline", default=None)
+_latencies = {}  # 接口模板 -> 近期成功GET的耗时
+_latencies_lock = threading.Lock()
+_hedge_pool = None
+_hedge_pool_lock = threading.Lock()
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+class JiraApiError(Exception):
+    """JIRA返回非预期状态码"""
+
+    def __init__(self, response):
+        self.status_code = response.status_code
+        self.text = response.text
+        super().__init__(f"{response.status_code} - {response.text}")
+
+
+class DeadlineExceeded(requests.Timeout):
+    """操作的时间预算已用完"""
+
+
+@contextmanager
+def deadline(seconds: float = None):
+    """
+    限定其中全部JIRA调用（含重试与限流等待）的总时间，默认 JIRA_OPERATION_BUDGET 秒；
+    嵌套时取更早的截止时间，可用作装饰器。超时后的请求抛出 DeadlineExceeded
+    """
+    seconds = OPERATION_BUDGET if seconds is None else seconds
+    target = time.monotonic() + seconds if seconds > 0 else None
+    current = _deadline.get()
+    if current is not None and (target is None or current < target):
+        target = current
+    token = _deadline.set(target)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining_time():
+    """当前截止时间前剩余的秒数，未设置截止时间时返回None"""
+    target = _deadline.get()
+    return None if target is None else target - time.monotonic()
+
+
+def _within_deadline(delay: float) -> bool:
+    remaining = remaining_time()
+    return remaining is None or delay < remaining
+
+
+def _bounded_timeout(timeout, remaining):
+    """把请求超时收紧到截止时间以内"""
+    if remaining is None:
+        return timeout
+    if isinstance(timeout, tuple):
+        return tuple(remaining if value is None else min(value, remaining) for value in timeout)
+    return remaining if timeout is None else min(timeout, remaining)
+
+
+def _record_latency(endpoint: str, latency: float):
+    with _latencies_lock:
+        _latencies.setdefault(endpoint, deque(maxlen=200)).append(latency)
+
+
+def hedge_delay(endpoint: str) -> float:
+    """对冲前的等待时间：该接口近期耗时的p95"""
+    if HEDGE_DELAY > 0:
+        return HEDGE_DELAY
+    with _latencies_lock:
+        samples = sorted(_latencies.get(endpoint) or ())
+    if len(samples) < HEDGE_MIN_SAMPLES:
+        return HEDGE_DEFAULT_DELAY
+    return max(HEDGE_MIN_DELAY, samples[int(0.95 * (len(samples) - 1))])
+
+
+def _get_hedge_pool() -> ThreadPoolExecutor:
+    global _hedge_pool
+    with _hedge_pool_lock:
+        if _hedge_pool is None:
+            _hedge_pool = ThreadPoolExecutor(max_workers=16, thread_name_prefix="jira-hedge")
+        return _hedge_pool
+
+
+def _discard(future):
+    """对冲中落后的请求完成后释放其连接"""
+    if not future.cancelled() and future.exception() is None:
+        future.result().close()
+
+
+def base_url(jira_domain: str) -> str:
+    """根据JIRA域名生成基础URL（域名已带协议时原样使用）"""
+    domain = jira_domain.rstrip("/")
+    return domain if "://" in domain else f"https://{domain}"
+
+
+class JiraSession(requests.Session):
+    """绑定单个JIRA站点的Session，支持以 /rest/... 相对路径发起请求"""
+
+    def __init__(self, jira_domain: str, email: str, api_token: str):
+        super().__init__()
+        self.base_url = base_url(jira_domain)
+        self.site = site_key(self.base_url)  # 限流令牌桶按站点区分
+        self.auth = HTTPBasicAuth(email, api_token)
+        self.headers.update(DEFAULT_HEADERS)
+
+        adapter = HTTPAdapter(pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE)
+        self.mount("https://", adapter)
+        self.mount("http://", adapter)
+
+    def request(self, method, url, *args, idempotency_key=None, hedge=False, **kwargs):
+        """
+        发送请求：共享令牌桶限速，按重试策略处理 429/5xx，受当前 deadline() 约束
+        idempotency_key: 调用方保证重复提交安全时传入（如已有去重机制的创建），允许非幂等请求重试
+        hedge: 对GET启用对冲读取（JIRA_HEDGE=0 时忽略）
+        """
+        if url.startswith("/"):
+            url = self.base_url + url
+        if DRY_RUN:
+            data = kwargs.get("data")
+            if data is None and kwargs.get("json") is not None:
+                data = json.dumps(kwargs["json"])
+            if is_mutation(method, url) or touches_simulated(url, kwargs.get("params"), data):
+                return simulate(method, url, kwargs.get("params"), data)
+        if hedge and HEDGE_ENABLED and method.upper() == "GET":
+            return self._hedged(method, url, args, kwargs)
+        return self._send(method, url, *args, idempotency_key=idempotency_key, **kwargs)
+
+    def _hedged(self, method, url, args, kwargs):
+        """先发一个请求，超过p95仍未返回时再发一个，返回先成功的响应"""
+        path = url.split("://", 1)[-1]
+        endpoint = endpoint_template(path[path.find("/"):] if "/" in path else "/")
+        delay = hedge_delay(endpoint)
+        if not _within_deadline(delay):
+            return self._send(method, url, *args, **kwargs)
+
+        # 从第一个请求真正发出（取得限流令牌）后开始计时，排队等令牌不触发对冲
+        pool, sent = _get_hedge_pool(), threading.Event()
+        first = pool.submit(contextvars.copy_context().run, self._send, method, url, *args, sent=sent, **dict(kwargs))
+        first.add_done_callback(lambda _: sent.set())
+        sent.wait()
+        done, _ = wait([first], timeout=delay)
+        if done:
+            return first.result()
+
+        second = pool.submit(contextvars.copy_context().run, self._send, method, url, *args, **dict(kwargs))
+        pending = {first, second}
+        while True:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            winner = next((future for future in done if future.exception() is None), None)
+            if winner is None and pending:
+                continue  # 先结束的一个失败了，等待另一个
+            for other in (done | pending) - {winner}:
+                other.add_done_callback(_discard)
+            return (winner or next(iter(done))).result()
+
+    def _send(self, method, url, *args, idempotency_key=None, sent=None, **kwargs):
+        if idempotency_key:
+            kwargs["headers"] = {**(kwargs.get("headers") or {}), "X-Idempotency-Key": str(idempotency_key)}
+        retryable = method.upper() in IDEMPOTENT_METHODS or idempotency_key is not None
+        timeout = kwargs.pop("timeout", None) or (CONNECT_TIMEOUT, READ_TIMEOUT)
+
+        attempt, throttled, started = 0, 0.0, time.perf_counter()
+        while True:
+            wait_started = time.perf_counter()
+            acquired = acquire_token(self.site, remaining_time())
+            throttled += time.perf_counter() - wait_started
+            if sent is not None:
+                sent.set()
+            remaining = remaining_time()
+            if not acquired or (remaining is not None and remaining <= 0):
+                record_call(method, url, None, time.perf_counter() - started, throttled, attempt,
+                            error="DeadlineExceeded")
+                raise DeadlineExceeded(f"{method.upper()} {url} 超出操作时间预算")
+            try:
+                response = super().request(method, url, *args, timeout=_bounded_timeout(timeout, remaining), **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                delay = _backoff(attempt)
+                expired = isinstance(e, requests.Timeout) and remaining is not None and remaining_time() <= 0
+                if expired or not retryable or attempt >= MAX_RETRIES or not _within_deadline(delay):
+                    record_call(method, url, None, time.perf_counter() - started, throttled, attempt,
+                                error="DeadlineExceeded" if expired else type(e).__name__)
+                    if expired:
+                        raise DeadlineExceeded(f"{method.upper()} {url} 超出操作时间预算") from e
+                    raise
+                time.sleep(delay)
+                attempt += 1
+                continue
+
+            _respect_rate_limit_headers(self.site, response)
+            status = response.status_code
+            if attempt < MAX_RETRIES and status in RETRY_STATUSES and (status == 429 or retryable):
+                delay = parse_retry_after(response.headers.get("Retry-After"))
+                if delay is None:
+                    delay = _backoff(attempt)
+                else:
+                    delay += random.uniform(0, RETRY_BACKOFF_BASE)
+                if _within_deadline(delay):
+                    if status == 429:
+                        block_until(time.time() + delay, self.site)
+                    print(f"⏳ {method.upper()} {response.request.path_url} 返回 {status}，{delay:.1f}s 后重试")
+                    response.close()
+                    time.sleep(delay)
+                    attempt += 1
+                    continue
+
+            latency = time.perf_counter() - started
+            body = response.request.body
+            record_call(method, url, status, latency, throttled, attempt,
+                        bytes_out=len(body) if body else 0,
+                        bytes_in=len(response.content) if not kwargs.get("stream") else 0)
+            if method.upper() == "GET" and status < 500 and not attempt:
+                _record_latency(endpoint_template(response.request.path_url), latency - throttled)
+            if DRY_RUN:
+                record_sent(method, url, latency - throttled)
+            return response
+
+
+def _backoff(attempt: int) -> float:
+    """带随机抖动的指数退避（full jitter）"""
+    return random.uniform(0, min(RETRY_BACKOFF_CAP, RETRY_BACKOFF_BASE * (2 ** attempt)))
+
+
+def _respect_rate_limit_headers(site: str, response):
+    """X-RateLimit-Remaining 归零时，暂停该站点的所有进程直到 X-RateLimit-Reset"""
+    if response.headers.get("X-RateLimit-Remaining") == "0":
+        wait = parse_retry_after(response.headers.get("X-RateLimit-Reset"))
+        if wait:
+            block_until(time.time() + wait, site)
+
+
+def get_session(jira_domain: str, email: str, api_token: str) -> JiraSession:
+    """获取（或创建）进程内共享的JIRA Session"""
+    key = (base_url(jira_domain), email, api_token)
+    with _sessions_lock:
+        session = _sessions.get(key)
+        if session is None:
+            session = JiraSession(jira_domain, email, api_token)
+            _sessions[key] = session
+        return session
+
+
+def session_from_config(config: dict) -> JiraSession:
+    """根据jira.md配置获取共享Session"""
+    return get_session(config["JIRA_DOMAIN"], config["EMAIL"], config["API_TOKEN"])
+
+
+BULK_CREATE_LIMIT = 50  # /rest/api/3/issue/bulk 单次最多50个issue
+
+
+def _bulk_error_message(error: dict) -> str:
+    element_errors = error.get("elementErrors") or {}
+    messages = list(element_errors.get("errorMessages") or [])
+    messages += [f"{field}: {msg}" for field, msg in (element_errors.get("errors") or {}).items()]
+    return "; ".join(messages) or f"HTTP {error.get('status')}"
+
+
+def bulk_create_issues(session: JiraSession, issue_updates: list, chunk_size: int = BULK_CREATE_LIMIT) -> list:
+    """
+    通过 /rest/api/3/issue/bulk 批量创建issue
+    issue_updates: [{"fields": {...}, "update": {...}}, ...]
+    返回与输入顺序一致的结果列表：
+        成功 {"ok": True, "key": ..., "id": ...}，失败 {"ok": False, "error": ...}
+    """
+    chunk_size = max(1, min(chunk_size, BULK_CREATE_LIMIT))
+    results = []
+    for start in range(0, len(issue_updates), chunk_size):
+        chunk = issue_updates[start:start + chunk_size]
+        response = session.post("/rest/api/3/issue/bulk", data=json.dumps({"issueUpdates": chunk}))
+
+        try:
+            data = response.json()
+        except ValueError:
+            data = {}
+        if response.status_code not in (200, 201) and not data.get("errors"):
+            error = f"{response.status_code} - {response.text}"
+            results.extend({"ok": False, "error": error} for _ in chunk)
+            continue
+
+        failed = {e.get("failedElementNumber"): _bulk_error_message(e) for e in data.get("errors", [])}
+        created = iter(data.get("issues", []))
+        for index in range(len(chunk)):
+            if index in failed:
+                results.append({"ok": False, "error": failed[index]})
+                continue
+            issue = next(created, None)
+            if issue is None:
+                results.append({"ok": False, "error": "响应中缺少创建结果"})
+            else:
+                results.append({"ok": True, "key": issue["key"], "id": issue["id"]})
+    return results
+
+
+def search_issues(session: JiraSession, jql: str, fields=None, page_size: int = 100, limit: int = None,
+                  prefetch: bool = False, hedge: bool = False):
+    """
+    逐条产出 /rest/api/3/search/jql 的全部结果（跟随 nextPageToken 翻页，每次只持有一页）
+    fields: 需要返回的字段列表；为空时JIRA只返回issue id
+    limit: 最多返回的条数（如只需判断是否存在时传1）
+    prefetch: 为True时在调用方处理当前页的同时后台请求下一页，适合大结果集的遍历
+    hedge: 对每页请求启用对冲读取（见 JiraSession.request）
+    查询失败时抛出 JiraApiError
+    """
+    params = {"jql": jql, "maxResults": min(page_size, limit) if limit else page_size}
+    if fields:
+        params["fields"] = ",".join(fields)
+
+    def fetch_page(page_params):
+        response = session.get("/rest/api/3/search/jql", params=page_params, hedge=hedge)
+        if response.status_code != 200:
+            raise JiraApiError(response)
+        return response.json()
+
+    executor = ThreadPoolExecutor(max_workers=1) if prefetch else None
+    remaining = limit
+    try:
+        data = fetch_page(params)
+        while True:
+            next_page_token = data.get("nextPageToken")
+            issues = data.get("issues", [])
+            if remaining is not None:
+                issues = issues[:remaining]
+                remaining -= len(issues)
+            last = data.get("isLast") or not next_page_token or remaining == 0
+
+            pending = None
+            if not last:
+                params = {**params, "nextPageToken": next_page_token}
+                if executor:
+                    # 下一页请求在调用方上下文的副本中执行，jira_operation 等上下文变量随之传入
+                    pending = executor.submit(contextvars.copy_context().run, fetch_page, params)
+            yield from issues
+
+            if last:
+                return
+            data = pending.result() if pending else fetch_page(params)
+    finally:
+        if executor:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+def count_issues(session: JiraSession, jql: str) -> int:
+    """统计JQL结果数（只取issue id，逐页计数）"""
+    return sum(1 for _ in search_issues(session, jql))
+
+
+def has_issues(session: JiraSession, jql: str) -> bool:
+    """JQL是否有结果（只请求1条）"""
+    return any(True for _ in search_issues(session, jql, limit=1))
+
+
+def search_children(session: JiraSession, parent_keys, fields=None, include_parents: bool = False, chunk_size: int = 50,
+                    prefetch: bool = False, hedge: bool = False):
+    """
+    分批以 parent in (...) 查询多个父issue的全部子issue（逐条产出）
+    include_parents: 为True时同一查询中一并返回父issue本身（key in (...) OR parent in (...)）
+    prefetch/hedge: 同 search_issues
+    """
+    parent_keys = list(dict.fromkeys(parent_keys))
+    for start in range(0, len(parent_keys), chunk_size):
+        keys = ", ".join(parent_keys[start:start + chunk_size])
+        jql = f"parent in ({keys})"
+        if include_parents:
+            jql = f"key in ({keys}) OR {jql}"
+        yield from search_issues(session, jql, fields=fields, prefetch=prefetch, hedge=hedge)
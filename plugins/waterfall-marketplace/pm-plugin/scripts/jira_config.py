@@ -0,0 +1,94 @@
+"""
+jira.md 配置加载器（进程内缓存）
+
+同一进程内只解析一次jira.md：之后每次调用仅stat一次已解析的文件，
+修改时间变化时才重新读取。环境变量 JIRA_MD_PATH 可指定配置文件位置。
+注意：本模块在各插件的 scripts 目录中保持一致，修改时请同步。
+"""
+import os
+import threading
+
+_resolved_paths = {}   # 候选路径元组 -> 命中的配置文件路径
+_parsed = {}           # 配置文件路径 -> (mtime_ns, size, config)
+_lock = threading.Lock()
+
+
+def parse_jira_config(content: str) -> dict:
+    """解析jira.md中的 KEY = "value" 行"""
+    config = {}
+    for line in content.split('\n'):
+        if '=' in line:
+            key, value = line.split('=', 1)
+            # 移除值中的引号
+            config[key.strip()] = value.strip().strip('\"\'')
+    return config
+
+
+def _candidate_paths(candidates):
+    env_path = os.environ.get("JIRA_MD_PATH")
+    paths = [env_path] if env_path else []
+    paths.extend(os.path.abspath(p) for p in candidates)
+    return tuple(paths)
+
+
+def _resolve(paths):
+    for path in paths:
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def load_jira_config(candidates, required: bool = False):
+    """
+    按顺序在候选路径中查找jira.md并返回配置字典（未找到返回None）
+    candidates: 候选路径列表，相对路径以当前工作目录为准
+    required: 为True时找不到文件直接抛出 FileNotFoundError
+    """
+    paths = _candidate_paths(candidates)
+
+    with _lock:
+        jira_file_path = _resolved_paths.get(paths)
+        stat = None
+        if jira_file_path:
+            try:
+                stat = os.stat(jira_file_path)
+            except OSError:
+                jira_file_path = None
+
+        if not jira_file_path:
+            jira_file_path = _resolve(paths)
+            if not jira_file_path:
+                _resolved_paths.pop(paths, None)
+                if required:
+                    raise FileNotFoundError("jira.md文件不存在，请先配置JIRA信息")
+                print("❌ jira.md文件不存在，请先配置JIRA信息")
+                print("   尝试的路径:")
+                for path in paths:
+                    print(f"   - {path}")
+                return None
+            _resolved_paths[paths] = jira_file_path
+            stat = os.stat(jira_file_path)
+
+        cached = _parsed.get(jira_file_path)
+        if cached and cached[0] == stat.st_mtime_ns and cached[1] == stat.st_size:
+            return dict(cached[2])
+
+        try:
+            with open(jira_file_path, 'r', encoding='utf-8') as f:
+                config = parse_jira_config(f.read())
+        except Exception as e:
+            if required:
+                raise
+            print(f"❌ 读取jira.md文件失败: {e}")
+            return None
+
+        _parsed[jira_file_path] = (stat.st_mtime_ns, stat.st_size, config)
+        print(f"📋 从 {jira_file_path} 读取JIRA配置")
+        return dict(config)
+
+
+def clear_config_cache():
+    """清空缓存（常驻进程中需要强制重新读取时使用）"""
+    with _lock:
+        _resolved_paths.clear()
+        _parsed.clear()
@@ -0,0 +1,266 @@
+"""
+JIRA调用埋点与指标导出
+
+JiraSession 的每次逻辑调用（含重试）都会记录：所属操作、方法、接口模板、状态码、
+总耗时、其中等待限流令牌的时间、重试次数、请求/响应字节数。
+  - 操作名通过 jira_operation("名称") 设置，可嵌套（记为 "外层/内层"），并随 run_concurrently 传入工作线程
+  - JIRA_TRACE_FILE    设置后每次调用追加一行JSON到该文件
+  - JIRA_METRICS_FILE  设置后进程退出时写出Prometheus文本格式指标（可配合node_exporter textfile采集）
+  - jira_operation(..., summary=True) 的最外层操作结束时打印本次操作的汇总表（JIRA_METRICS_SUMMARY=0 关闭）
+
+用法：python jira_metrics.py summary <trace.jsonl> [操作名前缀]   汇总trace文件
+     python jira_metrics.py prometheus <trace.jsonl>            由trace文件生成Prometheus文本
+注意：本模块在各插件的 scripts 目录中保持一致，修改时请同步。
+"""
+import atexit
+import contextvars
+import json
+import os
+import re
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+TRACE_FILE = os.environ.get("JIRA_TRACE_FILE", "")
+METRICS_FILE = os.environ.get("JIRA_METRICS_FILE", "")
+SUMMARY_ENABLED = os.environ.get("JIRA_METRICS_SUMMARY", "1") != "0"
+
+# Prometheus直方图分桶（秒）
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_operation = contextvars.ContextVar("jira_operation", default=None)
+_collectors = contextvars.ContextVar("jira_metrics_collectors", default=())
+
+_lock = threading.Lock()
+_aggregates = {}   # (操作, 方法, 接口, 状态) -> 累计值
+_histograms = {}   # (操作, 方法, 接口) -> 各分桶计数
+
+_ISSUE_KEY = re.compile(r"/[A-Z][A-Z0-9_]*-\d+(?=/|$)")
+_NUMERIC_ID = re.compile(r"(?<!/api)/\d+(?=/|$)")  # 跳过 /rest/api/3 中的版本号
+_PROJECT_SEGMENT = re.compile(r"(/(?:project|createmeta))/[A-Z][A-Z0-9_]*(?=/|$)")
+
+
+def endpoint_template(path: str) -> str:
+    """把具体路径归一为接口模板：/rest/api/3/issue/CMT-1/transitions -> /rest/api/3/issue/{key}/transitions"""
+    path = path.split("?", 1)[0]
+    path = _ISSUE_KEY.sub("/{key}", path)
+    path = _PROJECT_SEGMENT.sub(r"\1/{project}", path)
+    path = _NUMERIC_ID.sub("/{id}", path)
+    return path
+
+
+def current_operation() -> str:
+    return _operation.get() or os.path.splitext(os.path.basename(sys.argv[0] or "python"))[0] or "-"
+
+
+@contextmanager
+def jira_operation(name: str, summary: bool = False):
+    """
+    标记一段逻辑操作，期间的JIRA调用都归入该操作
+    summary: 为True且是最外层的汇总操作时，结束后打印本次操作的调用汇总表
+    """
+    parent = _operation.get()
+    token = _operation.set(f"{parent}/{name}" if parent else name)
+    collector = None
+    collectors_token = None
+    if summary and not _collectors.get():
+        collector = []
+        collectors_token = _collectors.set((collector,))
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        _operation.reset(token)
+        if collectors_token is not None:
+            _collectors.reset(collectors_token)
+        if collector and SUMMARY_ENABLED:
+            print_summary(collector, title=f"{name}（{time.perf_counter() - started:.2f}s）")
+
+
+def record_call(method: str, url: str, status, latency: float, throttled: float = 0.0, retries: int = 0,
+                bytes_out: int = 0, bytes_in: int = 0, error: str = None):
+    """记录一次逻辑调用（由 JiraSession.request 调用）"""
+    path = url.split("://", 1)[-1]
+    path = path[path.find("/"):] if "/" in path else "/"
+    record = {
+        "ts": round(time.time(), 3),
+        "operation": current_operation(),
+        "method": method.upper(),
+        "endpoint": endpoint_template(path),
+        "path": path,
+        "status": status if status is not None else "error",
+        "latency_ms": round(latency * 1000, 1),
+        "throttled_ms": round(throttled * 1000, 1),
+        "retries": retries,
+        "bytes_out": bytes_out,
+        "bytes_in": bytes_in,
+    }
+    if error:
+        record["error"] = error
+
+    for collector in _collectors.get():
+        collector.append(record)
+    _aggregate(record)
+    if TRACE_FILE:
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with _lock:
+            with open(TRACE_FILE, "a", encoding="utf-8") as f:
+                f.write(line)
+
+
+def _aggregate(record: dict, aggregates: dict = None, histograms: dict = None):
+    aggregates = _aggregates if aggregates is None else aggregates
+    histograms = _histograms if histograms is None else histograms
+    key = (record["operation"], record["method"], record["endpoint"], str(record["status"]))
+    latency = record["latency_ms"] / 1000
+    with _lock:
+        entry = aggregates.setdefault(key, {"count": 0, "latency": 0.0, "throttled": 0.0, "retries": 0,
+                                            "bytes_out": 0, "bytes_in": 0})
+        entry["count"] += 1
+        entry["latency"] += latency
+        entry["throttled"] += record["throttled_ms"] / 1000
+        entry["retries"] += record["retries"]
+        entry["bytes_out"] += record["bytes_out"]
+        entry["bytes_in"] += record["bytes_in"]
+        buckets = histograms.setdefault(key[:3], [0] * (len(LATENCY_BUCKETS) + 1))
+        index = next((i for i, bound in enumerate(LATENCY_BUCKETS) if latency <= bound), len(LATENCY_BUCKETS))
+        buckets[index] += 1
+
+
+def _percentile(values: list, fraction: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(fraction * (len(values) - 1))))]
+
+
+def summarize(records: list) -> list:
+    """按 (操作, 方法, 接口) 汇总调用记录，按总耗时降序"""
+    groups = {}
+    for record in records:
+        groups.setdefault((record["operation"], record["method"], record["endpoint"]), []).append(record)
+
+    rows = []
+    for (operation, method, endpoint), items in groups.items():
+        latencies = [item["latency_ms"] for item in items]
+        rows.append({
+            "operation": operation, "method": method, "endpoint": endpoint, "calls": len(items),
+            "errors": sum(1 for item in items if item["status"] == "error" or int(item["status"]) >= 400),
+            "retries": sum(item["retries"] for item in items),
+            "p50_ms": _percentile(latencies, 0.5), "p95_ms": _percentile(latencies, 0.95), "max_ms": max(latencies),
+            "total_ms": sum(latencies), "throttled_ms": sum(item.get("throttled_ms", 0) for item in items),
+            "kb": sum(item["bytes_in"] + item["bytes_out"] for item in items) / 1024,
+        })
+    rows.sort(key=lambda row: -row["total_ms"])
+    return rows
+
+
+def print_summary(records: list, title: str = "JIRA调用汇总"):
+    """打印调用汇总表"""
+    rows = summarize(records)
+    if not rows:
+        return
+    print(f"\n📊 {title}: {sum(row['calls'] for row in rows)} 次调用")
+    print(f"   {'调用':>5} {'错误':>4} {'重试':>4} {'p50ms':>8} {'p95ms':>8} {'最大ms':>8} {'限流ms':>8} {'KB':>8}  操作 / 接口")
+    for row in rows:
+        print(f"   {row['calls']:>5} {row['errors']:>4} {row['retries']:>4} {row['p50_ms']:>8.0f} {row['p95_ms']:>8.0f} "
+              f"{row['max_ms']:>8.0f} {row['throttled_ms']:>8.0f} {row['kb']:>8.1f}  "
+              f"{row['operation']}  {row['method']} {row['endpoint']}")
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(**labels) -> str:
+    return ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items())
+
+
+def prometheus_text(aggregates: dict = None, histograms: dict = None) -> str:
+    """生成Prometheus文本格式的指标"""
+    aggregates = _aggregates if aggregates is None else aggregates
+    histograms = _histograms if histograms is None else histograms
+    with _lock:
+        aggregates = {key: dict(value) for key, value in aggregates.items()}
+        histograms = {key: list(value) for key, value in histograms.items()}
+
+    lines = [
+        "# HELP jira_requests_total JIRA API逻辑调用次数（含重试的一次调用计一次）",
+        "# TYPE jira_requests_total counter",
+    ]
+    for (operation, method, endpoint, status), entry in sorted(aggregates.items()):
+        lines.append(f"jira_requests_total{{{_labels(operation=operation, method=method, endpoint=endpoint, status=status)}}} {entry['count']}")
+
+    for metric, field, help_text in (
+        ("jira_request_retries_total", "retries", "JIRA API重试次数"),
+        ("jira_request_throttled_seconds_total", "throttled", "等待本地限流令牌的总时间"),
+        ("jira_request_bytes_total", "bytes_out", "请求体字节数"),
+        ("jira_response_bytes_total", "bytes_in", "响应体字节数"),
+    ):
+        lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} counter"]
+        merged = {}
+        for (operation, method, endpoint, _), entry in aggregates.items():
+            merged[(operation, method, endpoint)] = merged.get((operation, method, endpoint), 0) + entry[field]
+        for (operation, method, endpoint), value in sorted(merged.items()):
+            lines.append(f"{metric}{{{_labels(operation=operation, method=method, endpoint=endpoint)}}} {round(value, 6)}")
+
+    lines += ["# HELP jira_request_duration_seconds JIRA API调用耗时（含重试与限流等待）",
+              "# TYPE jira_request_duration_seconds histogram"]
+    sums = {}
+    for (operation, method, endpoint, _), entry in aggregates.items():
+        sums[(operation, method, endpoint)] = sums.get((operation, method, endpoint), 0.0) + entry["latency"]
+    for key, buckets in sorted(histograms.items()):
+        labels = _labels(operation=key[0], method=key[1], endpoint=key[2])
+        cumulative = 0
+        for bound, count in zip(LATENCY_BUCKETS, buckets):
+            cumulative += count
+            lines.append(f'jira_request_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+        cumulative += buckets[-1]
+        lines.append(f'jira_request_duration_seconds_bucket{{{labels},le="+Inf"}} {cumulative}')
+        lines.append(f"jira_request_duration_seconds_sum{{{labels}}} {round(sums.get(key, 0.0), 6)}")
+        lines.append(f"jira_request_duration_seconds_count{{{labels}}} {cumulative}")
+    return "\n".join(lines) + "\n"
+
+
+def write_prometheus(path: str = None):
+    """原子地写出Prometheus文本指标"""
+    path = path or METRICS_FILE
+    if not path or not _aggregates:
+        return
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(prometheus_text())
+    os.replace(tmp_path, path)
+
+
+def load_trace(path: str) -> list:
+    records = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                continue
+    return records
+
+
+if METRICS_FILE:
+    atexit.register(write_prometheus)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3 or sys.argv[1] not in ("summary", "prometheus"):
+        print("用法: python jira_metrics.py summary|prometheus <trace.jsonl> [操作名前缀]")
+        sys.exit(1)
+
+    trace = load_trace(sys.argv[2])
+    if len(sys.argv) > 3:
+        trace = [record for record in trace if record["operation"].startswith(sys.argv[3])]
+    if sys.argv[1] == "summary":
+        print_summary(trace, title=f"{sys.argv[2]}")
+    else:
+        aggregates, histograms = {}, {}
+        for record in trace:
+            _aggregate(record, aggregates, histograms)
+        print(prometheus_text(aggregates, histograms), end="")
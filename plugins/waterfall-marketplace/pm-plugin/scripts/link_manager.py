@@ -0,0 +1,192 @@
+"""
+按差异维护issue链接
+
+先用一次JQL查询（key in (...)，每100个一批）取回相关issue的现有链接并写入本地邻接表
+（issue_cache 的 issue_links），与期望的链接集合比对后：
+  - 只并发创建缺失的链接，已存在的不再请求
+  - 同一对issue之间重复的同类链接只保留一条（dedupe=True 时删除多余的）
+  - remove_stale=True 时删除两端都在本次涉及的issue中、类型在本次管理范围内、但不在期望集合中的链接
+Relates 这类无方向的链接类型，A→B 与 B→A 视为同一条。
+
+链接的方向与 /rest/api/3/issueLink 一致：from 为 inwardIssue，to 为 outwardIssue。
+
+用法：python link_manager.py <链接文件.json> [--remove-stale] [--dedupe] [--dry-run]
+       链接文件为 [{"from": "CMT-76", "to": "CMT-75", "type": "Relates"}, ...]
+     python link_manager.py show <ISSUE_KEY>   显示本地邻接表中的链接
+"""
+import json
+import sys
+
+from batch_runner import run_concurrently
+from batch_journal import forget_links, idempotency_key
+from issue_cache import CACHE_FIELDS, add_links, get_links, remove_links, upsert_issues
+from jira_client import JiraApiError, deadline, search_issues, session_from_config
+from jira_config import load_jira_config
+from jira_metrics import jira_operation
+
+SYMMETRIC_TYPES = {"Relates"}
+
+
+def read_jira_config():
+    """读取当前目录下的jira.md配置文件"""
+    return load_jira_config(["jira.md"], required=True)
+
+
+def link_signature(link_type: str, inward: str, outward: str) -> tuple:
+    """链接的比较键；无方向的链接类型两端排序后比较"""
+    if link_type in SYMMETRIC_TYPES:
+        inward, outward = sorted((inward, outward))
+    return link_type, inward, outward
+
+
+def load_links(session, keys) -> list:
+    """从JIRA取回这些issue的现有链接（一并刷新本地缓存），返回 [{"id", "type", "inward", "outward"}, ...]"""
+    keys = list(dict.fromkeys(keys))
+    for start in range(0, len(keys), 100):
+        chunk = keys[start:start + 100]
+        upsert_issues(session, list(search_issues(session, f"key in ({', '.join(chunk)})", fields=CACHE_FIELDS)))
+    return get_links(session, keys)
+
+
+def _create_link(session, link: dict):
+    payload = {"type": {"name": link["type"]},
+               "inwardIssue": {"key": link["from"]},
+               "outwardIssue": {"key": link["to"]}}
+    step = idempotency_key(link["from"], link["to"], link["type"])
+    response = session.post("/rest/api/3/issueLink", data=json.dumps(payload), idempotency_key=step)
+    return response.status_code == 201, f"{response.status_code} - {response.text}"
+
+
+def _delete_link(session, link_id: str):
+    response = session.delete(f"/rest/api/3/issueLink/{link_id}")
+    return response.status_code in (204, 404), f"{response.status_code} - {response.text}"
+
+
+def plan_links(desired: list, existing: list, remove_stale: bool = False, dedupe: bool = False) -> dict:
+    """
+    比对期望与现有链接，返回 {"create": [期望链接], "remove": [现有链接], "existing": [期望链接]}
+    desired: [{"from", "to", "type"}, ...]
+    """
+    by_signature = {}
+    for link in sorted(existing, key=lambda item: (item["id"] is None, int(item["id"] or 0))):
+        by_signature.setdefault(link_signature(link["type"], link["inward"], link["outward"]), []).append(link)
+
+    plan = {"create": [], "remove": [], "existing": []}
+    wanted = set()
+    for link in desired:
+        signature = link_signature(link["type"], link["from"], link["to"])
+        if signature in wanted:
+            continue
+        wanted.add(signature)
+        plan["existing" if signature in by_signature else "create"].append(link)
+
+    if dedupe:
+        for links in by_signature.values():
+            plan["remove"] += [link for link in links[1:] if link["id"]]
+    if remove_stale:
+        involved = {key for link in desired for key in (link["from"], link["to"])}
+        managed = {link["type"] for link in desired}
+        for signature, links in by_signature.items():
+            if signature not in wanted and signature[0] in managed and {signature[1], signature[2]} <= involved:
+                plan["remove"] += [link for link in links if link["id"] and link not in plan["remove"]]
+    return plan
+
+
+@jira_operation("sync_links", summary=True)
+@deadline()
+def sync_links(desired: list, remove_stale: bool = False, dedupe: bool = False, dry_run: bool = False,
+               max_workers: int = None):
+    """
+    使JIRA中的链接与期望集合一致（只创建缺失的，按需删除多余的）
+    desired: [{"from", "to", "type": 默认Relates}, ...]
+    返回 {"created", "existing", "removed", "failed"} 计数，查询现有链接失败时返回None
+    """
+    desired = [{**link, "type": link.get("type") or "Relates"} for link in desired]
+    config = read_jira_config()
+    session = session_from_config(config)
+
+    keys = [key for link in desired for key in (link["from"], link["to"])]
+    try:
+        existing = load_links(session, keys)
+    except JiraApiError as e:
+        print(f"❌ 查询现有链接失败: {e}")
+        return None
+
+    plan = plan_links(desired, existing, remove_stale, dedupe)
+    summary = {"created": 0, "existing": len(plan["existing"]), "removed": 0, "failed": 0}
+    print(f"🔗 期望 {len(desired)} 条链接：已存在 {len(plan['existing'])}，待创建 {len(plan['create'])}，"
+          f"待删除 {len(plan['remove'])}")
+    if dry_run:
+        for link in plan["create"]:
+            print(f"   ➕ {link['from']} → {link['to']} ({link['type']})")
+        for link in plan["remove"]:
+            print(f"   ➖ {link['inward']} → {link['outward']} ({link['type']}, id={link['id']})")
+        return summary
+
+    results = run_concurrently(_create_link, [(session, link) for link in plan["create"]], max_workers)
+    created = []
+    for link, result in zip(plan["create"], results):
+        if result and result[0]:
+            created.append({"id": None, "type": link["type"], "inward": link["from"], "outward": link["to"]})
+            print(f"✅ 链接创建成功: {link['from']} → {link['to']}")
+        else:
+            summary["failed"] += 1
+            print(f"❌ 链接创建失败 {link['from']} → {link['to']}: {result[1] if result else ''}")
+    add_links(session, created)
+    summary["created"] = len(created)
+
+    results = run_concurrently(_delete_link, [(session, link["id"]) for link in plan["remove"]], max_workers)
+    removed = []
+    for link, result in zip(plan["remove"], results):
+        if result and result[0]:
+            removed.append(link["id"])
+            print(f"🗑  已删除链接: {link['inward']} → {link['outward']} ({link['type']})")
+        else:
+            summary["failed"] += 1
+            print(f"❌ 删除链接失败 {link['id']}: {result[1] if result else ''}")
+    remove_links(session, removed)
+    # 已不存在的链接（去重后仍保留一条的除外）不再视为已完成，之后重新执行创建它的批次时会重建
+    kept = {link_signature(link["type"], link["inward"], link["outward"]) for link in existing
+            if link["id"] not in removed}
+    forget_links([pair for link in plan["remove"] if link["id"] in removed
+                  and link_signature(link["type"], link["inward"], link["outward"]) not in kept
+                  for pair in ((link["inward"], link["outward"]), (link["outward"], link["inward"]))
+                  if pair[0] == link["inward"] or link["type"] in SYMMETRIC_TYPES])
+    summary["removed"] = len(removed)
+
+    print(f"📊 链接同步完成: {summary}")
+    return summary
+
+
+def ensure_links(desired: list, max_workers: int = None) -> list:
+    """确保期望的链接都存在，返回与输入顺序一致的结果（已存在或创建成功为True）"""
+    summary = sync_links(desired, max_workers=max_workers)
+    if summary is None:
+        return [False] * len(desired)
+    if not summary["failed"]:
+        return [True] * len(desired)
+
+    # 有失败时按邻接表逐条确认
+    session = session_from_config(read_jira_config())
+    present = {link_signature(link["type"], link["inward"], link["outward"])
+               for link in get_links(session, [key for link in desired for key in (link["from"], link["to"])])}
+    return [link_signature(link.get("type") or "Relates", link["from"], link["to"]) in present for link in desired]
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 3 and sys.argv[1] == "show":
+        session = session_from_config(read_jira_config())
+        for link in get_links(session, [sys.argv[2]]):
+            print(f"   {link['inward']} → {link['outward']} ({link['type']}, id={link['id']})")
+        sys.exit(0)
+
+    args = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    if not args:
+        print("用法: python link_manager.py <链接文件.json> [--remove-stale] [--dedupe] [--dry-run]")
+        print("     python link_manager.py show <ISSUE_KEY>")
+        sys.exit(1)
+    with open(args[0], "r", encoding="utf-8") as f:
+        links = json.load(f)
+    result = sync_links(links, remove_stale="--remove-stale" in sys.argv, dedupe="--dedupe" in sys.argv,
+                        dry_run="--dry-run" in sys.argv)
+    sys.exit(0 if result is not None and not result["failed"] else 1)
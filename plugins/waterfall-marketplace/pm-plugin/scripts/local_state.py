@@ -0,0 +1,76 @@
+"""
+插件脚本的本地状态目录与跨进程文件锁
+
+状态目录默认为 ~/.cache/jira-plugins，可通过环境变量 JIRA_PLUGIN_STATE_DIR 指定。
+注意：本模块在各插件的 scripts 目录中保持一致，修改时请同步。
+"""
+import json
+import os
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+_thread_locks = {}
+_thread_locks_guard = threading.Lock()
+
+
+def state_dir() -> str:
+    """返回（并确保存在）本地状态目录"""
+    path = os.environ.get("JIRA_PLUGIN_STATE_DIR") or os.path.join(os.path.expanduser("~"), ".cache", "jira-plugins")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def state_path(name: str) -> str:
+    """状态目录下的文件路径"""
+    return os.path.join(state_dir(), name)
+
+
+@contextmanager
+def file_lock(name: str):
+    """
+    以状态目录下的 <name>.lock 文件作为跨进程互斥锁
+    同一进程内的多个线程同样互斥。
+    """
+    path = state_path(f"{name}.lock")
+    with _thread_locks_guard:
+        thread_lock = _thread_locks.setdefault(path, threading.Lock())
+
+    with thread_lock:
+        with open(path, "a+") as f:
+            if fcntl:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+            try:
+                yield
+            finally:
+                if fcntl:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+                else:
+                    f.seek(0)
+                    msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def read_json_state(name: str, default=None):
+    """读取状态目录下的JSON文件，不存在或损坏时返回default"""
+    try:
+        with open(state_path(name), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return default
+
+
+def write_json_state(name: str, data):
+    """原子地写入状态目录下的JSON文件"""
+    path = state_path(name)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
@@ -0,0 +1,120 @@
+"""
+跨进程共享的JIRA请求令牌桶
+
+同一JIRA站点的所有脚本进程通过状态目录中的 rate_limit-<站点>.json（加文件锁）共享一个令牌桶，
+多个Agent并行运行时对每个站点的整体请求速率仍保持在租户限额之内，不同站点互不影响；服务端返回
+Retry-After 或 X-RateLimit-* 要求暂停时，暂停时间同样对该站点的所有进程生效。
+每次从共享桶中租用若干令牌（JIRA_RATE_LEASE，1秒内有效）在进程内使用，不必每个请求都加锁读写文件；
+过期未用的令牌在下次租用时归还。等待令牌的时间受调用方给出的时间上限约束（见 jira_client.deadline）。
+环境变量：
+  JIRA_RATE_LIMIT  每秒允许的请求数（默认10，0表示不限速）
+  JIRA_RATE_BURST  令牌桶容量（默认为速率的2倍）
+  JIRA_RATE_LEASE  每次租用的令牌数（默认为容量的1/4，至少1）
+注意：本模块在各插件的 scripts 目录中保持一致，修改时请同步。
+"""
+import os
+import re
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from datetime import datetime
+from urllib.parse import urlparse
+
+from local_state import file_lock, read_json_state, write_json_state
+
+RATE_LIMIT = float(os.environ.get("JIRA_RATE_LIMIT", "10"))
+RATE_BURST = float(os.environ.get("JIRA_RATE_BURST", str(max(1.0, RATE_LIMIT * 2))))
+RATE_LEASE = max(1, int(os.environ.get("JIRA_RATE_LEASE", str(int(RATE_BURST // 4)))))
+LEASE_TTL = 1.0
+
+_leases = {}  # 站点 -> {"tokens": 剩余的租用令牌, "expires": 过期时间（monotonic）}
+_leases_lock = threading.Lock()
+
+
+def site_key(base_url: str) -> str:
+    """JIRA站点在状态文件名中的标识（与 issue_cache.site_name 一致）"""
+    return re.sub(r"[^A-Za-z0-9_.-]", "_", urlparse(base_url or "").netloc or "default")
+
+
+def _take_leased(site: str) -> bool:
+    with _leases_lock:
+        lease = _leases.get(site)
+        if lease and lease["tokens"] >= 1 and time.monotonic() < lease["expires"]:
+            lease["tokens"] -= 1
+            return True
+    return False
+
+
+def acquire_token(site: str = "default", timeout: float = None) -> bool:
+    """
+    取得该站点的一个请求令牌，必要时等待（同一站点的所有进程共享）
+    timeout: 最多等待的秒数（None为不限）；在此之前取不到令牌时不再等待，返回False
+    """
+    if RATE_LIMIT <= 0:
+        return True
+
+    give_up = None if timeout is None else time.monotonic() + timeout
+    name = f"rate_limit-{site}"
+    while True:
+        if _take_leased(site):
+            return True
+        with file_lock(name):
+            now = time.time()
+            state = read_json_state(f"{name}.json", {}) or {}
+            tokens = state.get("tokens", RATE_BURST)
+            updated = state.get("updated", now)
+            blocked_until = state.get("blocked_until", 0)
+            with _leases_lock:
+                lease = _leases.pop(site, None)
+            if lease:
+                tokens += lease["tokens"]  # 归还上次租用未用完的令牌
+
+            tokens = min(RATE_BURST, tokens + max(0.0, now - updated) * RATE_LIMIT)
+            if now >= blocked_until and tokens >= 1:
+                taken = min(RATE_LEASE, int(tokens))
+                write_json_state(f"{name}.json", {"tokens": tokens - taken, "updated": now, "blocked_until": blocked_until})
+                if taken > 1:
+                    with _leases_lock:
+                        _leases[site] = {"tokens": taken - 1, "expires": time.monotonic() + LEASE_TTL}
+                return True
+
+            write_json_state(f"{name}.json", {"tokens": tokens, "updated": now, "blocked_until": blocked_until})
+            wait = max(blocked_until - now, (1 - tokens) / RATE_LIMIT)
+        if give_up is not None:
+            left = give_up - time.monotonic()
+            if wait > left:
+                return False  # 等到令牌时已超出时间上限
+        time.sleep(min(max(wait, 0.01), 5.0))
+
+
+def block_until(timestamp: float, site: str = "default"):
+    """服务端要求暂停时，让该站点的所有进程在 timestamp 之前都不再发出请求"""
+    name = f"rate_limit-{site}"
+    with _leases_lock:
+        _leases.pop(site, None)
+    with file_lock(name):
+        state = read_json_state(f"{name}.json", {}) or {}
+        if timestamp > state.get("blocked_until", 0):
+            state["blocked_until"] = timestamp
+            state.setdefault("tokens", 0)
+            state.setdefault("updated", time.time())
+            write_json_state(f"{name}.json", state)
+
+
+def parse_retry_after(value):
+    """解析 Retry-After / X-RateLimit-Reset 头，返回需要等待的秒数（无法解析返回None）"""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        moment = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        try:
+            moment = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+    return max(0.0, moment.timestamp() - time.time())
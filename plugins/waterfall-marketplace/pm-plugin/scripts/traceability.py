@@ -0,0 +1,183 @@
+"""
+REQ/TASK/DEV 追溯查询
+
+基于本地缓存中的追溯索引（issue_cache 的 trace 表：编号 → issue Key，按Key与所属issue建索引）：
+  编号 ↔ Key 互查、子需求 → 开发任务、开发任务 → 子需求 → Story → Epic 均为本地索引查询，
+  不依赖JIRA的搜索。索引随脚本的创建/删除/缓存同步增量更新，rebuild 可按项目全量重建。
+
+用法：python traceability.py lookup <编号|ISSUE_KEY>        如 REQ-CMT-75-3、DEV-CMT-76-2、CMT-76
+     python traceability.py matrix <PROJECT_KEY> [--csv 文件] [--sync]   导出追溯矩阵（默认Markdown）
+     python traceability.py rebuild <PROJECT_KEY>         全量同步项目并重建该项目的追溯索引
+注意：本模块在各插件的 scripts 目录中保持一致，修改时请同步。
+"""
+import csv
+import os
+import re
+import sys
+
+from issue_cache import connect, fetch_issue, get_cached_issue, sync_project
+from jira_client import JiraApiError, session_from_config
+from jira_config import load_jira_config
+
+_NUMBER = re.compile(r"^(REQ|TASK|DEV)-([A-Z][A-Z0-9_]*-\d+)-(\d+)$")
+
+
+def find_key(session, number: str):
+    """编号 -> issue Key（未登记返回None）"""
+    row = connect(session).execute("SELECT key FROM trace WHERE number = ?", (number,)).fetchone()
+    return row["key"] if row else None
+
+
+def numbers_of(session, key: str) -> list:
+    """issue Key -> 其编号列表"""
+    rows = connect(session).execute("SELECT number FROM trace WHERE key = ? ORDER BY number", (key,)).fetchall()
+    return [row["number"] for row in rows]
+
+
+def children_of(session, owner_key: str, kinds=("DEV",)) -> list:
+    """所属issue下的编号记录（如子需求的开发任务），按序号排序"""
+    marks = ",".join("?" * len(kinds))
+    rows = connect(session).execute(
+        f"SELECT * FROM trace WHERE owner = ? AND kind IN ({marks}) ORDER BY seq", (owner_key, *kinds)).fetchall()
+    return [dict(row) for row in rows]
+
+
+def _parent_key(session, key: str):
+    """读取缓存中的父级Key，未缓存时回源JIRA（结果写入缓存）"""
+    issue = get_cached_issue(session, key, max_age=float("inf"))
+    if issue is None:
+        try:
+            issue = fetch_issue(session, key)
+        except JiraApiError:
+            return None
+    return issue.get("parent") or None
+
+
+def trace_chain(session, key_or_number: str) -> dict:
+    """
+    返回issue的完整追溯链：
+    {"key", "numbers", "epic", "story", "requirements": [{"number", "key"}], "dev_tasks": [{"number", "key"}]}
+    开发任务的 requirements 为其实现的子需求；子需求的 dev_tasks 为实现它的开发任务；Story 两者皆为其下全部
+    """
+    key = find_key(session, key_or_number) if _NUMBER.match(key_or_number) else key_or_number
+    chain = {"key": key, "numbers": numbers_of(session, key) if key else [], "epic": None, "story": None,
+             "requirements": [], "dev_tasks": []}
+    if not key:
+        return chain
+
+    rows = connect(session).execute("SELECT * FROM trace WHERE key = ?", (key,)).fetchall()
+    kinds = {row["kind"]: row for row in rows}
+    if "DEV" in kinds:
+        requirement = kinds["DEV"]["owner"]
+        chain["requirements"] = [{"number": number, "key": requirement} for number in numbers_of(session, requirement)]
+        chain["dev_tasks"] = [{"number": kinds["DEV"]["number"], "key": key}]
+        owner_rows = connect(session).execute("SELECT owner FROM trace WHERE key = ? AND kind != 'DEV'",
+                                              (requirement,)).fetchone()
+        chain["story"] = owner_rows["owner"] if owner_rows else _parent_key(session, requirement)
+    elif "REQ" in kinds or "TASK" in kinds:
+        row = kinds.get("REQ") or kinds["TASK"]
+        chain["requirements"] = [{"number": row["number"], "key": key}]
+        chain["dev_tasks"] = [{"number": r["number"], "key": r["key"]} for r in children_of(session, key)]
+        chain["story"] = row["owner"]
+    else:
+        requirements = children_of(session, key, ("REQ", "TASK"))
+        if requirements:
+            chain["story"] = key
+            chain["requirements"] = [{"number": r["number"], "key": r["key"]} for r in requirements]
+            chain["dev_tasks"] = [{"number": d["number"], "key": d["key"]}
+                                  for r in requirements for d in children_of(session, r["key"])]
+        else:
+            chain["epic"] = key  # 既无编号也无下属子需求，按Epic处理
+            return chain
+
+    chain["epic"] = _parent_key(session, chain["story"]) if chain["story"] else None
+    return chain
+
+
+def traceability_matrix(session, project_key: str) -> list:
+    """
+    项目的追溯矩阵，每个子需求一行：
+    {"epic", "story", "story_summary", "number", "key", "summary", "dev_tasks": [{"number", "key", "status"}]}
+    """
+    conn = connect(session)
+    requirements = conn.execute(
+        "SELECT t.*, i.summary, i.status FROM trace t LEFT JOIN issues i ON i.key = t.key "
+        "WHERE t.kind IN ('REQ', 'TASK') AND t.owner LIKE ? ORDER BY t.owner, t.seq", (f"{project_key}-%",)).fetchall()
+    dev_tasks = {}
+    for row in conn.execute("SELECT t.*, i.status FROM trace t LEFT JOIN issues i ON i.key = t.key "
+                            "WHERE t.kind = 'DEV' AND t.owner LIKE ? ORDER BY t.seq", (f"{project_key}-%",)):
+        dev_tasks.setdefault(row["owner"], []).append({"number": row["number"], "key": row["key"],
+                                                       "status": row["status"] or ""})
+
+    stories = {}
+    matrix = []
+    for row in requirements:
+        story = row["owner"]
+        if story not in stories:
+            cached = get_cached_issue(session, story, max_age=float("inf")) or {}
+            stories[story] = (cached.get("parent") or _parent_key(session, story) or "", cached.get("summary", ""))
+        matrix.append({"epic": stories[story][0], "story": story, "story_summary": stories[story][1],
+                       "number": row["number"], "key": row["key"], "summary": row["summary"] or "",
+                       "status": row["status"] or "", "dev_tasks": dev_tasks.get(row["key"], [])})
+    return matrix
+
+
+def export_matrix(matrix: list, csv_path: str = None):
+    """输出追溯矩阵：指定 csv_path 时写CSV，否则打印Markdown表格"""
+    header = ["Epic", "Story", "需求编号", "子需求", "状态", "开发任务"]
+    rows = [[row["epic"], row["story"], row["number"], row["key"], row["status"],
+             "; ".join(f"{d['number']}={d['key']}" + (f"({d['status']})" if d["status"] else "")
+                       for d in row["dev_tasks"]) or "-"] for row in matrix]
+    if csv_path:
+        with open(csv_path, "w", encoding="utf-8-sig", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(header)
+            writer.writerows(rows)
+        print(f"✅ 追溯矩阵已写入 {csv_path}（{len(rows)} 行）")
+        return
+
+    print("| " + " | ".join(header) + " |")
+    print("|" + "---|" * len(header))
+    for row in rows:
+        print("| " + " | ".join(str(cell) for cell in row) + " |")
+    uncovered = sum(1 for row in matrix if not row["dev_tasks"])
+    print(f"\n📊 子需求 {len(matrix)} 个，未分配开发任务 {uncovered} 个")
+
+
+def rebuild(session, project_key: str) -> int:
+    """清除项目的追溯记录后全量同步，返回同步的issue数"""
+    conn = connect(session)
+    with conn:
+        conn.execute("DELETE FROM trace WHERE owner LIKE ?", (f"{project_key}-%",))
+    return sync_project(session, project_key, full=True)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3 or sys.argv[1] not in ("lookup", "matrix", "rebuild"):
+        print("用法: python traceability.py lookup <编号|ISSUE_KEY>")
+        print("     python traceability.py matrix <PROJECT_KEY> [--csv 文件] [--sync]")
+        print("     python traceability.py rebuild <PROJECT_KEY>")
+        sys.exit(1)
+
+    config = load_jira_config([os.path.join(os.getcwd(), "jira.md")], required=True)
+    session = session_from_config(config)
+    command, target = sys.argv[1], sys.argv[2]
+
+    if command == "lookup":
+        chain = trace_chain(session, target)
+        if not chain["key"]:
+            print(f"❌ 追溯索引中没有 {target}，可先执行 rebuild")
+            sys.exit(1)
+        print(f"📋 {chain['key']}  {', '.join(chain['numbers']) or '(无编号)'}")
+        print(f"   Epic: {chain['epic'] or '-'}   Story: {chain['story'] or '-'}")
+        for item in chain["requirements"]:
+            print(f"   需求: {item['number']} → {item['key']}")
+        for item in chain["dev_tasks"]:
+            print(f"   开发: {item['number']} → {item['key']}")
+    elif command == "matrix":
+        if "--sync" in sys.argv:
+            print(f"🔄 增量同步 {target}: {sync_project(session, target)} 个issue")
+        csv_path = sys.argv[sys.argv.index("--csv") + 1] if "--csv" in sys.argv else None
+        export_matrix(traceability_matrix(session, target), csv_path)
+    else:
+        print(f"✅ 已重建 {target} 的追溯索引: 同步 {rebuild(session, target)} 个issue")
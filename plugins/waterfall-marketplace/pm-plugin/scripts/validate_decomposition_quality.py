@@ -1,74 +1,150 @@
-import requests
 import json
-from requests.auth import HTTPBasicAuth
+import re
+import sys
 
-def read_jira_config():
-    """读取当前目录下的jira.md配置文件"""
-    with open("jira.md", "r") as f:
-        content = f.read()
+from adf import adf_to_text
+from duplicate_detector import issue_text, similar_pairs
+from issue_cache import fetch_issue
+from jira_client import JiraApiError, search_children, session_from_config
+from jira_config import load_jira_config
+from jira_metrics import jira_operation
+
+# 验证时只取评分需要的字段
+VALIDATE_FIELDS = ["summary", "description", "parent", "issuetype"]
 
-    config = {}
-    for line in content.split('\n'):
-        if '=' in line:
-            key, value = line.split('=', 1)
-            config[key.strip()] = value.strip().strip('\"\'')
+MIN_DESCRIPTION_LENGTH = 50
+ACCEPTANCE_KEYWORDS = ("验收", "Given", "When", "Then", "acceptance", "Acceptance")
+NUMBER_PREFIX = re.compile(r"^\[(REQ|TASK|DEV)-[A-Z][A-Z0-9]*-\d+(-\d+)?\]")
 
-    return config
+def read_jira_config():
+    """读取当前目录下的jira.md配置文件"""
+    return load_jira_config(["jira.md"], required=True)
 
+@jira_operation("get_subtask_details")
 def get_subtask_details(subtask_key: str):
     """获取Subtask详情"""
     config = read_jira_config()
 
-    JIRA_DOMAIN = config["JIRA_DOMAIN"]
-    EMAIL = config["EMAIL"]
-    API_TOKEN = config["API_TOKEN"]
+    session = session_from_config(config)
 
-    url = f"https://{JIRA_DOMAIN}/rest/api/3/issue/{subtask_key}?fields=summary,description"
-    auth = HTTPBasicAuth(EMAIL, API_TOKEN)
-    headers = {"Accept": "application/json"}
-
-    response = requests.get(url, headers=headers, auth=auth)
-
-    if response.status_code == 200:
-        return response.json()
-    else:
-        print(f"❌ 获取Subtask详情失败: {response.text}")
+    # 优先读取本地issue缓存，描述为纯文本
+    try:
+        issue = fetch_issue(session, subtask_key)
+    except JiraApiError as e:
+        print(f"❌ 获取Subtask详情失败: {e.text}")
         return None
+    return {"key": issue["key"], "fields": {"summary": issue["summary"], "description": issue["description"]}}
 
 def validate_subtask(subtask_key: str):
     """验证单个Subtask质量"""
-    subtask_details = get_subtask_details(subtask_key)
-
+    report_subtask_quality(get_subtask_details(subtask_key))
+
+def score_subtask(summary: str, description: str) -> dict:
+    """本地计算单个Subtask的质量评分（0-100）"""
+    length = len(description)
+    score = int(min(length / 200, 1) * 40)
+    if any(keyword in description for keyword in ACCEPTANCE_KEYWORDS):
+        score += 30
+    if NUMBER_PREFIX.match(summary):
+        score += 15
+    if description.count("\n") >= 2:
+        score += 15
+    return {"length": length, "score": score, "sufficient": length > MIN_DESCRIPTION_LENGTH}
+
+def report_subtask_quality(subtask_details):
+    """输出单个Subtask的质量检查结果"""
     if not subtask_details:
         return
 
     summary = subtask_details["fields"]["summary"]
-    description = subtask_details["fields"].get("description", "")
+    description = adf_to_text(subtask_details["fields"].get("description"))
+    result = score_subtask(summary, description)
 
     print(f"📋 Subtask: {summary}")
-    print(f"📝 描述长度: {len(str(description))} 字符")
+    print(f"📝 描述长度: {result['length']} 字符  评分: {result['score']}")
 
-    if len(str(description)) > 50:
+    if result["sufficient"]:
         print("✅ 描述内容充足")
     else:
         print("⚠️ 描述内容可能不足")
+    return result
+
+def _is_subtask(issue: dict) -> bool:
+    issuetype = issue["fields"].get("issuetype") or {}
+    if "subtask" in issuetype:
+        return bool(issuetype["subtask"])
+    return issuetype.get("name", "").lower() in ("subtask", "sub-task", "子任务")
+
+@jira_operation("validate_decomposition", summary=True)
+def validate_decomposition(issue_keys: list):
+    """
+    验证一个或多个Story/Epic下全部Subtask的分解质量
+    先以 key in (...) OR parent in (...) 一次取回根issue及其子issue，
+    子issue中的Story再以 parent in (...) 批量取回其Subtask，全部在本地评分，
+    并用 MinHash/LSH 找出这些Subtask之间（含跨Story）的近似重复。
+    返回 {story_key: [评分结果, ...]}
+    """
+    config = read_jira_config()
+    session = session_from_config(config)
+
+    try:
+        first_level = list(search_children(session, issue_keys, fields=VALIDATE_FIELDS, include_parents=True))
+        roots = {issue["key"] for issue in first_level if issue["key"] in issue_keys}
+        stories = [issue for issue in first_level if issue["key"] in roots and not _is_subtask(issue)]
+        nested = [issue for issue in first_level if issue["key"] not in roots and not _is_subtask(issue)]
+        subtasks = [issue for issue in first_level if issue["key"] not in roots and _is_subtask(issue)]
+        if nested:
+            # 含有Story的根issue是Epic，只验证其下的Story
+            epics = {(issue["fields"].get("parent") or {}).get("key") for issue in nested}
+            stories = [issue for issue in stories if issue["key"] not in epics] + nested
+            subtasks += [issue for issue in search_children(session, [i["key"] for i in nested], fields=VALIDATE_FIELDS,
+                                                         prefetch=True)
+                         if _is_subtask(issue)]
+    except JiraApiError as e:
+        print(f"❌ 查询Subtask失败: {e.text}")
+        return None
+
+    by_parent = {}
+    for subtask in subtasks:
+        parent_key = (subtask["fields"].get("parent") or {}).get("key", "")
+        by_parent.setdefault(parent_key, []).append(subtask)
+
+    results = {}
+    for story in stories:
+        children = by_parent.get(story["key"], [])
+        if not children and story["key"] not in issue_keys:
+            continue
+        print(f"🔍 验证Story: {story['fields'].get('summary', story['key'])}")
+        print(f"📊 Subtasks数量: {len(children)}")
+        results[story["key"]] = [report_subtask_quality(child) for child in children]
+
+    report_duplicates(subtasks)
+    return results
+
+def report_duplicates(subtasks: list):
+    """输出Subtask之间的近似重复"""
+    summaries = {subtask["key"]: subtask["fields"].get("summary", "") for subtask in subtasks}
+    pairs = similar_pairs({subtask["key"]: issue_text(summaries[subtask["key"]],
+                                                      adf_to_text(subtask["fields"].get("description")))
+                           for subtask in subtasks})
+    for first, second, score in pairs:
+        print(f"⚠️ 疑似重复 {first} ≈ {second}（相似度 {score:.2f}）")
+        print(f"   {summaries[first]}")
+        print(f"   {summaries[second]}")
+    if subtasks:
+        print(f"🔁 近似重复: {len(pairs)} 对")
+    return pairs
 
 def validate_story_subtasks(story_key: str):
     """验证Story的所有Subtask"""
-    from analyze_story_context import get_story_details
-
-    story_details = get_story_details(story_key)
-
-    if not story_details:
-        return
-
-    subtasks = story_details["subtasks"]
-    print(f"🔍 验证Story: {story_details['summary']}")
-    print(f"📊 Subtasks数量: {len(subtasks)}")
-
-    for subtask in subtasks:
-        validate_subtask(subtask["key"])
+    results = validate_decomposition([story_key])
+    return results.get(story_key, []) if results else None
 
 if __name__ == "__main__":
+    # 用法：python validate_decomposition_quality.py <Story/Epic Key> [...]
+    if len(sys.argv) > 1:
+        validate_decomposition(sys.argv[1:])
+        sys.exit(0)
+
     # 示例：验证Story分解质量
     validate_story_subtasks("CMT-123")
\ No newline at end of file
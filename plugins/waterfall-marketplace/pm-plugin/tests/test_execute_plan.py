@@ -0,0 +1,34 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "scripts"))
+
+from execute_plan import plan_levels  # noqa: E402
+
+
+def test_plan_levels_orders_nodes_by_dependency():
+    nodes = [
+        {"id": "s", "type": "story", "summary": "故事"},
+        {"id": "r", "type": "subtask", "parent": "$s", "summary": "子需求"},
+        {"id": "l", "type": "link", "from": "$r", "to": "CMT-1"},
+    ]
+    levels = plan_levels(nodes)
+    assert [[node["id"] for node in level] for level in levels] == [["s"], ["r"], ["l"]]
+
+
+@pytest.mark.parametrize("node", [
+    {"id": "r", "type": "subtask", "parent": "$l", "summary": "子需求"},
+    {"id": "r", "type": "task", "parent": "$s", "implements": "$l", "summary": "开发任务"},
+    {"id": "r", "type": "link", "from": "$l", "to": "$s"},
+    {"id": "r", "type": "story", "summary": "实现 ${l}"},
+])
+def test_plan_levels_rejects_references_to_link_nodes(node):
+    nodes = [
+        {"id": "s", "type": "story", "summary": "故事"},
+        {"id": "l", "type": "link", "from": "$s", "to": "CMT-1"},
+        node,
+    ]
+    with pytest.raises(ValueError, match=r"\$l"):
+        plan_levels(nodes)
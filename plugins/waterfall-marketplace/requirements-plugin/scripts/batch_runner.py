@@ -0,0 +1,39 @@
+"""
+有界并发执行器
+
+批量函数（充实描述、创建链接、验证子任务等）通过 run_concurrently() 并发调用，
+并发上限默认取环境变量 JIRA_MAX_WORKERS（默认8），结果保持输入顺序。
+注意：本模块在各插件的 scripts 目录中保持一致，修改时请同步。
+"""
+import contextvars
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+MAX_WORKERS = int(os.environ.get("JIRA_MAX_WORKERS", "8"))
+
+
+def run_concurrently(func, args_list, max_workers: int = None) -> list:
+    """
+    以有界并发对每组参数调用 func(*args)，返回与输入顺序一致的结果列表
+    args_list: 参数元组列表（单参数时也可直接传入值）
+    单个调用抛出异常时打印错误并以 None 作为该项结果，不影响其他调用
+    """
+    args_list = [args if isinstance(args, tuple) else (args,) for args in args_list]
+    if not args_list:
+        return []
+
+    workers = max(1, min(max_workers or MAX_WORKERS, len(args_list)))
+
+    def call(args):
+        try:
+            return func(*args)
+        except Exception as e:
+            print(f"❌ {getattr(func, '__name__', 'task')}{args} 执行失败: {e}")
+            return None
+
+    if workers == 1:
+        return [call(args) for args in args_list]
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        # 每个任务在调用方上下文的副本中执行，jira_operation 等上下文变量随之传入工作线程
+        futures = [executor.submit(contextvars.copy_context().run, call, args) for args in args_list]
+        return [future.result() for future in futures]
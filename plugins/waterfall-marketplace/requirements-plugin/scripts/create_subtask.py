@@ -1,7 +1,16 @@
-import requests
 import json
 import os
-from requests.auth import HTTPBasicAuth
+import sys
+
+from adf import text_to_adf
+from batch_journal import BatchJournal, idem_label, idempotency_key, reconcile_created
+from duplicate_detector import check_duplicates
+from issue_cache import fetch_issue, index_created, is_project_fresh, last_sync, sync_project
+from jira_client import JiraApiError, bulk_create_issues, deadline, get_session
+from jira_config import load_jira_config
+from jira_metadata import resolve_issue_types
+from jira_metrics import jira_operation
+from sequence_allocator import allocate_numbers
 
 # ===== Jira 配置 =====
 JIRA = ""
@@ -11,7 +20,7 @@ PROJECT = ""
 # =====================
 
 def read_jira_config():
-    """读取JIRA配置文件"""
+    """读取JIRA配置文件（进程内缓存，文件修改后自动重新读取）"""
     # 尝试多种可能的配置文件路径
     possible_paths = [
         os.path.expanduser("~/jira.md"),
@@ -20,37 +29,7 @@ def read_jira_config():
         os.path.join(os.path.dirname(__file__), "../../../jira.md"),
         os.path.join(os.getcwd(), "jira.md")
     ]
-
-    jira_file_path = None
-    for path in possible_paths:
-        if os.path.exists(path):
-            jira_file_path = path
-            break
-
-    if not jira_file_path:
-        print("❌ jira.md文件不存在，请先配置JIRA信息")
-        print("   尝试的路径:")
-        for path in possible_paths:
-            print(f"   - {path}")
-        return None
-
-    try:
-        with open(jira_file_path, 'r', encoding='utf-8') as f:
-            content = f.read()
-
-        config = {}
-        for line in content.split('\n'):
-            if '=' in line:
-                key, value = line.split('=', 1)
-                # 移除值中的引号
-                value = value.strip().strip('\"\'')
-                config[key.strip()] = value
-
-        print(f"📋 从 {jira_file_path} 读取JIRA配置")
-        return config
-    except Exception as e:
-        print(f"❌ 读取jira.md文件失败: {e}")
-        return None
+    return load_jira_config(possible_paths)
 
 def get_story_key(story_id):
     """
@@ -69,25 +48,23 @@ def get_story_key(story_id):
         print("❌ JIRA配置不完整，请检查jira.md文件")
         return None
 
-    url = f"https://{JIRA_DOMAIN}/rest/api/3/issue/{story_id}"
-    auth = HTTPBasicAuth(EMAIL, API_TOKEN)
-    headers = {"Accept": "application/json"}
-
-    response = requests.get(url, headers=headers, auth=auth)
-    if response.status_code == 200:
-        return response.json()['key']
-    else:
-        print(f"❌ 获取Story信息失败: {response.status_code} - {response.text}")
+    # 优先读取本地issue缓存
+    session = get_session(JIRA_DOMAIN, EMAIL, API_TOKEN)
+    try:
+        return fetch_issue(session, story_id)['key']
+    except JiraApiError as e:
+        print(f"❌ 获取Story信息失败: {e}")
         return None
 
-def get_next_subtask_number(story_key):
+def get_next_subtask_number(story_key, count=1):
     """
     获取下一个子需求序号
+    count: 需要连续预留的序号个数（批量创建时使用），返回第一个序号；无法读取配置或查询已有编号失败时返回None
     """
     # 读取JIRA配置
     config = read_jira_config()
     if not config:
-        return 1
+        return None
 
     JIRA_DOMAIN = config.get("JIRA_DOMAIN", "")
     EMAIL = config.get("EMAIL", "")
@@ -95,27 +72,41 @@ def get_next_subtask_number(story_key):
 
     if not all([JIRA_DOMAIN, EMAIL, API_TOKEN]):
         print("❌ JIRA配置不完整，请检查jira.md文件")
-        return 1
+        return None
 
-    # 查询该Story下已有的子需求数量
-    jql = f'parent = {story_key} AND issuetype = Subtask'
-    url = f"https://{JIRA_DOMAIN}/rest/api/3/search/jql"
-    auth = HTTPBasicAuth(EMAIL, API_TOKEN)
-    headers = {"Accept": "application/json"}
+    # 根据该Story下已有的子需求编号预留序号（跨进程加锁，避免并发重复）
+    session = get_session(JIRA_DOMAIN, EMAIL, API_TOKEN)
+    try:
+        return allocate_numbers(session, f"REQ-{story_key}", f"parent = {story_key}", count)
+    except JiraApiError as e:
+        print(f"❌ 查询已有编号失败: {e}")
+        return None
 
-    params = {
-        "jql": jql,
-        "maxResults": 100
-    }
+def build_subtask_payload(story_id, story_key, subtask_number, summary, description):
+    """
+    生成子需求的创建payload
+    返回 (需求编号, payload)
+    """
+    # 生成规范的需求编号
+    requirement_number = f"REQ-{story_key}-{subtask_number}"
 
-    response = requests.get(url, headers=headers, auth=auth, params=params)
-    if response.status_code == 200:
-        subtasks = response.json()['issues']
-        return len(subtasks) + 1
-    else:
-        print(f"❌ 查询子需求失败: {response.status_code} - {response.text}")
-        return 1
+    # 在Summary中添加格式前缀
+    formatted_summary = f"[{requirement_number}] {summary}"
 
+    payload = {
+        "fields": {
+            "project": {"key": story_key.split('-')[0]},  # 从Story Key中提取项目
+            "issuetype": {"name": "Subtask"},  # 注意改为 Subtask
+            "summary": formatted_summary,
+            "parent": {"id": story_id},  # 挂在 Story 下
+            "labels": ["requirement", f"REQ-{story_key}"],  # 添加规范标签
+            "description": text_to_adf(description)
+        }
+    }
+    return requirement_number, payload
+
+@jira_operation("create_subtask")
+@deadline()
 def create_subtask(story_id, summary, description):
     """
     创建 Sub-task（子需求）并挂在指定 Story 下
@@ -145,49 +136,216 @@ def create_subtask(story_id, summary, description):
 
     # 获取下一个序号
     subtask_number = get_next_subtask_number(story_key)
+    if subtask_number is None:
+        print("❌ 无法预留编号，创建失败")
+        return
 
-    # 生成规范的需求编号
-    requirement_number = f"REQ-{story_key}-{subtask_number}"
-
-    # 在Summary中添加格式前缀
-    formatted_summary = f"[{requirement_number}] {summary}"
-
-    url = f"https://{JIRA_DOMAIN}/rest/api/3/issue"
-    auth = HTTPBasicAuth(EMAIL, API_TOKEN)
-    headers = {"Accept": "application/json", "Content-Type": "application/json"}
+    requirement_number, payload = build_subtask_payload(story_id, story_key, subtask_number, summary, description)
+    session = get_session(JIRA_DOMAIN, EMAIL, API_TOKEN)
+    resolve_issue_types(session, [payload])
 
-    payload = {
-        "fields": {
-            "project": {"key": story_key.split('-')[0]},  # 从Story Key中提取项目
-            "issuetype": {"name": "Subtask"},  # 注意改为 Subtask
-            "summary": formatted_summary,
-            "parent": {"id": story_id},  # 挂在 Story 下
-            "labels": ["requirement", f"REQ-{story_key}"],  # 添加规范标签
-            "description": {
-                "type": "doc",
-                "version": 1,
-                "content": [
-                    {"type": "paragraph", "content": [{"type": "text", "text": description}]}
-                ]
-            }
-        }
-    }
-
-    r = requests.post(url, headers=headers, auth=auth, data=json.dumps(payload))
+    r = session.post("/rest/api/3/issue", data=json.dumps(payload))
     if r.status_code == 201:
         created_key = r.json()['key']
+        index_created(session, [payload], [{"ok": True, "key": created_key}])
         print(f"✅ Sub-task 创建成功: {created_key}")
         print(f"📋 需求编号: {requirement_number}")
 
         # 注意：开发任务通常在此之后创建，因此不在此处建立链接
         # 链接关系将在开发任务创建时自动建立
+        return created_key
 
     else:
         print(f"❌ 创建失败: {r.status_code} - {r.text}")
+        return None
+
+@jira_operation("create_subtasks_bulk", summary=True)
+@deadline()
+def create_subtasks_bulk(subtasks, story_id=None, duplicates="warn"):
+    """
+    批量创建子需求（/rest/api/3/issue/bulk，每批最多50个）
+    subtasks: [{"summary": ..., "description": ..., "story_id": 可选}, ...]
+    story_id: 未在条目中指定 story_id 时使用的默认 Story 内部 ID
+    每个 Story 只查询一次 Story Key 和起始序号。
+    计划与结果记录在操作日志（batch_journal）中：中断后重新执行同一批次，已完成的条目直接跳过，
+    未确认的条目按幂等标签核对后再决定是否沿用原编号重新提交。
+    duplicates: 创建前查重（见 duplicate_detector）："warn" 提示疑似重复，"skip" 跳过疑似重复的条目，"off" 不检查
+    返回与输入顺序一致的结果列表（见 jira_client.bulk_create_issues）
+    """
+    config = read_jira_config()
+    if not config:
+        print("❌ 无法读取JIRA配置，创建失败")
+        return []
+
+    JIRA_DOMAIN = config.get("JIRA_DOMAIN", "")
+    EMAIL = config.get("EMAIL", "")
+    API_TOKEN = config.get("API_TOKEN", "")
+
+    if not all([JIRA_DOMAIN, EMAIL, API_TOKEN]):
+        print("❌ JIRA配置不完整，请检查jira.md文件")
+        return []
+
+    session = get_session(JIRA_DOMAIN, EMAIL, API_TOKEN)
+    journal = BatchJournal("create_subtask")
+    results = [None] * len(subtasks)
+    story_ids = [str(item.get("story_id") or story_id or "") for item in subtasks]
+    keys = [idempotency_key(item_story_id, item["summary"], item.get("description", ""))
+            for item, item_story_id in zip(subtasks, story_ids)]
+
+    # 上次中断时已提交但未确认的创建，先按幂等标签核对，避免重复创建
+    # 已完成的步骤确认其子需求仍然存在，被删除的按新步骤重新创建
+    unconfirmed = [key for key in dict.fromkeys(keys) if journal.planned(key)]
+    try:
+        if unconfirmed:
+            reconcile_created(session, journal, unconfirmed)
+        journal.verify_done(session, keys)
+    except JiraApiError as e:
+        print(f"❌ 核对上次执行的结果失败，为避免重复创建已中止: {e}")
+        return []
+
+    planned = []  # (输入下标, 需求编号, payload)
+    fresh = []    # 尚未计划过的输入下标
+    for index, (key, item_story_id) in enumerate(zip(keys, story_ids)):
+        if journal.result(key):
+            results[index] = {**journal.result(key), "skipped": True}
+        elif not item_story_id:
+            results[index] = {"ok": False, "error": "缺少 story_id"}
+        elif journal.planned(key):
+            # 沿用计划中的编号与payload，编号不会漂移
+            data = journal.planned(key)["data"]
+            planned.append((index, data["number"], data["payload"]))
+        else:
+            fresh.append(index)
+
+    # 每个Story只查询一次Story Key，并一次性预留该Story所需的全部序号（查重跳过的条目不占序号）
+    story_keys = {item_story_id: get_story_key(item_story_id)
+                  for item_story_id in dict.fromkeys(story_ids[index] for index in fresh)}
+    if duplicates != "off":
+        item_story_keys = [story_keys.get(item_story_id) for item_story_id in story_ids]
+        fresh = check_bulk_duplicates(session, subtasks, fresh, item_story_keys, results, skip=duplicates == "skip")
+    next_numbers = {}  # story_id -> (story_key, 下一个序号)
+    fresh_story_ids = [story_ids[index] for index in fresh]
+    for item_story_id in dict.fromkeys(fresh_story_ids):
+        story_key = story_keys[item_story_id]
+        count = fresh_story_ids.count(item_story_id)
+        next_numbers[item_story_id] = (story_key, get_next_subtask_number(story_key, count) if story_key else None)
+
+    new_plans = []
+    for index in fresh:
+        item, item_story_id = subtasks[index], story_ids[index]
+        story_key, number = next_numbers[item_story_id]
+        if not story_key:
+            results[index] = {"ok": False, "error": f"无法获取Story Key: {item_story_id}"}
+            continue
+        if number is None:
+            results[index] = {"ok": False, "error": f"预留编号失败: {story_key}"}
+            continue
+
+        requirement_number, payload = build_subtask_payload(
+            item_story_id, story_key, number, item["summary"], item.get("description", ""))
+        payload["fields"]["labels"].append(idem_label(keys[index]))
+        next_numbers[item_story_id] = (story_key, number + 1)
+        planned.append((index, requirement_number, payload))
+        new_plans.append((keys[index], {"number": requirement_number, "payload": payload}))
+
+    resolve_issue_types(session, [payload for _, _, payload in planned])
+    # 先写日志再提交，中断后可据此恢复
+    journal.plan_many(new_plans)
+    created = bulk_create_issues(session, [payload for _, _, payload in planned])
+    index_created(session, [payload for _, _, payload in planned], created)
+
+    completed = []
+    for (index, requirement_number, _), result in zip(planned, created):
+        result["number"] = requirement_number
+        results[index] = result
+        if result["ok"]:
+            completed.append((keys[index], result))
+    journal.done_many(completed)
+
+    succeeded = 0
+    for item, result in zip(subtasks, results):
+        if result.get("skipped"):
+            succeeded += 1
+            print(f"⏭️  {result.get('number', '')} → {result['key']}（已完成，跳过）")
+        elif result["ok"]:
+            succeeded += 1
+            print(f"✅ {result['number']} → {result['key']}")
+        else:
+            print(f"❌ {item.get('summary', '')}: {result['error']}")
+    print(f"📊 批量创建完成: 成功 {succeeded} / 共 {len(subtasks)}")
+    return results
+
+def check_bulk_duplicates(session, subtasks, indexes, story_keys, results, skip=False):
+    """
+    创建前查重：按项目与已缓存的子需求及同批条目比较，打印疑似重复
+    项目之前同步过时先增量同步，保证与JIRA上的最新子需求比较；从未同步过的项目只比较已缓存的部分
+    skip=True 时疑似重复的条目记为失败（不创建），返回仍需创建的下标列表
+    """
+    by_project = {}
+    for index in indexes:
+        if story_keys[index]:
+            by_project.setdefault(story_keys[index].rsplit("-", 1)[0], []).append(index)
+
+    remaining = set(indexes)
+    for project_key, project_indexes in by_project.items():
+        if last_sync(session, project_key) is not None and not is_project_fresh(session, project_key):
+            try:
+                sync_project(session, project_key)
+            except JiraApiError as e:
+                print(f"⚠️  同步 {project_key} 失败，仅与本地缓存查重: {e.status_code}")
+        matches = check_duplicates(session, project_key, [subtasks[index] for index in project_indexes])
+        for index, match in zip(project_indexes, matches):
+            if match is None:
+                continue
+            target = match["key"] or f"同批第 {project_indexes[match['index']] + 1} 条"
+            print(f"⚠️  疑似重复（相似度 {match['similarity']:.2f}）: {subtasks[index]['summary']}")
+            print(f"     ≈ {target}: {match['summary']}")
+            if skip:
+                remaining.discard(index)
+                results[index] = {"ok": False, "error": f"疑似与 {target} 重复，已跳过",
+                                  "duplicate_of": match["key"]}
+    return [index for index in indexes if index in remaining]
+
+def load_subtasks_file(path):
+    """
+    读取分解文件，返回子需求列表
+    - JSON: 子需求列表，或 {"story_id": ..., "subtasks": [...]}
+    - Markdown: "## <story_id>" 标题下，每个 "### 标题" 为一个子需求，其后正文为描述
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        content = f.read()
+
+    if path.endswith(".json"):
+        data = json.loads(content)
+        if isinstance(data, dict):
+            return [dict(item, story_id=item.get("story_id", data.get("story_id"))) for item in data["subtasks"]]
+        return data
+
+    subtasks = []
+    current_story_id = None
+    current = None
+    for line in content.split('\n'):
+        if line.startswith("### "):
+            current = {"story_id": current_story_id, "summary": line[4:].strip(), "description": ""}
+            subtasks.append(current)
+        elif line.startswith("## "):
+            current_story_id = line[3:].strip().split()[0] if line[3:].strip() else None
+            current = None
+        elif current is not None and line.strip():
+            current["description"] = (current["description"] + "\n" + line.strip()).strip()
+    return subtasks
 
 # 链接功能已移至开发任务创建脚本
 
 if __name__ == "__main__":
+    # 批量模式：python create_subtask.py <分解文件.json|.md> [story_id] [--skip-duplicates|--no-duplicate-check]
+    args = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    if args:
+        mode = "skip" if "--skip-duplicates" in sys.argv else "off" if "--no-duplicate-check" in sys.argv else "warn"
+        create_subtasks_bulk(load_subtasks_file(args[0]), story_id=args[1] if len(args) > 1 else None,
+                             duplicates=mode)
+        sys.exit(0)
+
     # 示例：Story 内部 ID（通过 curl 获取）
     story_id = "10144"  # Story: 实现图像归一化、数据增强及批处理逻辑
     create_subtask(
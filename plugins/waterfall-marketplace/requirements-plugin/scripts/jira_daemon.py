@@ -0,0 +1,315 @@
+"""
+常驻命令守护进程
+
+Agent每次调用脚本都要重新启动Python、导入requests、解析配置并重新TLS握手。守护进程常驻后，
+通过Unix socket按JSON行协议执行本目录脚本中的函数，复用已建立的连接、配置缓存与issue缓存，
+脚本的输出（print）按请求捕获后返回给客户端原样显示。
+
+每个插件的 scripts 目录、每个工作目录各自运行一个守护进程（socket 位于状态目录，按两者区分，
+脚本按工作目录查找jira.md），只提供该目录中存在的操作。客户端见 jira_cli.py。
+脚本更新后需 stop 再 start 才会加载新代码。
+
+协议：每行一个JSON请求 {"op": 操作名, "args": [...], "kwargs": {...}}，
+     每行一个JSON响应 {"ok": bool, "result": ..., "output": 捕获的输出, "error": 错误信息}
+环境变量：JIRA_DAEMON_IDLE  空闲多少秒后自动退出（默认1800，0表示不退出）
+
+用法：python jira_daemon.py start|stop|status|run
+注意：本模块在各插件的 scripts 目录中保持一致，修改时请同步。
+"""
+import contextvars
+import hashlib
+import importlib
+import io
+import json
+import os
+import socket
+import socketserver
+import subprocess
+import sys
+import threading
+import time
+
+from local_state import state_path
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+IDLE_TIMEOUT = float(os.environ.get("JIRA_DAEMON_IDLE", "1800"))
+
+# 操作名 -> (模块, 函数)；模块不在本目录时该操作不可用
+OPERATIONS = {
+    "create_epic": ("create_epic_from_requirements", "create_jira_epic"),
+    "create_story": ("create_story", "create_story"),
+    "create_subtask": ("create_subtask", "create_subtask"),
+    "create_subtasks_bulk": ("create_subtask", "create_subtasks_bulk"),
+    "delete_epic": ("delete_epic", "delete_jira_epic"),
+    "delete_story": ("delete_story", "delete_story"),
+    "delete_subtask": ("delete_subtask", "delete_subtask"),
+    "cascade_delete": ("cascade_delete", "cascade_delete"),
+    "sync_requirements": ("sync_requirements", "sync_requirements"),
+    "create_development_task": ("create_development_tasks", "create_development_task"),
+    "create_development_tasks_bulk": ("create_development_tasks", "create_development_tasks_bulk"),
+    "create_issue_link": ("create_issue_links", "create_issue_link"),
+    "link_tasks_to_story": ("create_issue_links", "link_tasks_to_story"),
+    "sync_links": ("link_manager", "sync_links"),
+    "update_subtask_description": ("enrich_subtasks_content", "update_subtask_description"),
+    "enrich_subtasks": ("enrich_subtasks_content", "enrich_subtasks"),
+    "get_story_details": ("analyze_story_context", "get_story_details"),
+    "analyze_story_context": ("analyze_story_context", "analyze_story_context"),
+    "validate_decomposition": ("validate_decomposition_quality", "validate_decomposition"),
+    "discover_hierarchy": ("discover_hierarchy", "discover_hierarchy"),
+    "execute_plan": ("execute_plan", "execute_plan"),
+}
+
+
+def socket_path() -> str:
+    """本scripts目录与当前工作目录对应的守护进程socket路径"""
+    digest = hashlib.sha1(f"{SCRIPTS_DIR}\0{os.getcwd()}".encode("utf-8")).hexdigest()[:10]
+    return state_path(f"daemon-{digest}.sock")
+
+
+def available_operations() -> list:
+    return sorted(op for op, (module, _) in OPERATIONS.items()
+                  if os.path.exists(os.path.join(SCRIPTS_DIR, f"{module}.py")))
+
+
+def resolve_operation(op: str):
+    """返回操作对应的函数，不可用时抛出 LookupError"""
+    if op not in available_operations():
+        raise LookupError(f"当前插件不提供操作 {op}，可用操作: {', '.join(available_operations())}")
+    module_name, func_name = OPERATIONS[op]
+    return getattr(importlib.import_module(module_name), func_name)
+
+
+def to_jsonable(value):
+    """把函数返回值转换为可JSON序列化的形式"""
+    if hasattr(value, "to_dict"):
+        return value.to_dict()
+    if isinstance(value, (list, tuple)):
+        return [to_jsonable(item) for item in value]
+    if isinstance(value, dict):
+        return {str(k): to_jsonable(v) for k, v in value.items()}
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    return str(value)
+
+
+# ===== 按请求捕获输出 =====
+
+_capture = contextvars.ContextVar("jira_daemon_capture", default=None)
+
+
+class _CapturingStdout(io.TextIOBase):
+    """当前上下文设置了捕获缓冲时写入缓冲，否则写入原始stdout（随 run_concurrently 传入工作线程）"""
+
+    def __init__(self, stream):
+        self.stream = stream
+
+    def write(self, text):
+        buffer = _capture.get()
+        return (buffer or self.stream).write(text)
+
+    def flush(self):
+        if _capture.get() is None:
+            self.stream.flush()
+
+
+# ===== 服务端 =====
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            response = self.server.daemon.execute(line)
+            self.wfile.write((json.dumps(response, ensure_ascii=False) + "\n").encode("utf-8"))
+            self.wfile.flush()
+            if response.get("shutdown"):
+                threading.Thread(target=self.server.shutdown, daemon=True).start()
+                return
+
+
+class _Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class JiraDaemon:
+    def __init__(self):
+        self.started = time.time()
+        self.last_active = time.time()
+        self.served = 0
+        self.server = None
+
+    def execute(self, line: bytes) -> dict:
+        self.last_active = time.time()
+        try:
+            request = json.loads(line)
+            op = request.get("op")
+            if op == "__ping__":
+                return {"ok": True, "result": {"pid": os.getpid(), "uptime": round(time.time() - self.started, 1),
+                                               "served": self.served, "operations": available_operations()}}
+            if op == "__shutdown__":
+                return {"ok": True, "result": "bye", "shutdown": True}
+            func = resolve_operation(op)
+        except (ValueError, LookupError, ImportError) as e:
+            return {"ok": False, "error": str(e), "output": ""}
+
+        buffer = io.StringIO()
+        token = _capture.set(buffer)
+        started = time.perf_counter()
+        try:
+            result = func(*(request.get("args") or []), **(request.get("kwargs") or {}))
+            response = {"ok": True, "result": to_jsonable(result)}
+        except SystemExit as e:
+            response = {"ok": e.code in (None, 0), "result": None, "error": None if e.code in (None, 0) else f"exit {e.code}"}
+        except Exception as e:
+            response = {"ok": False, "error": f"{type(e).__name__}: {e}"}
+        finally:
+            _capture.reset(token)
+        self.served += 1
+        response["output"] = buffer.getvalue()
+        response["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        return response
+
+    def _warm_up(self):
+        """预先读取配置并建立到JIRA的连接"""
+        try:
+            from jira_client import session_from_config
+            from jira_config import load_jira_config
+            candidates = [os.path.join(os.getcwd(), "jira.md"), os.path.expanduser("~/jira.md"),
+                          os.path.expanduser("~/.jira.md")]
+            config = load_jira_config(candidates)
+            if config:
+                session_from_config(config).get("/rest/api/3/myself", timeout=10)
+        except Exception as e:
+            print(f"⚠️ 预热连接失败（不影响使用）: {e}")
+
+    def _idle_watch(self):
+        while self.server is not None:
+            time.sleep(min(30, max(1, IDLE_TIMEOUT / 4)))
+            if time.time() - self.last_active > IDLE_TIMEOUT and self.server is not None:
+                print(f"💤 空闲超过 {IDLE_TIMEOUT:.0f}s，守护进程退出")
+                self.server.shutdown()
+                return
+
+    def serve(self):
+        path = socket_path()
+        if os.path.exists(path):
+            if ping(timeout=1):
+                print(f"⚠️ 守护进程已在运行: {path}")
+                return
+            os.remove(path)  # 上次异常退出遗留的socket
+
+        sys.stdout = _CapturingStdout(sys.stdout)
+        self.server = _Server(path, _Handler)
+        self.server.daemon = self
+        os.chmod(path, 0o600)
+        print(f"🚀 JIRA守护进程已启动 pid={os.getpid()} socket={path}")
+        sys.stdout.flush()
+
+        threading.Thread(target=self._warm_up, daemon=True).start()
+        if IDLE_TIMEOUT > 0:
+            threading.Thread(target=self._idle_watch, daemon=True).start()
+        try:
+            self.server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server, self.server = self.server, None
+            server.server_close()
+            if os.path.exists(path):
+                os.remove(path)
+
+
+# ===== 客户端辅助 =====
+
+class DaemonConnection:
+    """到守护进程的连接，可连续发送多个请求；守护进程未运行时 connect 抛出 OSError"""
+
+    def __init__(self, timeout: float = None):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(timeout)
+        try:
+            self.sock.connect(socket_path())
+        except OSError:
+            self.sock.close()
+            raise
+        self.reader = self.sock.makefile("rb")
+
+    def call(self, payload: dict) -> dict:
+        self.sock.sendall((json.dumps(payload, ensure_ascii=False) + "\n").encode("utf-8"))
+        line = self.reader.readline()
+        if not line:
+            raise ConnectionError("守护进程未返回结果")
+        return json.loads(line)
+
+    def close(self):
+        self.reader.close()
+        self.sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def request(payload: dict, timeout: float = None) -> dict:
+    """向守护进程发送单个请求"""
+    with DaemonConnection(timeout) as connection:
+        return connection.call(payload)
+
+
+def ping(timeout: float = 2):
+    """守护进程在运行时返回其状态，否则返回None"""
+    if not hasattr(socket, "AF_UNIX") or not os.path.exists(socket_path()):
+        return None
+    try:
+        return request({"op": "__ping__"}, timeout=timeout).get("result")
+    except (OSError, ValueError):
+        return None
+
+
+def start_background(wait: float = 5.0) -> bool:
+    """在后台启动守护进程，等待其就绪"""
+    if ping():
+        return True
+    log = open(state_path(os.path.basename(socket_path()).replace(".sock", ".log")), "a")
+    subprocess.Popen([sys.executable, os.path.abspath(__file__), "run"], cwd=os.getcwd(), stdout=log, stderr=log,
+                     stdin=subprocess.DEVNULL, start_new_session=True)
+    deadline = time.time() + wait
+    while time.time() < deadline:
+        if ping(timeout=0.5):
+            return True
+        time.sleep(0.05)
+    return False
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else ""
+    if not hasattr(socket, "AF_UNIX"):
+        print("❌ 当前平台不支持Unix socket，请直接运行各脚本")
+        sys.exit(1)
+
+    if command == "run":
+        JiraDaemon().serve()
+    elif command == "start":
+        if start_background():
+            print(f"✅ 守护进程已就绪: {socket_path()}")
+        else:
+            print("❌ 守护进程启动失败，请查看状态目录下的日志")
+            sys.exit(1)
+    elif command == "stop":
+        if ping():
+            request({"op": "__shutdown__"}, timeout=5)
+            print("✅ 守护进程已停止")
+        else:
+            print("ℹ️ 守护进程未运行")
+    elif command == "status":
+        status = ping()
+        if status:
+            print(f"✅ 运行中 pid={status['pid']} 已运行 {status['uptime']}s 已处理 {status['served']} 个请求")
+            print(f"   可用操作: {', '.join(status['operations'])}")
+        else:
+            print("ℹ️ 守护进程未运行")
+    else:
+        print("用法: python jira_daemon.py start|stop|status|run")
+        sys.exit(1)
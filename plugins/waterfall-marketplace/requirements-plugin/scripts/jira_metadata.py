@@ -0,0 +1,270 @@
+"""
+项目元数据缓存：issue类型、创建必填字段、工作流转换
+
+按JIRA站点保存在状态目录下的 jira-metadata-<站点>.json（sprint-plugin 的 TypeScript 客户端读取同一文件，
+但只写入工作流转换；它的写入不加锁，与本模块同时写入时可能丢失条目，丢失后重新获取即可），
+条目超过 JIRA_METADATA_TTL 秒（默认1天）后重新获取：
+  - 项目的issue类型：脚本中按 Subtask / Story / Epic 书写的类型名在本地解析为该项目的类型id
+    （Sub-task、子任务 等命名不同的团队管理项目也能一次创建成功）
+  - 各issue类型创建时的必填字段：创建前在本地检查，缺少时给出提示
+  - 按 项目/issue类型/当前状态 记录的可用转换：已知状态时转换直接提交，只需一次请求
+
+用法：python jira_metadata.py show <PROJECT_KEY>           查看缓存的issue类型与必填字段
+     python jira_metadata.py refresh <PROJECT_KEY>        重新获取
+     python jira_metadata.py transition <ISSUE_KEY> <转换名称>
+     python jira_metadata.py clear                        清空当前站点的元数据缓存
+注意：本模块在各插件的 scripts 目录中保持一致，修改时请同步。
+"""
+import json
+import os
+import re
+import sys
+import threading
+import time
+from urllib.parse import urlparse
+
+from issue_cache import get_cached_issue, update_status
+from jira_client import JiraApiError
+from local_state import file_lock, read_json_state, state_path, write_json_state
+
+METADATA_TTL = int(os.environ.get("JIRA_METADATA_TTL", "86400"))
+
+# 脚本中使用的类型名 -> 各类项目中常见的同义名称（比较时忽略大小写）
+ISSUE_TYPE_ALIASES = {
+    "subtask": ("subtask", "sub-task", "子任务", "子需求"),
+    "story": ("story", "故事", "用户故事"),
+    "epic": ("epic", "长篇故事", "史诗"),
+    "task": ("task", "任务"),
+    "bug": ("bug", "缺陷", "故障"),
+}
+
+# 创建时由脚本填写或服务端自动补全、无需检查的必填字段
+IMPLICIT_FIELDS = {"project", "issuetype", "reporter"}
+
+_memo = {}
+_memo_lock = threading.Lock()
+
+
+def metadata_name(session) -> str:
+    """站点对应的元数据文件名"""
+    host = urlparse(session.base_url).netloc or session.base_url
+    return f"jira-metadata-{re.sub(r'[^A-Za-z0-9.-]', '_', host)}.json"
+
+
+def load_metadata(session) -> dict:
+    """读取站点元数据（文件未变化时使用进程内副本）"""
+    name = metadata_name(session)
+    try:
+        mtime = os.path.getmtime(state_path(name))
+    except OSError:
+        mtime = None
+    with _memo_lock:
+        cached = _memo.get(name)
+        if cached and cached[0] == mtime:
+            return cached[1]
+    data = read_json_state(name, None) or {}
+    data.setdefault("projects", {})
+    data.setdefault("transitions", {})
+    with _memo_lock:
+        _memo[name] = (mtime, data)
+    return data
+
+
+def _update(session, mutate):
+    """加锁读取-修改-写回元数据文件（与其他进程的写入合并）"""
+    name = metadata_name(session)
+    with file_lock(name):
+        with _memo_lock:
+            _memo.pop(name, None)
+        data = load_metadata(session)
+        mutate(data)
+        write_json_state(name, data)
+        with _memo_lock:
+            _memo[name] = (os.path.getmtime(state_path(name)), data)
+    return data
+
+
+def _fresh(entry) -> bool:
+    return bool(entry) and time.time() - entry.get("fetched_at", 0) <= METADATA_TTL
+
+
+def _get_paged(session, path: str, list_key: str) -> list:
+    """读取 startAt/maxResults 分页的元数据接口"""
+    items, start = [], 0
+    while True:
+        response = session.get(path, params={"startAt": start, "maxResults": 200})
+        if response.status_code != 200:
+            raise JiraApiError(response)
+        data = response.json()
+        page = data.get(list_key) or data.get("values") or []
+        items += page
+        start += len(page)
+        if not page or data.get("isLast") or start >= data.get("total", start):
+            return items
+
+
+def issue_types(session, project_key: str, refresh: bool = False) -> list:
+    """项目可创建的issue类型 [{"id", "name", "subtask", "hierarchyLevel"}]，失败时抛出 JiraApiError"""
+    project = load_metadata(session)["projects"].get(project_key) or {}
+    if not refresh and _fresh(project.get("issue_types")):
+        return project["issue_types"]["items"]
+
+    items = [{"id": str(item["id"]), "name": item.get("name", ""), "subtask": bool(item.get("subtask")),
+              "hierarchyLevel": item.get("hierarchyLevel")}
+             for item in _get_paged(session, f"/rest/api/3/issue/createmeta/{project_key}/issuetypes", "issueTypes")]
+
+    def store(data):
+        data["projects"].setdefault(project_key, {})["issue_types"] = {"fetched_at": time.time(), "items": items}
+    _update(session, store)
+    return items
+
+
+def find_issue_type(types: list, name: str):
+    """按名称、同义名称、层级依次匹配issue类型，找不到返回None"""
+    wanted = name.lower()
+    for item in types:
+        if item["name"].lower() == wanted:
+            return item
+    group = next((names for names in ISSUE_TYPE_ALIASES.values() if wanted in names), ())
+    for item in types:
+        if item["name"].lower() in group:
+            return item
+    if "subtask" in group:
+        return next((item for item in types if item["subtask"]), None)
+    if "epic" in group:
+        return next((item for item in types if item["hierarchyLevel"] == 1), None)
+    return None
+
+
+def required_fields(session, project_key: str, issue_type_id: str, refresh: bool = False) -> list:
+    """该issue类型创建时必须填写（且无默认值）的字段id列表，失败时抛出 JiraApiError"""
+    project = load_metadata(session)["projects"].get(project_key) or {}
+    entry = (project.get("required_fields") or {}).get(issue_type_id)
+    if not refresh and _fresh(entry):
+        return entry["fields"]
+
+    fields = _get_paged(session, f"/rest/api/3/issue/createmeta/{project_key}/issuetypes/{issue_type_id}", "fields")
+    required = [field.get("fieldId") or field.get("key") for field in fields
+                if field.get("required") and not field.get("hasDefaultValue")]
+
+    def store(data):
+        data["projects"].setdefault(project_key, {}).setdefault("required_fields", {})[issue_type_id] = {
+            "fetched_at": time.time(), "fields": required}
+    _update(session, store)
+    return required
+
+
+def resolve_issue_types(session, payloads: list) -> list:
+    """
+    把创建payload中按名称指定的issuetype替换为该项目的类型id，并检查必填字段（原地修改，返回payloads）
+    元数据获取失败或找不到对应类型时保留原名称，由JIRA按名称处理
+    """
+    for payload in payloads:
+        fields = payload.get("fields") or {}
+        issue_type = fields.get("issuetype") or {}
+        project = fields.get("project") or {}
+        project_key = project.get("key") or project.get("id")
+        if "id" in issue_type or not issue_type.get("name") or not project_key:
+            continue
+        try:
+            match = find_issue_type(issue_types(session, project_key), issue_type["name"])
+            if match is None:
+                print(f"⚠️  项目 {project_key} 中没有与 {issue_type['name']} 对应的issue类型")
+                continue
+            fields["issuetype"] = {"id": match["id"]}
+            missing = [field for field in required_fields(session, project_key, match["id"])
+                       if field not in fields and field not in IMPLICIT_FIELDS]
+        except JiraApiError as e:
+            print(f"⚠️  获取项目 {project_key} 的元数据失败，按类型名称创建: {e.status_code}")
+            continue
+        if missing:
+            print(f"⚠️  {match['name']} 缺少必填字段: {', '.join(missing)}（{fields.get('summary', '')}）")
+    return payloads
+
+
+def workflow_key(project_key: str, issue_type: str, status: str) -> str:
+    """转换缓存的键：项目/issue类型/当前状态（按名称）"""
+    return f"{project_key}/{issue_type}/{status}"
+
+
+def transitions_for(session, issue_key: str, key: str = None, refresh: bool = False) -> list:
+    """issue当前可用的转换 [{"id", "name", "to": {"id", "name"}}]；key 为工作流键，已缓存时不请求JIRA"""
+    entry = load_metadata(session)["transitions"].get(key) if key else None
+    if not refresh and _fresh(entry):
+        return entry["items"]
+
+    response = session.get(f"/rest/api/3/issue/{issue_key}/transitions")
+    if response.status_code != 200:
+        raise JiraApiError(response)
+    items = [{"id": str(item["id"]), "name": item.get("name", ""),
+              "to": {"id": (item.get("to") or {}).get("id"), "name": (item.get("to") or {}).get("name")}}
+             for item in response.json().get("transitions", [])]
+    if key:
+        def store(data):
+            data["transitions"][key] = {"fetched_at": time.time(), "items": items}
+        _update(session, store)
+    return items
+
+
+def transition_issue(session, issue_key: str, transition_name: str, issue_type: str = None, status: str = None) -> bool:
+    """
+    按名称执行转换，返回是否成功
+    issue_type/status 为issue当前的类型与状态名称；未传入时读取本地issue缓存。
+    已知工作流时直接用缓存的转换id提交（一次请求）；被拒绝说明本地状态已过期，
+    重新获取转换列表后重试一次（不写入该工作流键）。成功后把目标状态写回本地issue缓存。
+    """
+    if not (issue_type and status):
+        cached = get_cached_issue(session, issue_key) or {}
+        issue_type, status = issue_type or cached.get("type"), status or cached.get("status")
+    key = workflow_key(issue_key.rsplit("-", 1)[0], issue_type, status) if issue_type and status else None
+
+    for refresh in (False, True):
+        try:
+            items = transitions_for(session, issue_key, None if refresh else key)
+        except JiraApiError as e:
+            print(f"❌ 获取 {issue_key} 的转换失败: {e}")
+            return False
+        target = next((item for item in items if item["name"].lower() == transition_name.lower()), None)
+        if target is None:
+            if refresh or key is None:
+                print(f"❌ {issue_key} 没有转换 {transition_name}，可用: {', '.join(item['name'] for item in items)}")
+                return False
+            continue
+        response = session.post(f"/rest/api/3/issue/{issue_key}/transitions",
+                                data=json.dumps({"transition": {"id": target["id"]}}))
+        if response.status_code == 204:
+            # 写回新状态：同一issue的下一次转换按新状态的工作流键命中缓存
+            if (target.get("to") or {}).get("name"):
+                update_status(session, issue_key, target["to"]["name"])
+            return True
+        if refresh or key is None or response.status_code not in (400, 404, 409):
+            print(f"❌ 转换 {issue_key} 失败: {response.status_code} - {response.text}")
+            return False
+    return False
+
+
+if __name__ == "__main__":
+    from jira_client import session_from_config
+    from jira_config import load_jira_config
+
+    if len(sys.argv) < 2 or sys.argv[1] not in ("show", "refresh", "transition", "clear"):
+        print("用法: python jira_metadata.py show|refresh <PROJECT_KEY>")
+        print("     python jira_metadata.py transition <ISSUE_KEY> <转换名称>")
+        print("     python jira_metadata.py clear")
+        sys.exit(1)
+
+    session = session_from_config(load_jira_config([os.path.join(os.getcwd(), "jira.md")], required=True))
+    command = sys.argv[1]
+    if command == "clear":
+        _update(session, lambda data: data.clear() or data.update(projects={}, transitions={}))
+        print("✅ 已清空元数据缓存")
+    elif command == "transition":
+        sys.exit(0 if transition_issue(session, sys.argv[2], sys.argv[3]) else 1)
+    else:
+        project_key = sys.argv[2]
+        for item in issue_types(session, project_key, refresh=command == "refresh"):
+            try:
+                required = required_fields(session, project_key, item["id"], refresh=command == "refresh")
+            except JiraApiError:
+                required = ["?"]
+            print(f"   {item['id']:>8}  {item['name']:<12} 子任务={item['subtask']}  必填: {', '.join(required) or '-'}")
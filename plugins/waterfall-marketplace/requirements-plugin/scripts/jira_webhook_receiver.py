@@ -0,0 +1,420 @@
+"""
+JIRA webhook 本地接收器
+
+接收JIRA推送的 jira:issue_created / jira:issue_updated / jira:issue_deleted、issuelink_created /
+issuelink_deleted，直接写入本地issue缓存（issue_cache；推送可能乱序，updated 早于缓存记录的负载不覆盖缓存），并把每个事件的摘要（带递增的 seq）
+追加到状态目录下的 webhook-events-<站点>.jsonl，通知订阅方：
+  - Python：read_events() / wait_for_events() 按 seq 读取；同进程内用 start_receiver() 启动后 receiver.subscribe(回调)
+  - sprint-plugin 的完成通知hook（scripts/lib/webhookEvents.ts）按各自的游标读取新事件，接收器运行时不再轮询搜索
+  - 其他进程：GET /events?after=<seq>&wait=<秒> 长轮询
+运行期间每 15 秒把心跳写入 webhook-receiver-<站点>.json。--project 指定的项目在启动时先增量同步，
+之后只要心跳新鲜，issue_cache 就视该项目的缓存为最新，读取不再回源JIRA；
+每 JIRA_WEBHOOK_RESYNC 秒（默认3600，0关闭）再增量同步一次，补上可能丢失的推送。
+设置 JIRA_WEBHOOK_SECRET 后校验 X-Hub-Signature（HMAC-SHA256）或URL中的 ?secret=。
+
+离线测试：replay 把录制的webhook JSON（单个JSON、JSONL或目录）直接应用到本地缓存并写入事件，
+或用 --url 逐条POST给运行中的接收器；benchmarks/fake_jira.py 的 --webhook-url / --webhook-log 可产生推送与录制文件。
+
+用法：python jira_webhook_receiver.py run [--host 127.0.0.1] [--port 8765] [--project KEY ...]
+     python jira_webhook_receiver.py replay <文件|目录> [--url http://127.0.0.1:8765/webhook]
+     python jira_webhook_receiver.py events [after_seq]
+注意：本模块在各插件的 scripts 目录中保持一致，修改时请同步。
+"""
+import hashlib
+import hmac
+import json
+import os
+import sys
+import threading
+import time
+import urllib.request
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from issue_cache import (add_links, delete_issues, fetch_issue, get_cached_issue, remove_links, site_name,
+                         sync_project, upsert_issues)
+from jira_client import JiraApiError
+from local_state import file_lock, state_path, write_json_state
+
+WEBHOOK_SECRET = os.environ.get("JIRA_WEBHOOK_SECRET", "")
+RESYNC_INTERVAL = float(os.environ.get("JIRA_WEBHOOK_RESYNC", "3600"))
+HEARTBEAT_INTERVAL = 15
+MAX_EVENTS_BYTES = 5 * 1024 * 1024  # 超过后轮转为 .1，读取时两个文件都会读
+
+SUPPORTED_EVENTS = ("jira:issue_created", "jira:issue_updated", "jira:issue_deleted",
+                    "issuelink_created", "issuelink_deleted")
+
+
+def events_name(session) -> str:
+    return f"webhook-events-{site_name(session)}.jsonl"
+
+
+def receiver_name(session) -> str:
+    return f"webhook-receiver-{site_name(session)}.json"
+
+
+def _issue_key(session, issue_id):
+    """链接事件只带issue内部id：先查缓存，未缓存时回源JIRA"""
+    cached = get_cached_issue(session, str(issue_id), max_age=float("inf"))
+    if cached is not None:
+        return cached["key"]
+    try:
+        return fetch_issue(session, str(issue_id))["key"]
+    except JiraApiError:
+        return None
+
+
+def _parse_updated(value):
+    """JIRA的 updated 时间（2024-01-01T12:00:00.000+0800）转为 datetime，无法解析返回None"""
+    for parse in (lambda v: datetime.strptime(v, "%Y-%m-%dT%H:%M:%S.%f%z"), datetime.fromisoformat):
+        try:
+            return parse(value)
+        except (TypeError, ValueError):
+            continue
+    return None
+
+
+def _is_stale(session, issue: dict) -> bool:
+    """JIRA不保证webhook的送达顺序：负载的 updated 早于缓存中的记录时视为过期推送"""
+    cached = get_cached_issue(session, issue["key"], max_age=float("inf"))
+    if cached is None:
+        return False
+    incoming = _parse_updated((issue.get("fields") or {}).get("updated"))
+    current = _parse_updated(cached.get("updated"))
+    return incoming is not None and current is not None and incoming < current
+
+
+def apply_webhook(session, payload: dict):
+    """把一个webhook负载应用到本地缓存，返回事件摘要（不支持的事件返回None）"""
+    event = payload.get("webhookEvent")
+    if event not in SUPPORTED_EVENTS:
+        return None
+    record = {"event": event, "ts": round(payload.get("timestamp", time.time() * 1000) / 1000, 3)}
+
+    if event.startswith("jira:"):
+        issue = payload["issue"]
+        fields = issue.get("fields") or {}
+        if event == "jira:issue_deleted":
+            delete_issues(session, [issue["key"]])
+        elif not _is_stale(session, issue):
+            # 迟到的旧负载不覆盖缓存中更新的状态，事件本身仍照常记录
+            upsert_issues(session, [issue])
+        record.update(key=issue["key"], id=str(issue.get("id", "")),
+                      project=(fields.get("project") or {}).get("key") or issue["key"].rsplit("-", 1)[0],
+                      type=(fields.get("issuetype") or {}).get("name", ""),
+                      status=(fields.get("status") or {}).get("name", ""),
+                      parent=(fields.get("parent") or {}).get("key", ""))
+        changes = [{"field": item.get("field"), "from": item.get("fromString"), "to": item.get("toString")}
+                   for item in (payload.get("changelog") or {}).get("items") or []]
+        if changes:
+            record["changes"] = changes
+        return record
+
+    link = payload["issueLink"]
+    link_id = str(link["id"])
+    record.update(link_id=link_id, type=(link.get("issueLinkType") or {}).get("name", ""))
+    remove_links(session, [link_id])
+    if event == "issuelink_created":
+        # webhook的 source → destination 即创建链接时的 inwardIssue → outwardIssue
+        inward, outward = _issue_key(session, link["sourceIssueId"]), _issue_key(session, link["destinationIssueId"])
+        if inward and outward:
+            add_links(session, [{"id": link_id, "type": record["type"], "inward": inward, "outward": outward}])
+        record.update(inward=inward, outward=outward)
+    return record
+
+
+def _last_seq(path: str) -> int:
+    """事件文件最后一行的 seq"""
+    try:
+        with open(path, "rb") as f:
+            f.seek(0, os.SEEK_END)
+            f.seek(max(0, f.tell() - 8192))
+            lines = [line for line in f.read().splitlines() if line.strip()]
+    except OSError:
+        return 0
+    for line in reversed(lines):
+        try:
+            return int(json.loads(line)["seq"])
+        except (ValueError, KeyError):
+            continue
+    return 0
+
+
+def append_events(session, records: list) -> list:
+    """为事件分配 seq 并追加到事件文件（跨进程加锁），返回带 seq 的事件"""
+    name = events_name(session)
+    path = state_path(name)
+    with file_lock(name):
+        seq = _last_seq(path) or _last_seq(f"{path}.1")
+        if os.path.exists(path) and os.path.getsize(path) > MAX_EVENTS_BYTES:
+            os.replace(path, f"{path}.1")
+        with open(path, "a", encoding="utf-8") as f:
+            for record in records:
+                seq += 1
+                record["seq"] = seq
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    return records
+
+
+def read_events(session, after: int = 0) -> list:
+    """读取 seq 大于 after 的事件"""
+    path = state_path(events_name(session))
+    events = []
+    for candidate in (f"{path}.1", path):
+        try:
+            with open(candidate, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue
+                    if record.get("seq", 0) > after:
+                        events.append(record)
+        except OSError:
+            continue
+    return events
+
+
+def wait_for_events(session, after: int = 0, timeout: float = 30.0) -> list:
+    """等待 seq 大于 after 的新事件，超时返回空列表"""
+    path = state_path(events_name(session))
+    deadline = time.monotonic() + timeout
+    last_size = None
+    while True:
+        size = os.path.getsize(path) if os.path.exists(path) else 0
+        if size != last_size:
+            last_size = size
+            events = read_events(session, after)
+            if events:
+                return events
+        if time.monotonic() >= deadline:
+            return []
+        time.sleep(0.2)
+
+
+def verify_signature(body: bytes, headers, query: dict, secret: str = None) -> bool:
+    """校验 X-Hub-Signature: sha256=<HMAC> 或URL中的 secret 参数；未配置密钥时不校验"""
+    secret = WEBHOOK_SECRET if secret is None else secret
+    if not secret:
+        return True
+    signature = headers.get("X-Hub-Signature") or ""
+    if signature.startswith("sha256="):
+        expected = hmac.new(secret.encode("utf-8"), body, hashlib.sha256).hexdigest()
+        return hmac.compare_digest(signature[len("sha256="):], expected)
+    return hmac.compare_digest(query.get("secret", ""), secret)
+
+
+class WebhookReceiver:
+    """应用webhook、记录事件并通知订阅方"""
+
+    def __init__(self, session, projects=()):
+        self.session = session
+        self.projects = list(projects)
+        self.started_at = time.time()
+        self.covered = []  # 已完成启动同步、由推送保持最新的项目
+        self.subscribers = []
+        self.condition = threading.Condition()
+        self.seq = _last_seq(state_path(events_name(session)))
+        self.url = None
+        self.server = None
+        self.stopped = threading.Event()
+
+    def subscribe(self, callback):
+        """注册回调，每个事件调用一次 callback(事件)"""
+        self.subscribers.append(callback)
+
+    def handle(self, payload: dict):
+        record = apply_webhook(self.session, payload)
+        if record is None:
+            return None
+        append_events(self.session, [record])
+        with self.condition:
+            self.seq = max(self.seq, record["seq"])
+            self.condition.notify_all()
+        for callback in list(self.subscribers):
+            try:
+                callback(record)
+            except Exception as e:
+                print(f"⚠️  订阅回调出错: {e}")
+        return record
+
+    def wait(self, after: int, timeout: float) -> list:
+        """长轮询：等待 seq 大于 after 的事件"""
+        with self.condition:
+            self.condition.wait_for(lambda: self.seq > after, timeout=timeout)
+        return read_events(self.session, after)
+
+    def write_status(self):
+        write_json_state(receiver_name(self.session), {
+            "pid": os.getpid(), "url": self.url, "started_at": self.started_at, "heartbeat": time.time(),
+            "projects": self.covered, "seq": self.seq})
+
+    def sync(self):
+        """增量同步 --project 指定的项目；首次完成后该项目才视为由推送保持最新"""
+        for project_key in self.projects:
+            try:
+                count = sync_project(self.session, project_key)
+            except JiraApiError as e:
+                print(f"⚠️  同步 {project_key} 失败: {e.status_code}")
+                continue
+            if project_key not in self.covered:
+                self.covered.append(project_key)
+            print(f"🔄 已同步 {project_key}: {count} 个issue")
+        self.write_status()
+
+    def background(self):
+        """心跳与定期兜底同步"""
+        last_sync = time.monotonic()
+        while not self.stopped.wait(HEARTBEAT_INTERVAL):
+            if RESYNC_INTERVAL > 0 and time.monotonic() - last_sync >= RESYNC_INTERVAL:
+                self.sync()
+                last_sync = time.monotonic()
+            else:
+                self.write_status()
+
+    def shutdown(self):
+        """停止接收并撤销心跳，缓存恢复按同步时间判断新鲜度"""
+        self.stopped.set()
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+        write_json_state(receiver_name(self.session), {"pid": os.getpid(), "started_at": self.started_at,
+                                                      "heartbeat": 0, "projects": [], "seq": self.seq})
+
+
+class _Handler(BaseHTTPRequestHandler):
+    receiver = None  # serve() 时绑定
+
+    def log_message(self, *args):
+        pass
+
+    def _reply(self, status: int, body=None):
+        data = b"" if body is None else json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        if data:
+            self.send_header("Content-Type", "application/json;charset=UTF-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        raw = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        query = {k: v[-1] for k, v in parse_qs(urlparse(self.path).query).items()}
+        if not verify_signature(raw, self.headers, query):
+            return self._reply(401, {"error": "签名校验失败"})
+        try:
+            payload = json.loads(raw or b"{}")
+        except ValueError:
+            return self._reply(400, {"error": "请求体不是有效的JSON"})
+        try:
+            record = self.receiver.handle(payload)
+        except (KeyError, TypeError) as e:
+            return self._reply(400, {"error": f"无法解析的webhook: {e}"})
+        if record:
+            print(f"📥 {record['seq']} {record['event']} {record.get('key') or record.get('link_id')}")
+        return self._reply(204)
+
+    def do_GET(self):
+        parsed = urlparse(self.path)
+        query = {k: v[-1] for k, v in parse_qs(parsed.query).items()}
+        if parsed.path == "/events":
+            events = self.receiver.wait(int(query.get("after", 0)), min(float(query.get("wait", 0)), 60))
+            return self._reply(200, {"seq": self.receiver.seq, "events": events})
+        if parsed.path == "/health":
+            return self._reply(200, {"ok": True, "seq": self.receiver.seq, "projects": self.receiver.covered})
+        return self._reply(404, {"error": f"未知路径: {parsed.path}"})
+
+
+def start_receiver(session, host: str = "127.0.0.1", port: int = 8765, projects=()) -> WebhookReceiver:
+    """在后台线程启动接收器：先开始接收，再同步项目，避免同步期间的推送丢失；receiver.shutdown() 停止"""
+    receiver = WebhookReceiver(session, projects)
+    handler = type("WebhookHandler", (_Handler,), {"receiver": receiver})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    receiver.server = server
+    receiver.url = f"http://{host}:{server.server_address[1]}/webhook"
+    receiver.write_status()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    receiver.sync()
+    threading.Thread(target=receiver.background, daemon=True).start()
+    return receiver
+
+
+def serve(session, host: str = "127.0.0.1", port: int = 8765, projects=()):
+    """启动接收器并阻塞，Ctrl+C 停止"""
+    receiver = start_receiver(session, host, port, projects)
+    print(f"📡 webhook接收器已启动: {receiver.url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        receiver.shutdown()
+        print("👋 webhook接收器已停止")
+
+
+def load_payloads(path: str) -> list:
+    """读取录制的webhook：单个JSON（对象或数组）、JSONL，或包含这些文件的目录（按文件名排序）"""
+    if os.path.isdir(path):
+        payloads = []
+        for name in sorted(os.listdir(path)):
+            if name.endswith((".json", ".jsonl")):
+                payloads += load_payloads(os.path.join(path, name))
+        return payloads
+    with open(path, "r", encoding="utf-8") as f:
+        content = f.read()
+    try:
+        data = json.loads(content)
+        return data if isinstance(data, list) else [data]
+    except ValueError:
+        return [json.loads(line) for line in content.splitlines() if line.strip()]
+
+
+def replay(session, payloads: list, url: str = None) -> int:
+    """重放webhook：默认直接应用到本地缓存并写入事件；指定 url 时逐条POST给接收器。返回处理的条数"""
+    count = 0
+    for payload in payloads:
+        if url:
+            body = json.dumps(payload).encode("utf-8")
+            headers = {"Content-Type": "application/json"}
+            if WEBHOOK_SECRET:
+                headers["X-Hub-Signature"] = "sha256=" + hmac.new(WEBHOOK_SECRET.encode("utf-8"), body,
+                                                                  hashlib.sha256).hexdigest()
+            urllib.request.urlopen(urllib.request.Request(url, data=body, headers=headers, method="POST"),
+                                   timeout=30).close()
+            count += 1
+            continue
+        record = apply_webhook(session, payload)
+        if record:
+            append_events(session, [record])
+            count += 1
+    return count
+
+
+if __name__ == "__main__":
+    from jira_client import session_from_config
+    from jira_config import load_jira_config
+
+    if len(sys.argv) < 2 or sys.argv[1] not in ("run", "replay", "events") or (sys.argv[1] == "replay" and len(sys.argv) < 3):
+        print("用法: python jira_webhook_receiver.py run [--host 127.0.0.1] [--port 8765] [--project KEY ...]")
+        print("     python jira_webhook_receiver.py replay <文件|目录> [--url http://127.0.0.1:8765/webhook]")
+        print("     python jira_webhook_receiver.py events [after_seq]")
+        sys.exit(1)
+
+    session = session_from_config(load_jira_config([os.path.join(os.getcwd(), "jira.md")], required=True))
+    argv = sys.argv[2:]
+
+    def option(name, default=None):
+        return argv[argv.index(name) + 1] if name in argv else default
+
+    if sys.argv[1] == "run":
+        projects = [argv[i + 1].upper() for i, arg in enumerate(argv) if arg == "--project" and i + 1 < len(argv)]
+        serve(session, option("--host", "127.0.0.1"), int(option("--port", "8765")), projects)
+    elif sys.argv[1] == "replay":
+        count = replay(session, load_payloads(argv[0]), option("--url"))
+        print(f"✅ 已重放 {count} 个webhook")
+    else:
+        for record in read_events(session, int(argv[0]) if argv else 0):
+            print(json.dumps(record, ensure_ascii=False))
@@ -0,0 +1,87 @@
+"""
+REQ/TASK/DEV 编号分配器
+
+从JIRA中已有issue的Summary前缀和标签推导当前最大编号（分页、只取 summary/labels 字段），
+本地追溯索引（issue_cache 的 trace 表）中的编号只作为下限：其他主机上的Agent创建的编号只有JIRA中才有；
+再在本地文件锁保护下预留编号段，保证并发运行的多个进程/Agent不会拿到相同编号。
+查询JIRA失败时抛出异常，不按过期的本地记录猜测编号。
+预留状态保存在状态目录的 sequences.json 中，在 SEQUENCE_SYNC_TTL 秒内复用，
+不再重复查询JIRA。
+注意：本模块在各插件的 scripts 目录中保持一致，修改时请同步。
+"""
+import os
+import re
+import time
+
+from issue_cache import index_trace, trace_max_numbers
+from jira_client import search_issues
+from local_state import file_lock, read_json_state, write_json_state
+
+SEQUENCE_SYNC_TTL = int(os.environ.get("JIRA_SEQUENCE_SYNC_TTL", "300"))
+
+_STATE_FILE = "sequences.json"
+
+
+def max_existing_numbers(session, prefixes, jql: str) -> dict:
+    """一次查询JQL命中的issue，返回每个前缀 [prefix-N] / prefix-N 形式编号的最大值（不存在时为0）"""
+    alternatives = "|".join(re.escape(prefix) for prefix in sorted(prefixes, key=len, reverse=True))
+    summary_pattern = re.compile(rf"\[({alternatives})-(\d+)\]")
+    label_pattern = re.compile(rf"^({alternatives})-(\d+)$")
+
+    max_numbers = {prefix: 0 for prefix in prefixes}
+    issues = list(search_issues(session, jql, fields=["summary", "labels"]))
+    index_trace(session, issues)  # 顺带更新追溯索引
+    for issue in issues:
+        fields = issue.get("fields", {})
+        matches = [summary_pattern.search(fields.get("summary") or "")]
+        matches += [label_pattern.match(label) for label in fields.get("labels") or []]
+        for match in filter(None, matches):
+            max_numbers[match.group(1)] = max(max_numbers[match.group(1)], int(match.group(2)))
+    return max_numbers
+
+
+def max_existing_number(session, prefix: str, jql: str) -> int:
+    """查询JQL命中的issue中 [prefix-N] / prefix-N 形式编号的最大值（不存在时为0）"""
+    return max_existing_numbers(session, [prefix], jql)[prefix]
+
+
+def allocate_numbers(session, prefix: str, jql: str, count: int = 1) -> int:
+    """
+    为编号前缀（如 REQ-CMT-5、DEV-CMT-76）预留连续 count 个编号，返回第一个编号
+    jql: 用于查找已有编号issue的查询，例如 parent = CMT-5；
+         为None表示父issue刚由调用方创建、JIRA中不可能已有编号，不再查询
+    """
+    return allocate_number_groups(session, {prefix: count}, jql)[prefix]
+
+
+def allocate_number_groups(session, counts: dict, jql: str) -> dict:
+    """
+    为多个编号前缀同时预留编号：counts 为 {前缀: 个数}，返回 {前缀: 第一个编号}
+    需要同步的前缀共用一次JQL查询（如同一Story下各子需求的 DEV-<子需求Key> 前缀都用
+    parent = <Story> AND labels = implementation），jql 含义同 allocate_numbers
+    查询已有编号失败时抛出 JiraApiError，不预留任何编号
+    """
+    with file_lock("sequences"):
+        state = read_json_state(_STATE_FILE, {})
+        entries = {prefix: state.get(f"{session.base_url}|{prefix}", {"next": 1, "synced_at": 0}) for prefix in counts}
+
+        stale = [prefix for prefix, entry in entries.items() if time.time() - entry["synced_at"] > SEQUENCE_SYNC_TTL]
+        if jql is None:
+            for prefix in stale:
+                entries[prefix]["synced_at"] = time.time()
+        elif stale:
+            # 以JIRA为准，追溯索引只作下限（可能含JIRA搜索尚未索引到的刚创建的issue）
+            existing = max_existing_numbers(session, stale, jql)
+            indexed = trace_max_numbers(session, stale)
+            for prefix in stale:
+                latest = max(existing[prefix], indexed[prefix])
+                entries[prefix] = {"next": max(entries[prefix]["next"], latest + 1), "synced_at": time.time()}
+
+        firsts = {}
+        for prefix, count in counts.items():
+            firsts[prefix] = entries[prefix]["next"]
+            entries[prefix]["next"] += count
+            state[f"{session.base_url}|{prefix}"] = entries[prefix]
+        write_json_state(_STATE_FILE, state)
+
+    return firsts
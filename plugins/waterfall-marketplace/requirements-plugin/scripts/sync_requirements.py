@@ -0,0 +1,389 @@
+"""
+requirements.md → JIRA 增量同步
+
+将 requirements.md（以及 requirements-change-*.md 变更文档）解析为 Epic / Story / Subtask 三级章节：
+  # 标题         → Epic（"## System Overview" 的内容并入Epic描述）
+  ## 标题        → Story
+  ### 标题       → Subtask
+每个章节计算内容哈希，记录在文档旁的 .requirements-sync-<文档名>.json 中，并以标签
+reqsync-<章节ID>、reqhash-<内容哈希> 写入issue。再次同步时只创建新增章节、
+更新哈希变化的章节、删除已移除的章节；未变化的章节不产生任何API调用。
+章节ID是标题路径，标题改名后按同层级的内容哈希（或正文哈希）与已移除的章节匹配，
+沿用原issue并更新标题、标签与父级，其下级章节随之匹配，不会删除重建。
+删除自下而上逐个进行且不级联：下面还有非本同步创建的issue（如开发任务）的章节保留并提示。
+
+用法：python sync_requirements.py <PROJECT_KEY> [requirements.md] [--dry-run] [--rebuild]
+  --rebuild  忽略本地记录，按 reqsync-/reqhash- 标签从JIRA重建同步记录（本地记录不存在时自动执行）
+"""
+import glob
+import hashlib
+import json
+import os
+import re
+import sys
+
+from adf import text_to_adf
+from batch_runner import run_concurrently
+from create_subtask import build_subtask_payload, get_next_subtask_number, read_jira_config
+from batch_journal import forget_issues, missing_issue_keys
+from jira_client import JiraApiError, bulk_create_issues, get_session, search_children, search_issues
+from issue_cache import delete_issues, index_created
+from jira_metadata import resolve_issue_types
+from jira_metrics import jira_operation
+
+SYNC_LABEL = "requirements-sync"
+OVERVIEW_TITLES = ("System Overview", "系统概述")
+LEVELS = {1: "epic", 2: "story", 3: "subtask"}
+
+
+def _section_label(section_id: str) -> str:
+    return "reqsync-" + hashlib.sha1(section_id.encode("utf-8")).hexdigest()[:10]
+
+
+def _hash_label(content_hash: str) -> str:
+    return "reqhash-" + content_hash
+
+
+def parse_requirements(paths) -> dict:
+    """
+    解析需求文档为有序的章节字典 {章节ID: {"level", "title", "body", "parent", "hash"}}
+    后面的文档（变更文档）中同名章节覆盖前面的内容
+    """
+    sections = {}
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            lines = f.read().split("\n")
+
+        stack = {}          # 层级 -> 章节ID
+        current = None
+        in_code = False
+        for line in lines:
+            if line.strip().startswith("```"):
+                in_code = not in_code
+            match = None if in_code else re.match(r"^(#{1,3})\s+(.+?)\s*#*\s*$", line)
+            if not match:
+                if current is not None:
+                    current["lines"].append(line)
+                continue
+
+            depth, title = len(match.group(1)), match.group(2).strip()
+            if depth == 2 and title in OVERVIEW_TITLES and 1 in stack:
+                current = sections[stack[1]]      # 概述并入Epic描述
+                continue
+
+            parent = next((stack[d] for d in range(depth - 1, 0, -1) if d in stack), None)
+            section_id = f"{parent}/{title}" if parent else title
+            if section_id not in sections:
+                # 变更文档通常只写出变更的章节，按同层级同标题匹配原文档中的章节
+                matches = [sid for sid, s in sections.items() if s["level"] == LEVELS[depth] and s["title"] == title]
+                if len(matches) == 1:
+                    section_id, parent = matches[0], sections[matches[0]]["parent"]
+            stack = {d: sid for d, sid in stack.items() if d < depth}
+            stack[depth] = section_id
+
+            current = sections.setdefault(section_id, {"level": LEVELS[depth], "title": title, "parent": parent})
+            current["lines"] = []
+
+    for section in sections.values():
+        section["body"] = "\n".join(section.pop("lines")).strip()
+        digest = hashlib.sha1(f"{section['title']}\n{section['body']}".encode("utf-8")).hexdigest()
+        section["hash"] = digest[:12]
+        section["body_hash"] = hashlib.sha1(section["body"].encode("utf-8")).hexdigest()[:12]
+    return sections
+
+
+def _manifest_path(requirements_file: str) -> str:
+    """同步记录按需求文档分别保存，同一目录下的多个文档互不覆盖"""
+    path = os.path.abspath(requirements_file)
+    name = os.path.splitext(os.path.basename(path))[0]
+    return os.path.join(os.path.dirname(path), f".requirements-sync-{name}.json")
+
+
+def load_manifest(requirements_file: str) -> dict:
+    try:
+        with open(_manifest_path(requirements_file), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_manifest(requirements_file: str, manifest: dict):
+    with open(_manifest_path(requirements_file), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+
+
+def rebuild_manifest(session, project_key: str, sections: dict) -> dict:
+    """按 reqsync-/reqhash- 标签从JIRA重建同步记录"""
+    by_label = {_section_label(section_id): section_id for section_id in sections}
+    manifest = {}
+    for issue in search_issues(session, f"project = {project_key} AND labels = {SYNC_LABEL}", fields=["labels", "summary"]):
+        labels = issue["fields"].get("labels") or []
+        section_id = next((by_label[label] for label in labels if label in by_label), None)
+        content_hash = next((label[len("reqhash-"):] for label in labels if label.startswith("reqhash-")), "")
+        if section_id:
+            number = re.match(r"^\[([^\]]+)\]", issue["fields"].get("summary") or "")
+            manifest[section_id] = {"key": issue["key"], "id": issue["id"], "hash": content_hash,
+                                    "number": number.group(1) if number else None,
+                                    "level": sections[section_id]["level"], "parent": sections[section_id]["parent"]}
+    return manifest
+
+
+def _record_level(section_id: str, record: dict) -> str:
+    # 旧版本的同步记录没有 level / parent，按编号与章节ID推断
+    return record.get("level") or ("subtask" if record.get("number") else "story" if "/" in section_id else "epic")
+
+
+def _record_parent(section_id: str, record: dict):
+    return record["parent"] if "parent" in record else (section_id.rsplit("/", 1)[0] if "/" in section_id else None)
+
+
+def match_renamed(sections: dict, manifest: dict) -> dict:
+    """
+    将改名（或随父章节改名而ID变化）的章节与已移除的同步记录配对，返回 {新章节ID: 旧章节ID}
+    自上而下逐层匹配：同层级、内容哈希相同（或正文非空且正文哈希相同）且唯一的记录视为同一章节，
+    父章节相同的优先；Subtask 只在父级仍是同一个Story时匹配（Subtask不能改挂到其他Story）
+    匹配的记录直接移到新章节ID下，记录中的 label 保留issue上现有的 reqsync- 标签
+    """
+    removed = [sid for sid in manifest if sid not in sections]
+    renamed = {}
+    moved = {}  # 旧章节ID -> 新章节ID
+    for level in ("epic", "story", "subtask"):
+        for sid, section in sections.items():
+            if section["level"] != level or sid in manifest:
+                continue
+            candidates = [old for old in removed if old not in moved and _record_level(old, manifest[old]) == level
+                          and (manifest[old]["hash"] == section["hash"]
+                               or (section["body"] and manifest[old].get("body_hash") == section["body_hash"]))]
+            old_parents = {old: moved.get(_record_parent(old, manifest[old]), _record_parent(old, manifest[old]))
+                           for old in candidates}
+            if level == "subtask":
+                parent_key = (manifest.get(section["parent"]) or {}).get("key")
+                candidates = [old for old in candidates if (manifest.get(old_parents[old]) or {}).get("key") == parent_key]
+            same_parent = [old for old in candidates if old_parents[old] == section["parent"]]
+            chosen = same_parent or candidates
+            if len(chosen) != 1:
+                continue
+            old = chosen[0]
+            record = manifest.pop(old)
+            record.setdefault("label", _section_label(old))
+            record["level"], record["parent"] = level, old_parents[old]
+            manifest[sid] = record
+            moved[old], renamed[sid] = sid, old
+    return renamed
+
+
+def _needs_update(sid: str, section: dict, record: dict) -> bool:
+    return (record["hash"] != section["hash"] or record.get("label", _section_label(sid)) != _section_label(sid)
+            or (section["level"] == "story" and _record_parent(sid, record) != section["parent"]))
+
+
+def _sync_labels(section_id: str, section: dict) -> list:
+    return [SYNC_LABEL, _section_label(section_id), _hash_label(section["hash"])]
+
+
+def _create_level(session, project_key, sections, manifest, level, dry_run):
+    """批量创建某一层级的新增章节"""
+    pending = [sid for sid, s in sections.items() if s["level"] == level and sid not in manifest
+               and (not s["parent"] or s["parent"] in manifest or dry_run)]
+    if not pending:
+        return 0
+    if dry_run:
+        for sid in pending:
+            print(f"   ➕ {level}: {sections[sid]['title']}")
+        return len(pending)
+
+    payloads, numbers = [], []
+    if level == "subtask":
+        by_story = {}
+        for sid in pending:
+            by_story.setdefault(sections[sid]["parent"], []).append(sid)
+        pending = []
+        for story_sid, sids in by_story.items():
+            story = manifest[story_sid]
+            first = get_next_subtask_number(story["key"], len(sids))
+            if first is None:
+                print(f"   ❌ 预留编号失败，跳过 {story['key']} 下的 {len(sids)} 个subtask")
+                continue
+            for offset, sid in enumerate(sids):
+                number, payload = build_subtask_payload(story["id"], story["key"], first + offset,
+                                                        sections[sid]["title"], sections[sid]["body"])
+                payload["fields"]["labels"] += _sync_labels(sid, sections[sid])
+                pending.append(sid)
+                payloads.append(payload)
+                numbers.append(number)
+    else:
+        for sid in pending:
+            section = sections[sid]
+            fields = {
+                "project": {"key": project_key},
+                "issuetype": {"name": "Epic" if level == "epic" else "Story"},
+                "summary": section["title"],
+                "description": text_to_adf(section["body"]),
+                "labels": ["requirement"] + _sync_labels(sid, section),
+            }
+            if section["parent"]:
+                fields["parent"] = {"id": manifest[section["parent"]]["id"]}
+            payloads.append({"fields": fields})
+            numbers.append(None)
+
+    created = 0
+    results = bulk_create_issues(session, resolve_issue_types(session, payloads))
+    index_created(session, payloads, results)
+    for sid, number, result in zip(pending, numbers, results):
+        if result["ok"]:
+            manifest[sid] = {"key": result["key"], "id": result["id"], "hash": sections[sid]["hash"], "number": number,
+                             "body_hash": sections[sid]["body_hash"], "level": level, "parent": sections[sid]["parent"]}
+            created += 1
+            print(f"   ✅ 创建 {level} {result['key']}: {sections[sid]['title']}")
+        else:
+            print(f"   ❌ 创建 {level} 失败 {sections[sid]['title']}: {result['error']}")
+    return created
+
+
+def _update_issue(session, sid, section, record, parent_id=None):
+    """更新标题、描述与哈希标签；改名的章节同时替换 reqsync- 标签，Story 换了Epic时改挂父级"""
+    summary = f"[{record['number']}] {section['title']}" if record.get("number") else section["title"]
+    labels = [{"remove": _hash_label(record["hash"])}, {"add": _hash_label(section["hash"])}]
+    if record.get("label", _section_label(sid)) != _section_label(sid):
+        labels += [{"remove": record["label"]}, {"add": _section_label(sid)}]
+    payload = {
+        "fields": {"summary": summary, "description": text_to_adf(section["body"])},
+        "update": {"labels": labels},
+    }
+    if parent_id:
+        payload["fields"]["parent"] = {"id": parent_id}
+    response = session.put(f"/rest/api/3/issue/{record['key']}", data=json.dumps(payload))
+    return response.status_code == 204, f"{response.status_code} - {response.text}"
+
+
+def _delete_issue(session, key):
+    # 不级联删除：下级issue都已单独删除，或存在不由本同步管理的下级时不会删除到这里
+    response = session.delete(f"/rest/api/3/issue/{key}")
+    return response.status_code in (204, 404), f"{response.status_code} - {response.text}"
+
+
+def delete_removed(session, manifest: dict, removed: list) -> tuple:
+    """
+    自下而上删除已移除章节的issue（Subtask → Story → Epic，同层并发）
+    下面还有本次不删除的issue（非本同步创建的开发任务、保留的章节等）时保留该issue
+    返回 (已删除的章节ID列表, {章节ID: 保留或失败原因})
+    """
+    missing = set(missing_issue_keys(session, [manifest[sid]["key"] for sid in removed]))
+    deleted = [sid for sid in removed if manifest[sid]["key"] in missing]   # JIRA中已不存在
+    pending = {manifest[sid]["key"]: sid for sid in removed if sid not in deleted}
+    parents = [key for key, sid in pending.items() if _record_level(sid, manifest[sid]) != "subtask"]
+    children = {}
+    for issue in search_children(session, parents, fields=["parent"]):
+        children.setdefault(issue["fields"]["parent"]["key"], []).append(issue["key"])
+
+    kept = {}
+    gone = set(missing)
+    for level in ("subtask", "story", "epic"):
+        batch = []
+        for key, sid in pending.items():
+            if _record_level(sid, manifest[sid]) != level:
+                continue
+            remaining = [child for child in children.get(key, []) if child not in gone]
+            if remaining:
+                kept[sid] = f"下面还有 {len(remaining)} 个未删除的issue（{', '.join(remaining[:5])}）"
+            else:
+                batch.append((key, sid))
+        results = run_concurrently(_delete_issue, [(session, key) for key, _ in batch])
+        for (key, sid), result in zip(batch, results):
+            if result and result[0]:
+                gone.add(key)
+                deleted.append(sid)
+            else:
+                kept[sid] = f"删除失败: {result[1] if result else ''}"
+    keys = [manifest[sid]["key"] for sid in deleted]
+    delete_issues(session, keys)
+    forget_issues(keys)
+    return deleted, kept
+
+
+@jira_operation("sync_requirements", summary=True)
+def sync_requirements(project_key: str, requirements_file: str = "requirements.md",
+                      dry_run: bool = False, rebuild: bool = False):
+    """将需求文档增量同步到JIRA，返回 {"created", "updated", "deleted", "unchanged"} 计数"""
+    base_dir = os.path.dirname(os.path.abspath(requirements_file))
+    change_files = sorted(glob.glob(os.path.join(base_dir, "requirements-change-*.md")))
+    sections = parse_requirements([requirements_file] + change_files)
+
+    config = read_jira_config()
+    if not config:
+        print("❌ 无法读取JIRA配置，同步失败")
+        return None
+    session = get_session(config["JIRA_DOMAIN"], config["EMAIL"], config["API_TOKEN"])
+
+    manifest = load_manifest(requirements_file)
+    if rebuild or not manifest:
+        # 本地无同步记录时先按标签从JIRA恢复，避免重复创建
+        try:
+            manifest = rebuild_manifest(session, project_key, sections)
+        except JiraApiError as e:
+            print(f"❌ 重建同步记录失败: {e}")
+            return None
+
+    renamed = match_renamed(sections, manifest)
+    changed = [sid for sid, s in sections.items() if sid in manifest and _needs_update(sid, s, manifest[sid])]
+    removed = [sid for sid in manifest if sid not in sections]
+    summary = {"created": 0, "updated": 0, "deleted": 0,
+               "unchanged": sum(1 for sid, s in sections.items() if sid in manifest and sid not in changed)}
+
+    print(f"🔄 同步 {requirements_file}{' 及 ' + str(len(change_files)) + ' 个变更文档' if change_files else ''}"
+          f"：{len(sections)} 个章节")
+
+    # 自上而下逐层创建，父级创建后子级才能引用其ID
+    for level in ("epic", "story", "subtask"):
+        summary["created"] += _create_level(session, project_key, sections, manifest, level, dry_run)
+        if not dry_run:
+            save_manifest(requirements_file, manifest)
+
+    if dry_run:
+        for sid in changed:
+            origin = f"（原 {renamed[sid]}）" if sid in renamed else ""
+            print(f"   ✏️  更新 {manifest[sid]['key']}: {sections[sid]['title']}{origin}")
+        for sid in removed:
+            print(f"   🗑  删除 {manifest[sid]['key']}: {sid}")
+        summary["updated"], summary["deleted"] = len(changed), len(removed)
+        print(f"🔍 Dry-run: {summary}")
+        return summary
+
+    moves = {sid: manifest[sections[sid]["parent"]]["id"] for sid in changed if sections[sid]["level"] == "story"
+             and sections[sid]["parent"] in manifest and _record_parent(sid, manifest[sid]) != sections[sid]["parent"]}
+    results = run_concurrently(_update_issue, [(session, sid, sections[sid], manifest[sid], moves.get(sid))
+                                               for sid in changed])
+    for sid, result in zip(changed, results):
+        if result and result[0]:
+            manifest[sid].update(hash=sections[sid]["hash"], body_hash=sections[sid]["body_hash"],
+                                 level=sections[sid]["level"], parent=sections[sid]["parent"])
+            manifest[sid].pop("label", None)
+            summary["updated"] += 1
+            print(f"   ✏️  已更新 {manifest[sid]['key']}: {sections[sid]['title']}")
+        else:
+            print(f"   ❌ 更新失败 {manifest[sid]['key']}: {result[1] if result else ''}")
+
+    try:
+        deleted, kept = delete_removed(session, manifest, removed) if removed else ([], {})
+    except JiraApiError as e:
+        print(f"❌ 查询待删除章节的下级issue失败，本次不删除: {e}")
+        deleted, kept = [], {}
+    for sid in deleted:
+        print(f"   🗑  已删除 {manifest.pop(sid)['key']}: {sid}")
+    summary["deleted"] = len(deleted)
+    for sid, reason in kept.items():
+        # 保留在同步记录中，下次同步时再尝试删除
+        print(f"   ⚠️  保留 {manifest[sid]['key']}（{sid}）: {reason}")
+
+    save_manifest(requirements_file, manifest)
+    print(f"✅ 同步完成: {summary}")
+    return summary
+
+
+if __name__ == "__main__":
+    args = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    if not args:
+        print("用法: python sync_requirements.py <PROJECT_KEY> [requirements.md] [--dry-run] [--rebuild]")
+        sys.exit(1)
+    sync_requirements(args[0], args[1] if len(args) > 1 else "requirements.md",
+                      dry_run="--dry-run" in sys.argv, rebuild="--rebuild" in sys.argv)